@@ -0,0 +1,4 @@
+from .document_list import DocumentListMaterializer
+from .document_store import DocumentStoreMaterializer
+
+__all__ = ["DocumentListMaterializer", "DocumentStoreMaterializer"]
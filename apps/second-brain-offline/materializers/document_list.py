@@ -0,0 +1,104 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, ClassVar, Type
+
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.metadata.metadata_types import MetadataType
+
+from second_brain_offline.domain import (
+    Document,
+    read_document_shards,
+    write_document_shards,
+)
+
+
+class DocumentListMaterializer(BaseMaterializer):
+    """Stores `list[Document]` artifacts as zstd-compressed Parquet shards.
+
+    The default container materializer serializes every document to its own JSON
+    file, so each step boundary rewrites and re-parses the whole corpus file by
+    file. The Parquet shards are a fraction of that size, keep the metadata and
+    scores in their own columns, and are read memory-mapped when the artifact
+    store is local.
+
+    It isn't registered for every list: steps opt in with
+    `@step(output_materializers=DocumentListMaterializer)`.
+    """
+
+    ASSOCIATED_TYPES: ClassVar[tuple[Type[Any], ...]] = (list,)
+    ASSOCIATED_ARTIFACT_TYPE: ClassVar[ArtifactType] = ArtifactType.DATA
+    SKIP_REGISTRATION: ClassVar[bool] = True
+
+    def load(self, data_type: Type[Any]) -> list[Document]:
+        """Read the documents of the artifact.
+
+        Args:
+            data_type: The type of the artifact, a list.
+
+        Returns:
+            list[Document]: The documents, in the order they were saved.
+        """
+
+        if self.__is_local():
+            return list(read_document_shards(Path(self.uri)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_name in fileio.listdir(self.uri):
+                fileio.copy(
+                    os.path.join(self.uri, str(file_name)),
+                    os.path.join(tmp_dir, str(file_name)),
+                )
+
+            return list(read_document_shards(Path(tmp_dir)))
+
+    def save(self, data: list[Document]) -> None:
+        """Write the documents of the artifact as Parquet shards.
+
+        Args:
+            data: The documents to save.
+
+        Raises:
+            TypeError: If the list contains something else than documents.
+        """
+
+        if not all(isinstance(document, Document) for document in data):
+            raise TypeError(f"{self.__class__.__name__} only supports list[Document]")
+
+        if self.__is_local():
+            write_document_shards(data, Path(self.uri))
+
+            return
+
+        fileio.makedirs(self.uri)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for shard_path in write_document_shards(data, Path(tmp_dir)):
+                fileio.copy(
+                    str(shard_path),
+                    os.path.join(self.uri, shard_path.name),
+                    overwrite=True,
+                )
+
+    def extract_metadata(self, data: list[Document]) -> dict[str, MetadataType]:
+        """Extract the size of the document collection.
+
+        Args:
+            data: The saved documents.
+
+        Returns:
+            dict[str, MetadataType]: The number of documents, of scored documents and
+                of content characters.
+        """
+
+        return {
+            "num_documents": len(data),
+            "num_scored_documents": sum(
+                document.content_quality_score is not None for document in data
+            ),
+            "num_content_characters": sum(len(document.content) for document in data),
+        }
+
+    def __is_local(self) -> bool:
+        return "://" not in self.uri
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, ClassVar, Type
+
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.metadata.metadata_types import MetadataType
+
+from second_brain_offline.domain import DocumentStore
+
+
+class DocumentStoreMaterializer(BaseMaterializer):
+    """Stores `DocumentStore` artifacts as zstd-compressed Parquet shards.
+
+    Saving writes the documents shard by shard, loading their contents in batches.
+    Loading only reads the header columns, and the contents are read from the
+    memory-mapped shards when the documents are iterated.
+    """
+
+    ASSOCIATED_TYPES: ClassVar[tuple[Type[Any], ...]] = (DocumentStore,)
+    ASSOCIATED_ARTIFACT_TYPE: ClassVar[ArtifactType] = ArtifactType.DATA
+
+    def load(self, data_type: Type[Any]) -> DocumentStore:
+        """Read the headers of the documents of the artifact.
+
+        Args:
+            data_type: The type of the artifact, a DocumentStore.
+
+        Returns:
+            DocumentStore: The documents, loading their contents from the shards.
+        """
+
+        if self.__is_local():
+            return DocumentStore.from_shards(Path(self.uri))
+
+        # The contents are read lazily, so the local copy must outlive this call. It
+        # is deleted along with the store.
+        tmp_dir = tempfile.mkdtemp(prefix="document_store_")
+        for file_name in fileio.listdir(self.uri):
+            fileio.copy(
+                os.path.join(self.uri, str(file_name)),
+                os.path.join(tmp_dir, str(file_name)),
+            )
+
+        return DocumentStore.from_shards(Path(tmp_dir), delete_input_dir=True)
+
+    def save(self, data: DocumentStore) -> None:
+        """Write the documents of the artifact as Parquet shards.
+
+        Args:
+            data: The documents to save.
+        """
+
+        if self.__is_local():
+            data.write_shards(Path(self.uri))
+
+            return
+
+        fileio.makedirs(self.uri)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for shard_path in data.write_shards(Path(tmp_dir)):
+                fileio.copy(
+                    str(shard_path),
+                    os.path.join(self.uri, shard_path.name),
+                    overwrite=True,
+                )
+
+    def extract_metadata(self, data: DocumentStore) -> dict[str, MetadataType]:
+        """Extract the size of the document collection, without loading contents.
+
+        Args:
+            data: The saved documents.
+
+        Returns:
+            dict[str, MetadataType]: The number of documents and of scored documents.
+        """
+
+        return {
+            "num_documents": len(data),
+            "num_scored_documents": sum(
+                header.content_quality_score is not None for header in data.headers
+            ),
+        }
+
+    def __is_local(self) -> bool:
+        return "://" not in self.uri
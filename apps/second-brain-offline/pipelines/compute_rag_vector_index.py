@@ -1,11 +1,12 @@
 from zenml import pipeline
 
+from second_brain_offline.application.agents import ContextualSummarizationMode
 from second_brain_offline.application.rag import EmbeddingModelType
 from second_brain_offline.application.rag.retrievers import RetrieverType
 from second_brain_offline.application.rag.splitters import SummarizationType
 from steps.compute_rag_vector_index import chunk_embed_load, filter_by_quality
 from steps.infrastructure import (
-    fetch_from_mongodb,
+    fetch_document_store_from_mongodb,
 )
 
 
@@ -23,9 +24,13 @@ def compute_rag_vector_index(
     contextual_summarization_type: SummarizationType = "none",
     contextual_agent_model_id: str | None = None,
     contextual_agent_max_characters: int | None = None,
+    contextual_agent_mode: ContextualSummarizationMode = "chunk",
     mock: bool = False,
     processing_batch_size: int = 256,
     processing_max_workers: int = 10,
+    embedding_max_workers: int = 2,
+    load_max_workers: int = 2,
+    processing_queue_size: int = 16,
     device: str = "cpu",
 ) -> None:
     """Computes and stores RAG vector index from documents in MongoDB.
@@ -46,16 +51,21 @@ def compute_rag_vector_index(
         contextual_summarization_type: Type of summarization to apply to chunks
         contextual_agent_model_id: Model ID for contextual summarization agent
         contextual_agent_max_characters: Maximum characters for contextual summaries
+        contextual_agent_mode: Whether the contextual agent makes one call per chunk or per document
         mock: Whether to run in mock mode
         processing_batch_size: Batch size for parallel processing
-        processing_max_workers: Number of worker threads for parallel processing
+        processing_max_workers: Maximum number of concurrent contextual summarization requests,
+            and number of batches contextualized concurrently
+        embedding_max_workers: Number of batches embedded concurrently
+        load_max_workers: Number of batches written to MongoDB concurrently
+        processing_queue_size: Maximum number of batches waiting in front of each processing stage
         device: Device to run embeddings on ('cpu' or 'cuda')
 
     Returns:
         None
     """
 
-    documents = fetch_from_mongodb(
+    documents = fetch_document_store_from_mongodb(
         collection_name=extract_collection_name, limit=fetch_limit
     )
     documents = filter_by_quality(
@@ -75,6 +85,10 @@ def compute_rag_vector_index(
         contextual_summarization_type=contextual_summarization_type,
         contextual_agent_model_id=contextual_agent_model_id,
         contextual_agent_max_characters=contextual_agent_max_characters,
+        contextual_agent_mode=contextual_agent_mode,
+        embedding_max_workers=embedding_max_workers,
+        load_max_workers=load_max_workers,
+        processing_queue_size=processing_queue_size,
         mock=mock,
         device=device,
     )
@@ -3,6 +3,7 @@ from pathlib import Path
 from loguru import logger
 from zenml import pipeline
 
+from second_brain_offline.domain import CorpusFormat
 from steps.etl import add_quality_score, crawl
 from steps.infrastructure import (
     ingest_to_mongodb,
@@ -20,6 +21,7 @@ def etl(
     max_workers: int = 10,
     quality_agent_model_id: str = "gpt-4o-mini",
     quality_agent_mock: bool = True,
+    corpus_format: CorpusFormat = "json",
 ) -> None:
     notion_data_dir = data_dir / "notion"
     logger.info(f"Reading notion data from {notion_data_dir}")
@@ -37,7 +39,9 @@ def etl(
         max_workers=max_workers,
     )
 
-    save_documents_to_disk(documents=enhanced_documents, output_dir=crawled_data_dir)
+    save_documents_to_disk(
+        documents=enhanced_documents, output_dir=crawled_data_dir, format=corpus_format
+    )
     if to_s3:
         upload_to_s3(
             folder_path=crawled_data_dir,
@@ -47,5 +51,6 @@ def etl(
     ingest_to_mongodb(
         models=enhanced_documents,
         collection_name=load_collection_name,
-        clear_collection=True,
+        clear_collection=False,
+        delete_stale_documents=True,
     )
@@ -2,6 +2,7 @@ from pathlib import Path
 
 from zenml import pipeline
 
+from second_brain_offline.domain import CorpusFormat
 from steps.infrastructure import ingest_to_mongodb, read_documents_from_disk
 
 
@@ -9,13 +10,15 @@ from steps.infrastructure import ingest_to_mongodb, read_documents_from_disk
 def etl_precomputed(
     data_dir: Path,
     load_collection_name: str,
+    corpus_format: CorpusFormat = "json",
 ) -> None:
     crawled_data_dir = data_dir / "crawled"
     documents = read_documents_from_disk(
-        data_directory=crawled_data_dir, nesting_level=0
+        data_directory=crawled_data_dir, nesting_level=0, format=corpus_format
     )
     ingest_to_mongodb(
         models=documents,
         collection_name=load_collection_name,
-        clear_collection=True,
+        clear_collection=False,
+        delete_stale_documents=True,
     )
@@ -2,11 +2,13 @@ from pathlib import Path
 
 from zenml import pipeline
 
+from second_brain_offline.domain import DatasetFormat
 from steps.generate_dataset import create_histograms, generate_summary_dataset
 from steps.infrastructure import (
+    fetch_corpus_statistics,
     fetch_from_mongodb,
     push_to_huggingface,
-    save_dataset_to_disk,
+    save_packed_dataset_to_disk,
 )
 
 
@@ -18,6 +20,8 @@ def generate_dataset(
     summarization_agent_model_id: str = "gpt-4o-mini",
     summarization_agent_mock: bool = False,
     summarization_max_characters: int = 256,
+    summarization_map_reduce_threshold_tokens: int | None = 16000,
+    near_duplicate_threshold: float | None = 0.85,
     val_split_ratio: float = 0.1,
     test_split_ratio: float = 0.1,
     min_document_characters: int = 50,
@@ -25,15 +29,27 @@ def generate_dataset(
     augmentation_loops: int = 4,
     max_workers: int = 10,
     data_dir: Path = Path("data/"),
+    dataset_format: DatasetFormat = "jsonl",
+    dataset_shard_size: int = 10_000,
+    dataset_append: bool = True,
+    packing_tokenizer_id: str | None = None,
+    packing_max_seq_length: int = 2048,
 ) -> None:
+    statistics = fetch_corpus_statistics(collection_name=extract_collection_name)
+    create_histograms(statistics)
+
+    dataset_dir = data_dir / "datasets" / load_dataset_id
     documents = fetch_from_mongodb(
         collection_name=extract_collection_name, limit=fetch_limit
     )
-    create_histograms(documents)
 
-    dataset = generate_summary_dataset(
+    saved_dataset_dir = generate_summary_dataset(
         documents=documents,
         summarization_model=summarization_agent_model_id,
+        output_dir=dataset_dir,
+        format=dataset_format,
+        shard_size=dataset_shard_size,
+        append=dataset_append,
         val_split_ratio=val_split_ratio,
         test_split_ratio=test_split_ratio,
         min_document_characters=min_document_characters,
@@ -42,7 +58,16 @@ def generate_dataset(
         max_workers=max_workers,
         mock=summarization_agent_mock,
         summarization_max_characters=summarization_max_characters,
+        summarization_map_reduce_threshold_tokens=summarization_map_reduce_threshold_tokens,
+        near_duplicate_threshold=near_duplicate_threshold,
     )
+    push_to_huggingface(saved_dataset_dir, load_dataset_id, format=dataset_format)
 
-    push_to_huggingface(dataset, load_dataset_id)
-    save_dataset_to_disk(dataset, output_dir=data_dir / "datasets" / load_dataset_id)
+    if packing_tokenizer_id is not None:
+        save_packed_dataset_to_disk(
+            saved_dataset_dir,
+            output_dir=data_dir / "datasets" / f"{load_dataset_id}_packed",
+            tokenizer_id=packing_tokenizer_id,
+            format=dataset_format,
+            max_seq_length=packing_max_seq_length,
+        )
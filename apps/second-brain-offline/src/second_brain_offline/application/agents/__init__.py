@@ -1,5 +1,6 @@
 from .contextual_summarization import (
     ContextualSummarizationAgent,
+    ContextualSummarizationMode,
     SimpleSummarizationAgent,
 )
 from .quality import HeuristicQualityAgent, QualityScoreAgent
@@ -9,6 +10,7 @@ __all__ = [
     "SummarizationAgent",
     "QualityScoreAgent",
     "ContextualSummarizationAgent",
+    "ContextualSummarizationMode",
     "SimpleSummarizationAgent",
     "HeuristicQualityAgent",
 ]
@@ -1,15 +1,29 @@
 import asyncio
+import json
 import os
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Literal
 
 import psutil
 from litellm import acompletion
 from loguru import logger
 from openai import AsyncOpenAI
 from pydantic import BaseModel
-from tqdm.asyncio import tqdm
 
+from second_brain_offline import tokenizer
+from second_brain_offline.application.concurrency import (
+    LoopSemaphore,
+    call_with_retries,
+    map_with_retries,
+)
 from second_brain_offline.config import settings
 
+from .summary_cache import SummaryCache
+
+ContextualSummarizationMode = Literal["chunk", "document"]
+
 
 class ContextualDocument(BaseModel):
     """A document with its chunk and contextual summarization.
@@ -23,6 +37,7 @@ class ContextualDocument(BaseModel):
     content: str
     chunk: str | None = None
     contextual_summarization: str | None = None
+    title: str | None = None
 
     def add_contextual_summarization(self, summary: str) -> "ContextualDocument":
         """Adds a contextual summary to the document.
@@ -37,6 +52,28 @@ class ContextualDocument(BaseModel):
         return self
 
 
+class ChunkContextResponseFormat(BaseModel):
+    """Format of a single chunk context returned by the language model.
+
+    Attributes:
+        chunk_id: The ID of the chunk the context belongs to.
+        context: The succinct context situating the chunk within the document.
+    """
+
+    chunk_id: int
+    context: str
+
+
+class DocumentContextsResponseFormat(BaseModel):
+    """Format of the per-chunk contexts returned by the language model.
+
+    Attributes:
+        contexts: The contexts of all the chunks sent along with the document.
+    """
+
+    contexts: list[ChunkContextResponseFormat]
+
+
 class ContextualSummarizationAgent:
     """Generates summaries for documents using LiteLLM with async support.
 
@@ -44,13 +81,56 @@ class ContextualSummarizationAgent:
     generate concise summaries while preserving key information from the original
     documents. It supports both single and batch document processing.
 
+    In "chunk" mode, the document is sent once per chunk. In "document" mode, the
+    document is sent once together with the boundaries of all its chunks, and the
+    model answers with the contexts of all the chunks at once. Documents larger
+    than `window_max_tokens` are split into windows of consecutive chunks, and
+    chunks whose context could not be parsed fall back to one call per chunk.
+
+    When gating is enabled, chunks that don't need external context (the chunk is
+    the whole document, starts with a heading or mentions the document title) get
+    the document title and their Markdown heading path instead of an LLM context.
+
     Attributes:
         max_characters: Maximum number of characters for the summary.
         model_id: The ID of the language model to use for summarization.
         mock: If True, returns mock summaries instead of using the model.
         max_concurrent_requests: Maximum number of concurrent API requests.
+        max_attempts: Maximum number of attempts per request before giving up.
+        mode: Whether to make one call per chunk or one call per document window.
+        window_max_tokens: Maximum number of document tokens sent per call in
+            "document" mode.
+        gate: If True, only ambiguous chunks are sent to the language model.
     """
 
+    CHUNK_BOUNDARY_CHARACTERS = 100
+    # Shorter titles, such as "AI" or "Go", are too ambiguous to gate on.
+    MIN_GATE_TITLE_CHARACTERS = 4
+    HEADING_PATTERN = re.compile(
+        r"^(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$", re.MULTILINE
+    )
+    FENCED_CODE_PATTERN = re.compile(
+        r"^[ \t]{0,3}(`{3,}|~{3,})[^\n]*\n.*?(?:^[ \t]{0,3}\1[`~]*[ \t]*$|\Z)",
+        re.MULTILINE | re.DOTALL,
+    )
+
+    DOCUMENT_PROMPT_TEMPLATE = """You are a helpful assistant specialized in summarizing documents relative to their chunks.
+<document> 
+{content}
+</document> 
+Here are the chunks we want to situate within the whole document, each identified by its ID, its beginning and its end 
+<chunks> 
+{chunks}
+</chunks> 
+For each chunk, please give a short succinct context of maximum {characters} characters to situate the chunk within the overall document for the purposes of improving search retrieval of the chunk. 
+Answer only with a JSON object in the following format and nothing else: 
+{{
+    "contexts": [
+        {{"chunk_id": <chunk ID>, "context": "<succinct context>"}}
+    ]
+}}
+"""
+
     SYSTEM_PROMPT_TEMPLATE = """You are a helpful assistant specialized in summarizing documents relative to a given chunk.
 <document> 
 {content}
@@ -68,18 +148,43 @@ Please give a short succinct context of maximum {characters} characters to situa
         max_characters: int = 128,
         mock: bool = False,
         max_concurrent_requests: int = 4,
+        max_attempts: int = 4,
+        mode: ContextualSummarizationMode = "chunk",
+        window_max_tokens: int = 12000,
+        gate: bool = True,
     ) -> None:
         self.model_id = model_id
         self.max_characters = max_characters
         self.mock = mock
         self.max_concurrent_requests = max_concurrent_requests
+        self.max_attempts = max_attempts
+        self.mode = mode
+        self.window_max_tokens = window_max_tokens
+        self.gate = gate
 
-    def __call__(self, content: str, chunks: list[str]) -> list[str]:
+        self._semaphore = LoopSemaphore(max_concurrent_requests)
+        self._metrics_lock = Lock()
+        self.num_chunks = 0
+        self.num_gated_chunks = 0
+
+    @property
+    def gate_rate(self) -> float:
+        """Fraction of the processed chunks that skipped the language model."""
+
+        if self.num_chunks == 0:
+            return 0.0
+
+        return self.num_gated_chunks / self.num_chunks
+
+    def __call__(
+        self, content: str, chunks: list[str], title: str | None = None
+    ) -> list[str]:
         """Process document chunks for contextual summarization.
 
         Args:
             content: The full document content
             chunks: List of document chunks to summarize
+            title: Optional title of the document
 
         Returns:
             list[str]: List of chunks with added contextual summaries
@@ -87,22 +192,44 @@ Please give a short succinct context of maximum {characters} characters to situa
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
-            results = asyncio.run(self.__summarize_context_batch(content, chunks))
+            results = asyncio.run(
+                self.__summarize_context_batch(content, chunks, title)
+            )
         else:
             results = loop.run_until_complete(
-                self.__summarize_context_batch(content, chunks)
+                self.__summarize_context_batch(content, chunks, title)
             )
 
         return results
 
+    async def acall(
+        self, content: str, chunks: list[str], title: str | None = None
+    ) -> list[str]:
+        """Asynchronously process document chunks for contextual summarization.
+
+        All the calls running on the same event loop share the
+        `max_concurrent_requests` limit.
+
+        Args:
+            content: The full document content
+            chunks: List of document chunks to summarize
+            title: Optional title of the document
+
+        Returns:
+            list[str]: List of chunks with added contextual summaries
+        """
+
+        return await self.__summarize_context_batch(content, chunks, title)
+
     async def __summarize_context_batch(
-        self, content: str, chunks: list[str]
+        self, content: str, chunks: list[str], title: str | None = None
     ) -> list[str]:
         """Asynchronously summarize multiple document chunks.
 
         Args:
             content: The full document content
             chunks: List of document chunks to summarize
+            title: Optional title of the document
 
         Returns:
             list[str]: List of chunks with added contextual summaries
@@ -117,30 +244,42 @@ Please give a short succinct context of maximum {characters} characters to situa
         )
 
         documents = [
-            ContextualDocument(content=content, chunk=chunk) for chunk in chunks
+            ContextualDocument(content=content, chunk=chunk, title=title)
+            for chunk in chunks
         ]
 
-        summarized_documents = await self.__process_batch(
-            documents, await_time_seconds=7
-        )
-        documents_with_summaries = [
-            doc
-            for doc in summarized_documents
-            if doc.contextual_summarization is not None
-        ]
-        documents_without_summaries = [
+        gated_documents = self.__gate(content, documents) if self.gate else []
+        ambiguous_documents = [
             doc for doc in documents if doc.contextual_summarization is None
         ]
+        with self._metrics_lock:
+            self.num_chunks += total_chunks
+            self.num_gated_chunks += len(gated_documents)
+        logger.debug(
+            f"Gated {len(gated_documents)}/{total_chunks} chunks that don't need an LLM context. "
+            f"Overall gate rate: {self.gate_rate:.2%}"
+        )
 
-        # Retry failed documents with increased await time
-        if documents_without_summaries:
-            logger.info(
-                f"Retrying {len(documents_without_summaries)} failed documents with increased await time..."
-            )
-            retry_results = await self.__process_batch(
-                documents_without_summaries, await_time_seconds=20
-            )
-            documents_with_summaries += retry_results
+        if self.mode == "document":
+            await self.__summarize_document_windows(content, ambiguous_documents)
+            pending_documents = [
+                doc
+                for doc in ambiguous_documents
+                if doc.contextual_summarization is None
+            ]
+            if pending_documents:
+                logger.info(
+                    f"Falling back to per-chunk calls for {len(pending_documents)} chunks without context..."
+                )
+        else:
+            pending_documents = ambiguous_documents
+
+        await map_with_retries(
+            self.__summarize_context,
+            pending_documents,
+            max_attempts=self.max_attempts,
+            semaphore=self._semaphore.get(),
+        )
 
         end_mem = process.memory_info().rss
         memory_diff = end_mem - start_mem
@@ -150,7 +289,9 @@ Please give a short succinct context of maximum {characters} characters to situa
             f"Memory difference: {memory_diff // (1024 * 1024)} MB"
         )
 
-        success_count = len(documents_with_summaries)
+        success_count = len(
+            [doc for doc in documents if doc.contextual_summarization is not None]
+        )
         failed_count = total_chunks - success_count
         logger.info(
             f"Contextual summarization results: "
@@ -159,8 +300,8 @@ Please give a short succinct context of maximum {characters} characters to situa
         )
 
         contextual_chunks = []
-        for doc in documents_with_summaries:
-            if doc.contextual_summarization is not None:
+        for doc in documents:
+            if doc.contextual_summarization:
                 chunk = f"{doc.contextual_summarization}\n\n{doc.chunk}"
             else:
                 chunk = f"{doc.chunk}"
@@ -169,94 +310,351 @@ Please give a short succinct context of maximum {characters} characters to situa
 
         return contextual_chunks
 
-    async def __process_batch(
-        self, documents: list[ContextualDocument], await_time_seconds: int
+    def __gate(
+        self, content: str, documents: list[ContextualDocument]
     ) -> list[ContextualDocument]:
-        """Process a batch of documents with specified await time.
+        """Add a heading-based context to the chunks that don't need an LLM context.
+
+        A chunk doesn't need external context if it is the whole document, if it
+        starts with a Markdown heading or if it mentions the document title as whole
+        words, for titles of at least `MIN_GATE_TITLE_CHARACTERS` characters. These
+        chunks get the document title and their heading path as context. Lines
+        starting with `#` inside fenced code blocks, such as comments, aren't
+        headings.
 
         Args:
-            documents: List of documents to summarize
-            await_time_seconds: Time in seconds to wait between requests
+            content: The full document content
+            documents: List of chunk documents to gate, modified in place
 
         Returns:
-            list[ContextualDocument]: Processed documents with summaries
+            list[ContextualDocument]: The chunk documents that skip the LLM.
         """
 
-        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-        tasks = [
-            self.__summarize_context(
-                document, semaphore, await_time_seconds=await_time_seconds
+        code_blocks = [
+            (match.start(), match.end())
+            for match in self.FENCED_CODE_PATTERN.finditer(content)
+        ]
+        headings = [
+            (match.start(), len(match.group(1)), match.group(2))
+            for match in self.HEADING_PATTERN.finditer(content)
+            if not any(start <= match.start() < end for start, end in code_blocks)
+        ]
+        heading_positions = {position for position, _, _ in headings}
+
+        gated_documents = []
+        search_start = 0
+        for document in documents:
+            chunk = document.chunk or ""
+            chunk_start = content.find(chunk, search_start)
+            if chunk_start == -1:
+                chunk_start = content.find(chunk)
+            else:
+                search_start = chunk_start
+
+            if chunk_start == -1:
+                starts_with_heading = bool(self.HEADING_PATTERN.match(chunk.lstrip()))
+            else:
+                indent = len(chunk) - len(chunk.lstrip())
+                starts_with_heading = chunk_start + indent in heading_positions
+            if not self.__is_self_contained(
+                chunk,
+                document.title,
+                is_whole_document=len(documents) == 1,
+                starts_with_heading=starts_with_heading,
+            ):
+                continue
+
+            heading_path = self.__get_heading_path(headings, chunk_start)
+            context = " > ".join(
+                part for part in [document.title, *heading_path] if part
             )
-            for document in documents
+            gated_documents.append(document.add_contextual_summarization(context))
+
+        return gated_documents
+
+    def __is_self_contained(
+        self,
+        chunk: str,
+        title: str | None,
+        is_whole_document: bool,
+        starts_with_heading: bool,
+    ) -> bool:
+        """Check whether a chunk can be understood without an LLM context.
+
+        Args:
+            chunk: The chunk to check
+            title: Optional title of the document
+            is_whole_document: Whether the chunk covers the whole document
+            starts_with_heading: Whether the chunk starts with a Markdown heading
+
+        Returns:
+            bool: True if the chunk doesn't need an LLM context.
+        """
+
+        if is_whole_document:
+            return True
+
+        if starts_with_heading:
+            return True
+
+        title = (title or "").strip()
+        if len(title) < self.MIN_GATE_TITLE_CHARACTERS:
+            return False
+
+        # Matched as whole words, so "AI" isn't found in "maintain".
+        return bool(
+            re.search(rf"(?<!\w){re.escape(title)}(?!\w)", chunk, re.IGNORECASE)
+        )
+
+    def __get_heading_path(
+        self, headings: list[tuple[int, int, str]], position: int
+    ) -> list[str]:
+        """Get the Markdown headings enclosing a position of the document.
+
+        Args:
+            headings: The (position, level, text) of every heading of the document
+            position: Position of the chunk within the document, or -1 if unknown
+
+        Returns:
+            list[str]: The enclosing headings, from the outermost to the innermost.
+        """
+
+        if position < 0:
+            return []
+
+        path: list[tuple[int, str]] = []
+        for heading_position, level, text in headings:
+            if heading_position >= position:
+                break
+
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, text))
+
+        return [text for _, text in path]
+
+    async def __summarize_document_windows(
+        self, content: str, documents: list[ContextualDocument]
+    ) -> None:
+        """Add contextual summaries to chunks using one call per document window.
+
+        Chunks whose context is missing from the model answer are left without a
+        contextual summary, so the caller can fall back to per-chunk calls.
+
+        Args:
+            content: The full document content
+            documents: List of chunk documents to summarize, modified in place
+        """
+
+        windows = self.__get_windows(content, documents)
+        logger.debug(
+            f"Summarizing {len(documents)} chunks in {len(windows)} document windows"
+        )
+
+        await map_with_retries(
+            self.__summarize_document_window,
+            windows,
+            max_attempts=self.max_attempts,
+            semaphore=self._semaphore.get(),
+            desc="Processing document windows",
+            unit="window",
+        )
+
+    def __get_windows(
+        self, content: str, documents: list[ContextualDocument]
+    ) -> list[tuple[str, list[tuple[int, ContextualDocument]]]]:
+        """Group consecutive chunks into windows that fit the token budget.
+
+        Args:
+            content: The full document content
+            documents: List of chunk documents to group
+
+        Returns:
+            list[tuple[str, list[tuple[int, ContextualDocument]]]]: The document text
+                covered by each window along with its chunks and their IDs.
+        """
+
+        windows = []
+        window: list[tuple[int, ContextualDocument]] = []
+        window_tokens = 0
+        for chunk_id, document in enumerate(documents):
+            chunk_tokens = tokenizer.count_tokens(document.chunk or "", self.model_id)
+            if window and window_tokens + chunk_tokens > self.window_max_tokens:
+                windows.append(window)
+                window, window_tokens = [], 0
+
+            window.append((chunk_id, document))
+            window_tokens += chunk_tokens
+        if window:
+            windows.append(window)
+
+        if len(windows) == 1:
+            return [(content, windows[0])]
+
+        return [
+            (self.__get_window_content(content, window), window) for window in windows
         ]
-        results = []
-        for coro in tqdm(
-            asyncio.as_completed(tasks),
-            total=len(documents),
-            desc="Processing documents",
-            unit="doc",
-        ):
-            result = await coro
-            results.append(result)
 
-        return results
+    def __get_window_content(
+        self, content: str, window: list[tuple[int, ContextualDocument]]
+    ) -> str:
+        """Get the slice of the document covered by a window of chunks.
+
+        Args:
+            content: The full document content
+            window: The chunks of the window along with their IDs
+
+        Returns:
+            str: The document text spanning from the first to the last chunk of the
+                window, or the joined chunks if they can't be located in the document.
+        """
+
+        first_chunk = window[0][1].chunk or ""
+        last_chunk = window[-1][1].chunk or ""
+        start = content.find(first_chunk)
+        end = content.find(last_chunk, max(start, 0))
+        if start == -1 or end == -1:
+            return "\n\n".join(document.chunk or "" for _, document in window)
+
+        return content[start : end + len(last_chunk)]
+
+    def __format_chunk_boundaries(
+        self, window: list[tuple[int, ContextualDocument]]
+    ) -> str:
+        """Format the chunks of a window by their ID, beginning and end.
+
+        Args:
+            window: The chunks of the window along with their IDs
+
+        Returns:
+            str: One line per chunk describing where it starts and ends.
+        """
+
+        boundary = self.CHUNK_BOUNDARY_CHARACTERS
+        lines = []
+        for chunk_id, document in window:
+            chunk = " ".join((document.chunk or "").split())
+            if len(chunk) <= 2 * boundary:
+                lines.append(f'<chunk id="{chunk_id}">{chunk}</chunk>')
+            else:
+                lines.append(
+                    f'<chunk id="{chunk_id}">{chunk[:boundary]} [...] {chunk[-boundary:]}</chunk>'
+                )
+
+        return "\n".join(lines)
+
+    async def __summarize_document_window(
+        self, window: tuple[str, list[tuple[int, ContextualDocument]]]
+    ) -> None:
+        """Generate the contextual summaries of all the chunks of a window at once.
+
+        Args:
+            window: The document text covered by the window along with its chunks
+                and their IDs
+
+        Raises:
+            Exception: If the request fails, so the caller can retry it. Answers that
+                can't be parsed are not retried, as their chunks fall back to
+                per-chunk calls.
+        """
+
+        window_content, window_documents = window
+        if self.mock:
+            for _, document in window_documents:
+                document.add_contextual_summarization("This is a mock summary")
+
+            return
+
+        response = await acompletion(
+            model=self.model_id,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.DOCUMENT_PROMPT_TEMPLATE.format(
+                        characters=self.max_characters,
+                        content=window_content,
+                        chunks=self.__format_chunk_boundaries(window_documents),
+                    ),
+                },
+            ],
+            response_format={"type": "json_object"},
+            stream=False,
+            temperature=0,
+            api_base=settings.OPENAI_BASE_URL,
+        )
+
+        if not response.choices:
+            logger.warning("No contextual summaries generated for document window")
+            return
+
+        contexts = self._parse_model_output(response.choices[0].message.content)
+        if contexts is None:
+            logger.warning("Failed to parse contextual summaries for document window")
+            return
+
+        contexts_by_chunk_id = {
+            context.chunk_id: context.context.strip()
+            for context in contexts.contexts
+            if context.context.strip()
+        }
+        for chunk_id, document in window_documents:
+            if chunk_id in contexts_by_chunk_id:
+                document.add_contextual_summarization(contexts_by_chunk_id[chunk_id])
+
+    def _parse_model_output(
+        self, answer: str | None
+    ) -> DocumentContextsResponseFormat | None:
+        if not answer:
+            return None
+
+        try:
+            return DocumentContextsResponseFormat.model_validate(json.loads(answer))
+        except Exception:
+            return None
 
     async def __summarize_context(
-        self,
-        document: ContextualDocument,
-        semaphore: asyncio.Semaphore | None = None,
-        await_time_seconds: int = 2,
+        self, document: ContextualDocument
     ) -> ContextualDocument:
         """Generate a contextual summary for a single document.
 
         Args:
             document: The document to summarize
-            semaphore: Optional semaphore for controlling concurrent requests
-            await_time_seconds: Time in seconds to wait between requests
 
         Returns:
             ContextualDocument: Document with generated summary
+
+        Raises:
+            Exception: If the request fails or no summary is generated, so the
+                caller can retry it.
         """
 
         if self.mock:
             return document.add_contextual_summarization("This is a mock summary")
 
-        async def process_document() -> ContextualDocument:
-            try:
-                response = await acompletion(
-                    model=self.model_id,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": self.SYSTEM_PROMPT_TEMPLATE.format(
-                                characters=self.max_characters,
-                                content=document.content[
-                                    :6000
-                                ],  # Keep it short to lower latency and costs.
-                                chunk=document.chunk,
-                            ),
-                        },
-                    ],
-                    stream=False,
-                    temperature=0,
-                )
-                await asyncio.sleep(await_time_seconds)  # Rate limiting
-
-                if not response.choices:
-                    logger.warning("No contextual summary generated for chunk")
-                    return document
-
-                context_summary: str = response.choices[0].message.content
-                return document.add_contextual_summarization(context_summary)
-            except Exception as e:
-                logger.warning(f"Failed to generate contextual summary: {str(e)}")
-                return document
+        response = await acompletion(
+            model=self.model_id,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.SYSTEM_PROMPT_TEMPLATE.format(
+                        characters=self.max_characters,
+                        content=document.content[
+                            :6000
+                        ],  # Keep it short to lower latency and costs.
+                        chunk=document.chunk,
+                    ),
+                },
+            ],
+            stream=False,
+            temperature=0,
+            api_base=settings.OPENAI_BASE_URL,
+        )
 
-        if semaphore:
-            async with semaphore:
-                return await process_document()
+        if not response.choices:
+            raise ValueError("No contextual summary generated for chunk")
 
-        return await process_document()
+        context_summary: str = response.choices[0].message.content
+        return document.add_contextual_summarization(context_summary)
 
 
 class SimpleSummarizationAgent:
@@ -264,13 +662,17 @@ class SimpleSummarizationAgent:
 
     This class handles the interaction with language models through LiteLLM to
     generate concise summaries while preserving key information from the original
-    documents. It supports both single and batch document processing.
+    documents. It supports both single and batch document processing. Summaries are
+    cached on disk, so the model is only called for documents it hasn't summarized
+    yet with the same settings.
 
     Attributes:
         max_characters: Maximum number of characters for the summary.
         model_id: The ID of the language model to use for summarization.
         mock: If True, returns mock summaries instead of using the model.
         max_concurrent_requests: Maximum number of concurrent API requests.
+        max_attempts: Maximum number of attempts before giving up.
+        cache: Optional persistent cache of the document summaries.
     """
 
     SYSTEM_PROMPT_TEMPLATE = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
@@ -294,6 +696,8 @@ highlighting the most significant insights. Answer only with the succinct contex
         max_characters: int = 128,
         mock: bool = False,
         max_concurrent_requests: int = 4,
+        max_attempts: int = 4,
+        cache_dir: Path | str | None = settings.SUMMARY_CACHE_DIR,
     ) -> None:
         self.model_id = model_id
         self.base_url = base_url
@@ -301,6 +705,10 @@ highlighting the most significant insights. Answer only with the succinct contex
         self.max_characters = max_characters
         self.mock = mock
         self.max_concurrent_requests = max_concurrent_requests
+        self.max_attempts = max_attempts
+        self.cache = SummaryCache(cache_dir) if cache_dir and not mock else None
+
+        self._semaphore = LoopSemaphore(max_concurrent_requests)
 
         if self.model_id == "tgi":
             assert self.base_url and self.api_key, (
@@ -312,14 +720,18 @@ highlighting the most significant insights. Answer only with the succinct contex
                 api_key=self.api_key,
             )
         else:
-            self.client = AsyncOpenAI()
+            self.client = AsyncOpenAI(base_url=settings.OPENAI_BASE_URL)
 
-    def __call__(self, content: str, chunks: list[str]) -> list[str]:
+    def __call__(
+        self, content: str, chunks: list[str], title: str | None = None
+    ) -> list[str]:
         """Process document chunks for contextual summarization.
 
         Args:
             content: The full document content
             chunks: List of document chunks to summarize
+            title: Optional title of the document. Unused, as the summary already
+                covers the whole document.
 
         Returns:
             list[str]: List of chunks with added contextual summaries
@@ -335,6 +747,26 @@ highlighting the most significant insights. Answer only with the succinct contex
 
         return results
 
+    async def acall(
+        self, content: str, chunks: list[str], title: str | None = None
+    ) -> list[str]:
+        """Asynchronously process document chunks for contextual summarization.
+
+        All the calls running on the same event loop share the
+        `max_concurrent_requests` limit.
+
+        Args:
+            content: The full document content
+            chunks: List of document chunks to summarize
+            title: Optional title of the document. Unused, as the summary already
+                covers the whole document.
+
+        Returns:
+            list[str]: List of chunks with added contextual summaries
+        """
+
+        return await self.__summarize_context_batch(content, chunks)
+
     async def __summarize_context_batch(
         self, content: str, chunks: list[str]
     ) -> list[str]:
@@ -355,9 +787,33 @@ highlighting the most significant insights. Answer only with the succinct contex
             f"Initial memory usage: {start_mem // (1024 * 1024)} MB"
         )
 
-        document = await self.__summarize(
-            document=ContextualDocument(content=content), await_time_seconds=20
-        )
+        document = ContextualDocument(content=content)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = SummaryCache.get_key(
+                content,
+                model_id=self.model_id,
+                max_characters=self.max_characters,
+                prompt=self.SYSTEM_PROMPT_TEMPLATE,
+                base_url=str(self.client.base_url),
+            )
+            summary = await asyncio.to_thread(self.cache.get, cache_key)
+            if summary is not None:
+                document.add_contextual_summarization(summary)
+
+        if document.contextual_summarization is None:
+            summarized_document = await call_with_retries(
+                self.__summarize,
+                document,
+                semaphore=self._semaphore.get(),
+                max_attempts=self.max_attempts,
+            )
+            if summarized_document is not None and cache_key is not None:
+                await asyncio.to_thread(
+                    self.cache.set,
+                    cache_key,
+                    summarized_document.contextual_summarization,
+                )
 
         end_mem = process.memory_info().rss
         memory_diff = end_mem - start_mem
@@ -378,49 +834,39 @@ highlighting the most significant insights. Answer only with the succinct contex
 
         return contextual_chunks
 
-    async def __summarize(
-        self,
-        document: ContextualDocument,
-        await_time_seconds: int = 2,
-    ) -> ContextualDocument:
+    async def __summarize(self, document: ContextualDocument) -> ContextualDocument:
         """Generate a contextual summary for a single document.
 
         Args:
             document: The document to summarize
-            await_time_seconds: Time in seconds to wait between requests
 
         Returns:
             ContextualDocument: Document with generated summary
+
+        Raises:
+            Exception: If the request fails or no summary is generated, so the
+                caller can retry it.
         """
 
         if self.mock:
             return document.add_contextual_summarization("This is a mock summary")
 
-        async def process_document() -> ContextualDocument:
-            try:
-                response = await self.client.chat.completions.create(
-                    model=self.model_id,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": self.SYSTEM_PROMPT_TEMPLATE.format(
-                                characters=self.max_characters, content=document.content
-                            ),
-                        },
-                    ],
-                    stream=False,
-                    temperature=0,
-                )
-                await asyncio.sleep(await_time_seconds)  # Rate limiting
-
-                if not response.choices:
-                    logger.warning("No contextual summary generated for chunk")
-                    return document
+        response = await self.client.chat.completions.create(
+            model=self.model_id,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.SYSTEM_PROMPT_TEMPLATE.format(
+                        characters=self.max_characters, content=document.content
+                    ),
+                },
+            ],
+            stream=False,
+            temperature=0,
+        )
 
-                context_summary: str = response.choices[0].message.content
-                return document.add_contextual_summarization(context_summary)
-            except Exception as e:
-                logger.warning(f"Failed to generate contextual summary: {str(e)}")
-                return document
+        if not response.choices:
+            raise ValueError("No contextual summary generated for document")
 
-        return await process_document()
+        context_summary: str = response.choices[0].message.content
+        return document.add_contextual_summarization(context_summary)
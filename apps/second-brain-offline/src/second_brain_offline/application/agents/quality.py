@@ -8,7 +8,8 @@ from loguru import logger
 from pydantic import BaseModel
 from tqdm.asyncio import tqdm
 
-from second_brain_offline import utils
+from second_brain_offline import tokenizer
+from second_brain_offline.config import settings
 from second_brain_offline.domain import Document
 
 
@@ -56,6 +57,8 @@ DOCUMENT:
 {document}
 """
 
+    MAX_PROMPT_TOKENS = 8192
+
     def __init__(
         self,
         model_id: str = "gpt-4o-mini",
@@ -189,17 +192,19 @@ DOCUMENT:
             return document.add_quality_score(score=0.5)
 
         async def process_document() -> Document:
-            input_user_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(
-                document=document.content
-            )
+            content = document.content
             try:
-                input_user_prompt = utils.clip_tokens(
-                    input_user_prompt, max_tokens=8192, model_id=self.model_id
+                max_content_tokens = (
+                    self.MAX_PROMPT_TOKENS - self.__count_prompt_template_tokens()
+                )
+                content = document.clip_content(
+                    max_tokens=max_content_tokens, model_id=self.model_id
                 )
             except Exception as e:
                 logger.warning(
                     f"Failed to clip tokens for document {document.id}: {str(e)}"
                 )
+            input_user_prompt = self.SYSTEM_PROMPT_TEMPLATE.format(document=content)
 
             try:
                 response = await acompletion(
@@ -208,6 +213,8 @@ DOCUMENT:
                         {"role": "user", "content": input_user_prompt},
                     ],
                     stream=False,
+                    response_format={"type": "json_object"},
+                    api_base=settings.OPENAI_BASE_URL,
                 )
                 await asyncio.sleep(await_time_seconds)  # Rate limiting
 
@@ -239,6 +246,17 @@ DOCUMENT:
 
         return await process_document()
 
+    def __count_prompt_template_tokens(self) -> int:
+        """Count the tokens of the prompt template without any document content.
+
+        Returns:
+            int: Number of tokens taken by the prompt template.
+        """
+
+        return tokenizer.count_tokens(
+            self.SYSTEM_PROMPT_TEMPLATE.format(document=""), self.model_id
+        )
+
     def _parse_model_output(
         self, answer: str | None
     ) -> QualityScoreResponseFormat | None:
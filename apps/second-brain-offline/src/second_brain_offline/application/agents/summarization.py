@@ -1,12 +1,23 @@
 import asyncio
 import os
+from functools import partial
+from typing import AsyncIterator
 
 import psutil
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from litellm import acompletion
 from loguru import logger
-from tqdm.asyncio import tqdm
 
-from second_brain_offline.domain import Document
+from second_brain_offline import tokenizer
+from second_brain_offline.application.concurrency import (
+    LoopSemaphore,
+    NonRetryableError,
+    call_with_retries,
+    map_with_retries,
+    stream_with_retries,
+)
+from second_brain_offline.config import settings
+from second_brain_offline.domain import Document, DocumentSummary
 
 
 class SummarizationAgent:
@@ -16,11 +27,24 @@ class SummarizationAgent:
     generate concise summaries while preserving key information from the original
     documents. It supports both single and batch document processing.
 
+    Documents longer than `map_reduce_threshold_tokens` are summarized with a
+    map-reduce strategy: they are split into parts of at most `map_chunk_tokens`
+    tokens, the parts are summarized concurrently and their summaries are reduced
+    into the final one. This bounds the size, and so the latency, of every request.
+    The parts and the reduction are retried individually, so a failing part never
+    makes the whole document be summarized again, and all the requests of the agent
+    share the same `max_concurrent_requests` slots.
+
     Attributes:
         max_characters: Maximum number of characters for the summary.
         model_id: The ID of the language model to use for summarization.
         mock: If True, returns mock summaries instead of using the model.
         max_concurrent_requests: Maximum number of concurrent API requests.
+        max_attempts: Maximum number of attempts per document before giving up.
+        map_reduce_threshold_tokens: Documents with more tokens are summarized with
+            map-reduce. If None, every document is summarized in a single call.
+        map_chunk_tokens: Maximum number of tokens of each part summarized in the
+            map step.
     """
 
     SYSTEM_PROMPT_TEMPLATE = """You are a helpful assistant specialized in summarizing documents.
@@ -40,17 +64,59 @@ Generate a concise TL;DR summary having a maximum of {characters} characters of
 Return the document in markdown format regardless of the original format.
 """
 
+    MAP_PROMPT_TEMPLATE = """You are a helpful assistant specialized in summarizing documents.
+Below is part {part} out of {num_parts} of a longer document.
+Summarize this part, keeping the titles of sections, tags, entities and the main findings and insights it contains.
+Ignore any irrelevant information such as cookie policies, privacy policies, HTTP errors, etc.
+
+Document part:
+{content}
+
+Generate a concise summary having a maximum of {characters} characters. Answer only with the summary and nothing else.
+"""
+
+    REDUCE_PROMPT_TEMPLATE = """You are a helpful assistant specialized in summarizing documents.
+Your task is to create a clear, concise TL;DR summary in markdown format of a long document, given the summaries of its consecutive parts.
+Things to keep in mind while summarizing:
+- titles of sections and sub-sections
+- tags such as Generative AI, LLMs, etc.
+- entities such as persons, organizations, processes, people, etc.
+- the style such as the type, sentiment and writing style of the document
+- the main findings and insights while preserving key information and main ideas
+
+Summaries of the document parts:
+{content}
+
+Generate a concise TL;DR summary having a maximum of {characters} characters of the key findings from the provided summaries, highlighting the most significant insights and implications.
+Return the document in markdown format regardless of the original format.
+"""
+
+    MAX_REDUCE_DEPTH = 3
+
     def __init__(
         self,
         max_characters: int,
         model_id: str = "gpt-4o-mini",
         mock: bool = False,
         max_concurrent_requests: int = 10,
+        max_attempts: int = 4,
+        map_reduce_threshold_tokens: int | None = 16000,
+        map_chunk_tokens: int = 8000,
     ) -> None:
         self.max_characters = max_characters
         self.model_id = model_id
         self.mock = mock
         self.max_concurrent_requests = max_concurrent_requests
+        self.max_attempts = max_attempts
+        self.map_reduce_threshold_tokens = map_reduce_threshold_tokens
+        self.map_chunk_tokens = map_chunk_tokens
+
+        self._semaphore = LoopSemaphore(max_concurrent_requests)
+        self._map_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=map_chunk_tokens,
+            chunk_overlap=0,
+            length_function=partial(tokenizer.count_tokens, model_id=model_id),
+        )
 
     def __call__(
         self, documents: Document | list[Document], temperature: float = 0.0
@@ -61,7 +127,8 @@ Return the document in markdown format regardless of the original format.
             documents: Single Document or list of Documents to summarize.
             temperature: Temperature for the summarization model.
         Returns:
-            Document | list[Document]: Processed document(s) with summaries.
+            Document | list[Document]: Processed document(s) with summaries, in the
+                same order as the input. Documents that failed keep a None summary.
         """
 
         is_single_document = isinstance(documents, Document)
@@ -78,6 +145,95 @@ Return the document in markdown format regardless of the original format.
 
         return results[0] if is_single_document else results
 
+    def generate_summaries(
+        self, requests: list[tuple[Document, float]]
+    ) -> list[DocumentSummary | None]:
+        """Summarize documents with multiple temperatures in a single concurrent batch.
+
+        Unlike `__call__`, the documents are left untouched, so the same document
+        can be summarized with several temperatures without being copied.
+
+        Args:
+            requests: Pairs of document and temperature to summarize it with.
+
+        Returns:
+            list[DocumentSummary | None]: The summary of each request, in the same
+                order as the input. Requests that failed have a None summary.
+        """
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.agenerate_summaries(requests))
+        else:
+            return loop.run_until_complete(self.agenerate_summaries(requests))
+
+    async def agenerate_summaries(
+        self, requests: list[tuple[Document, float]]
+    ) -> list[DocumentSummary | None]:
+        """Asynchronously summarize documents with multiple temperatures.
+
+        Args:
+            requests: Pairs of document and temperature to summarize it with.
+
+        Returns:
+            list[DocumentSummary | None]: The summary of each request, in the same
+                order as the input. Requests that failed have a None summary.
+        """
+
+        summaries: list[DocumentSummary | None] = [None] * len(requests)
+        async for index, summary in self.astream_summaries(requests):
+            summaries[index] = summary
+
+        success_count = len([summary for summary in summaries if summary is not None])
+        logger.info(
+            f"Summarization completed: "
+            f"{success_count}/{len(requests)} succeeded ✓ | "
+            f"{len(requests) - success_count}/{len(requests)} failed ✗"
+        )
+
+        return summaries
+
+    async def astream_summaries(
+        self, requests: list[tuple[Document, float]]
+    ) -> AsyncIterator[tuple[int, DocumentSummary | None]]:
+        """Summarize documents with multiple temperatures, yielding each summary as
+        soon as it is done.
+
+        Every LLM call of a request, including the parts of map-reduce summaries,
+        takes a slot of the agent's semaphore, so the stream shares the
+        `max_concurrent_requests` limit with all the other calls of the agent.
+
+        Args:
+            requests: Pairs of document and temperature to summarize it with.
+
+        Yields:
+            tuple[int, DocumentSummary | None]: The index of the request within
+                `requests` and its summary, in completion order. Requests that
+                failed have a None summary.
+        """
+
+        async def summarize_request(
+            request: tuple[Document, float],
+        ) -> DocumentSummary:
+            document, temperature = request
+            summary = await self.__generate_summary(document, temperature=temperature)
+
+            return DocumentSummary(
+                document_id=document.id, temperature=temperature, summary=summary
+            )
+
+        # The requests take the agent's semaphore for each of their calls, so it
+        # can't also be held for the whole request: a map-reduce request would
+        # wait for its own parts.
+        async for index, summary in stream_with_retries(
+            summarize_request,
+            requests,
+            max_concurrent_requests=self.max_concurrent_requests,
+            max_attempts=self.max_attempts,
+        ):
+            yield index, summary
+
     async def __summarize_batch(
         self, documents: list[Document], temperature: float = 0.0
     ) -> list[Document]:
@@ -87,7 +243,7 @@ Return the document in markdown format regardless of the original format.
             documents: List of documents to summarize.
             temperature: Temperature for the summarization model.
         Returns:
-            list[Document]: Documents with generated summaries.
+            list[Document]: Documents with generated summaries, in the input order.
         """
         process = psutil.Process(os.getpid())
         start_mem = process.memory_info().rss
@@ -97,23 +253,12 @@ Return the document in markdown format regardless of the original format.
             f"Current process memory usage: {start_mem // (1024 * 1024)} MB"
         )
 
-        summarized_documents = await self.__process_batch(
-            documents, temperature, await_time_seconds=7
+        await map_with_retries(
+            partial(self.__summarize, temperature=temperature),
+            documents,
+            max_concurrent_requests=self.max_concurrent_requests,
+            max_attempts=self.max_attempts,
         )
-        documents_with_summaries = [
-            doc for doc in summarized_documents if doc.summary is not None
-        ]
-        documents_without_summaries = [doc for doc in documents if doc.summary is None]
-
-        # Retry failed documents with increased await time
-        if documents_without_summaries:
-            logger.info(
-                f"Retrying {len(documents_without_summaries)} failed documents with increased await time..."
-            )
-            retry_results = await self.__process_batch(
-                documents_without_summaries, temperature, await_time_seconds=20
-            )
-            documents_with_summaries += retry_results
 
         end_mem = process.memory_info().rss
         memory_diff = end_mem - start_mem
@@ -123,7 +268,7 @@ Return the document in markdown format regardless of the original format.
             f"Memory diff: {memory_diff // (1024 * 1024)} MB"
         )
 
-        success_count = len(documents_with_summaries)
+        success_count = len([doc for doc in documents if doc.summary is not None])
         failed_count = total_docs - success_count
         logger.info(
             f"Summarization completed: "
@@ -131,87 +276,178 @@ Return the document in markdown format regardless of the original format.
             f"{failed_count}/{total_docs} failed ✗"
         )
 
-        return documents_with_summaries
+        return documents
 
-    async def __process_batch(
-        self, documents: list[Document], temperature: float, await_time_seconds: int
-    ) -> list[Document]:
-        """Process a batch of documents with specified await time.
+    async def __summarize(
+        self,
+        document: Document,
+        temperature: float = 0.0,
+    ) -> Document:
+        """Generate a summary for a single document.
 
         Args:
-            documents: List of documents to summarize.
+            document: The Document object to summarize.
             temperature: Temperature for the summarization model.
-            await_time_seconds: Time to wait between requests.
         Returns:
-            list[Document]: Processed documents with summaries.
+            Document: Document with generated summary.
+
+        Raises:
+            Exception: If the request fails or no summary is generated, so the
+                caller can retry it.
         """
-        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-        tasks = [
-            self.__summarize(
-                document, semaphore, temperature, await_time_seconds=await_time_seconds
-            )
-            for document in documents
-        ]
-        results = []
-        for coro in tqdm(
-            asyncio.as_completed(tasks),
-            total=len(documents),
-            desc="Processing documents",
-            unit="doc",
-        ):
-            result = await coro
-            results.append(result)
 
-        return results
+        summary = await self.__generate_summary(document, temperature=temperature)
 
-    async def __summarize(
-        self,
-        document: Document,
-        semaphore: asyncio.Semaphore | None = None,
-        temperature: float = 0.0,
-        await_time_seconds: int = 2,
-    ) -> Document:
-        """Generate a summary for a single document.
+        return document.add_summary(summary)
+
+    async def __generate_summary(
+        self, document: Document, temperature: float = 0.0
+    ) -> str:
+        """Generate the summary of a document without modifying it.
 
         Args:
             document: The Document object to summarize.
-            semaphore: Optional semaphore for controlling concurrent requests.
             temperature: Temperature for the summarization model.
+
         Returns:
-            Document | None: Document with generated summary or None if failed.
+            str: The generated summary.
+
+        Raises:
+            Exception: If the request fails or no summary is generated.
+            NonRetryableError: If a long document failed to be summarized after its
+                parts were already retried.
         """
+
         if self.mock:
-            return document.add_summary("This is a mock summary")
-
-        async def process_document():
-            try:
-                response = await acompletion(
-                    model=self.model_id,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": self.SYSTEM_PROMPT_TEMPLATE.format(
-                                characters=self.max_characters, content=document.content
-                            ),
-                        },
-                    ],
-                    stream=False,
+            return "This is a mock summary"
+
+        if (
+            self.map_reduce_threshold_tokens is not None
+            and document.count_tokens(self.model_id) > self.map_reduce_threshold_tokens
+        ):
+            summary = await self.__summarize_map_reduce(
+                document.content, temperature=temperature
+            )
+        else:
+            async with self._semaphore.get():
+                summary = await self.__complete(
+                    self.SYSTEM_PROMPT_TEMPLATE.format(
+                        characters=self.max_characters, content=document.content
+                    ),
                     temperature=temperature,
                 )
-                await asyncio.sleep(await_time_seconds)  # Rate limiting
 
-                if not response.choices:
-                    logger.warning(f"No summary generated for document {document.id}")
-                    return document
+        return summary
+
+    async def __summarize_map_reduce(
+        self, content: str, temperature: float = 0.0, depth: int = 1
+    ) -> str:
+        """Summarize a long text by summarizing its parts and reducing their summaries.
+
+        If the part summaries are still too long to fit in a single request, they
+        are summarized again, up to `MAX_REDUCE_DEPTH` levels.
+
+        Args:
+            content: The text to summarize.
+            temperature: Temperature for the summarization model.
+            depth: Current level of the map-reduce hierarchy.
+
+        Returns:
+            str: The summary of the text.
+
+        Raises:
+            NonRetryableError: If the summary of any part, or their reduction, failed
+                after all its attempts.
+        """
+
+        parts = await asyncio.to_thread(self._map_splitter.split_text, content)
+        logger.debug(
+            f"Summarizing {len(parts)} parts of a long document (level {depth})"
+        )
 
-                summary: str = response.choices[0].message.content
-                return document.add_summary(summary)
-            except Exception as e:
-                logger.warning(f"Failed to summarize document {document.id}: {str(e)}")
-                return document
+        async def summarize_part(part: tuple[int, str]) -> str:
+            index, part_content = part
+
+            return await self.__complete(
+                self.MAP_PROMPT_TEMPLATE.format(
+                    part=index + 1,
+                    num_parts=len(parts),
+                    characters=self.max_characters,
+                    content=part_content,
+                ),
+                temperature=temperature,
+            )
+
+        part_summaries = await map_with_retries(
+            summarize_part,
+            list(enumerate(parts)),
+            max_attempts=self.max_attempts,
+            desc="Summarizing document parts",
+            unit="part",
+            semaphore=self._semaphore.get(),
+        )
+        if any(part_summary is None for part_summary in part_summaries):
+            raise NonRetryableError("Failed to summarize every part of the document")
+
+        combined_summaries = "\n\n".join(
+            f"Part {index + 1}:\n{part_summary}"
+            for index, part_summary in enumerate(part_summaries)
+        )
+        if (
+            tokenizer.count_tokens(combined_summaries, self.model_id)
+            > self.map_chunk_tokens
+            and depth < self.MAX_REDUCE_DEPTH
+        ):
+            return await self.__summarize_map_reduce(
+                combined_summaries, temperature=temperature, depth=depth + 1
+            )
+
+        summary = await call_with_retries(
+            partial(self.__complete, temperature=temperature),
+            self.REDUCE_PROMPT_TEMPLATE.format(
+                characters=self.max_characters,
+                content=tokenizer.truncate(
+                    combined_summaries, self.map_chunk_tokens, self.model_id
+                ),
+            ),
+            semaphore=self._semaphore.get(),
+            max_attempts=self.max_attempts,
+        )
+        if summary is None:
+            raise NonRetryableError("Failed to reduce the summaries of the document")
+
+        return summary
+
+    async def __complete(self, prompt: str, temperature: float = 0.0) -> str:
+        """Send a single summarization request to the model.
+
+        The caller is expected to hold a slot of the agent's semaphore.
+
+        Args:
+            prompt: The system prompt of the request.
+            temperature: Temperature for the summarization model.
+
+        Returns:
+            str: The generated summary.
+
+        Raises:
+            ValueError: If no summary is generated.
+        """
+
+        response = await acompletion(
+            model=self.model_id,
+            messages=[
+                {
+                    "role": "system",
+                    "content": prompt,
+                },
+            ],
+            stream=False,
+            temperature=temperature,
+            api_base=settings.OPENAI_BASE_URL,
+        )
 
-        if semaphore:
-            async with semaphore:
-                return await process_document()
+        if not response.choices:
+            raise ValueError("No summary generated")
 
-        return await process_document()
+        return response.choices[0].message.content
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from threading import Lock
+
+from loguru import logger
+
+
+class SummaryCache:
+    """A persistent cache of document summaries, shared by all the runs using it.
+
+    Every summary is stored in its own JSON file named after a hash of the document
+    content, the model and the endpoint serving it, the character budget and the
+    prompt, so the same document summarized with the same settings is only sent to
+    the model once, whichever pipeline or chunk size it is indexed with. Files are
+    written atomically, so concurrent runs can safely share the same directory.
+
+    Attributes:
+        cache_dir: Directory where the summaries are stored.
+        num_hits: Number of lookups that found a summary.
+        num_misses: Number of lookups that didn't find a summary.
+    """
+
+    def __init__(self, cache_dir: Path | str) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.num_hits = 0
+        self.num_misses = 0
+
+        self._metrics_lock = Lock()
+
+    @staticmethod
+    def get_key(
+        content: str,
+        model_id: str,
+        max_characters: int,
+        prompt: str,
+        base_url: str | None = None,
+    ) -> str:
+        """Compute the cache key of a document summary.
+
+        Args:
+            content: The full document content.
+            model_id: The ID of the model generating the summary.
+            max_characters: Maximum number of characters of the summary.
+            prompt: The prompt template used to generate the summary, so changing
+                it invalidates the cached summaries.
+            base_url: The URL of the endpoint serving the model. Model IDs such as
+                "tgi" don't name the served model, so pointing them at another
+                endpoint must invalidate the cached summaries.
+
+        Returns:
+            str: The hex digest identifying the summary.
+        """
+
+        hasher = hashlib.sha256()
+        for part in (model_id, base_url or "", str(max_characters), prompt, content):
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\0")
+
+        return hasher.hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lookups that found a summary."""
+
+        num_lookups = self.num_hits + self.num_misses
+        if num_lookups == 0:
+            return 0.0
+
+        return self.num_hits / num_lookups
+
+    def get(self, key: str) -> str | None:
+        """Get a cached summary.
+
+        Args:
+            key: The cache key of the summary.
+
+        Returns:
+            str | None: The cached summary or None if it isn't cached.
+        """
+
+        path = self.__get_path(key)
+        try:
+            summary = json.loads(path.read_text(encoding="utf-8"))["summary"]
+        except FileNotFoundError:
+            summary = None
+        except (json.JSONDecodeError, KeyError) as e:
+            logger.warning(f"Ignoring corrupted cached summary at {path}: {str(e)}")
+            summary = None
+
+        with self._metrics_lock:
+            if summary is None:
+                self.num_misses += 1
+            else:
+                self.num_hits += 1
+
+        return summary
+
+    def set(self, key: str, summary: str) -> None:
+        """Cache a summary.
+
+        Args:
+            key: The cache key of the summary.
+            summary: The summary to cache.
+        """
+
+        path = self.__get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"summary": summary}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def __get_path(self, key: str) -> Path:
+        # Shard by the key prefix to avoid huge directories.
+        return self.cache_dir / key[:2] / f"{key}.json"
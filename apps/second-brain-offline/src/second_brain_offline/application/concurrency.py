@@ -0,0 +1,378 @@
+import asyncio
+import random
+import time
+import weakref
+from threading import Lock
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Sequence,
+    TypeVar,
+)
+
+from loguru import logger
+from pydantic import BaseModel
+from tqdm.asyncio import tqdm
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_END_OF_STAGE = object()
+
+
+class NonRetryableError(Exception):
+    """A failure that retrying the same call wouldn't fix.
+
+    For example, a call whose own sub-requests were already retried raises it, so
+    the caller doesn't retry all the sub-requests again.
+    """
+
+
+async def call_with_retries(
+    func: Callable[[T], Awaitable[R]],
+    item: T,
+    semaphore: asyncio.Semaphore | None = None,
+    max_attempts: int = 4,
+    initial_backoff_seconds: float = 1.0,
+    max_backoff_seconds: float = 30.0,
+) -> R | None:
+    """Call an async function, retrying failures with exponential backoff and jitter.
+
+    The semaphore is only held while the function runs, so requests waiting for
+    their next attempt don't take a concurrency slot.
+
+    Args:
+        func: Async function to call. Any exception it raises counts as a failure.
+        item: The argument passed to the function.
+        semaphore: Optional semaphore for controlling concurrent requests.
+        max_attempts: Maximum number of attempts before giving up.
+        initial_backoff_seconds: Backoff before the first retry. It doubles after
+            every failed attempt.
+        max_backoff_seconds: Upper bound of the backoff between two attempts.
+
+    Returns:
+        R | None: The result of the function or None if every attempt failed, or if
+            it raised a `NonRetryableError`.
+    """
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            if semaphore:
+                async with semaphore:
+                    return await func(item)
+
+            return await func(item)
+        except asyncio.CancelledError:
+            raise
+        except NonRetryableError as e:
+            logger.warning(f"Request failed on attempt {attempt}, not retrying: {str(e)}")
+
+            return None
+        except Exception as e:
+            if attempt == max_attempts:
+                logger.warning(f"Request failed after {attempt} attempts: {str(e)}")
+
+                return None
+
+            backoff_seconds = min(
+                max_backoff_seconds, initial_backoff_seconds * 2 ** (attempt - 1)
+            )
+            # Equal jitter, so concurrent requests that failed together don't retry together.
+            backoff_seconds = backoff_seconds / 2 + random.uniform(
+                0, backoff_seconds / 2
+            )
+            logger.debug(
+                f"Request failed on attempt {attempt}/{max_attempts}: {str(e)}. "
+                f"Retrying in {backoff_seconds:.1f} seconds..."
+            )
+            await asyncio.sleep(backoff_seconds)
+
+    return None
+
+
+async def stream_with_retries(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    max_concurrent_requests: int = 4,
+    max_attempts: int = 4,
+    initial_backoff_seconds: float = 1.0,
+    max_backoff_seconds: float = 30.0,
+    desc: str = "Processing documents",
+    unit: str = "doc",
+    semaphore: asyncio.Semaphore | None = None,
+) -> AsyncIterator[tuple[int, R | None]]:
+    """Concurrently apply an async function to items, yielding results as they complete.
+
+    Every item is retried independently, so a failing or slow request never holds
+    back the others.
+
+    Args:
+        func: Async function applied to every item.
+        items: The items to process.
+        max_concurrent_requests: Maximum number of concurrent calls.
+        max_attempts: Maximum number of attempts per item.
+        initial_backoff_seconds: Backoff before the first retry of an item.
+        max_backoff_seconds: Upper bound of the backoff between two attempts.
+        desc: Description of the progress bar.
+        unit: Unit of the progress bar.
+        semaphore: Optional semaphore shared with other callers. If provided, it
+            bounds the concurrent calls instead of `max_concurrent_requests`.
+
+    Yields:
+        tuple[int, R | None]: The index of the item within `items` and its result,
+            or None if every attempt failed.
+    """
+
+    semaphore = semaphore or asyncio.Semaphore(max_concurrent_requests)
+
+    async def process_item(index: int, item: T) -> tuple[int, R | None]:
+        result = await call_with_retries(
+            func,
+            item,
+            semaphore=semaphore,
+            max_attempts=max_attempts,
+            initial_backoff_seconds=initial_backoff_seconds,
+            max_backoff_seconds=max_backoff_seconds,
+        )
+
+        return index, result
+
+    tasks = [
+        asyncio.ensure_future(process_item(index, item))
+        for index, item in enumerate(items)
+    ]
+    try:
+        for coro in tqdm(
+            asyncio.as_completed(tasks), total=len(tasks), desc=desc, unit=unit
+        ):
+            yield await coro
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def map_with_retries(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    max_concurrent_requests: int = 4,
+    max_attempts: int = 4,
+    initial_backoff_seconds: float = 1.0,
+    max_backoff_seconds: float = 30.0,
+    desc: str = "Processing documents",
+    unit: str = "doc",
+    semaphore: asyncio.Semaphore | None = None,
+) -> list[R | None]:
+    """Concurrently apply an async function to items, preserving the input order.
+
+    Args:
+        func: Async function applied to every item.
+        items: The items to process.
+        max_concurrent_requests: Maximum number of concurrent calls.
+        max_attempts: Maximum number of attempts per item.
+        initial_backoff_seconds: Backoff before the first retry of an item.
+        max_backoff_seconds: Upper bound of the backoff between two attempts.
+        desc: Description of the progress bar.
+        unit: Unit of the progress bar.
+        semaphore: Optional semaphore shared with other callers. If provided, it
+            bounds the concurrent calls instead of `max_concurrent_requests`.
+
+    Returns:
+        list[R | None]: The result of each item, in the same order as `items`. Items
+            whose every attempt failed have a None result.
+    """
+
+    results: list[R | None] = [None] * len(items)
+    async for index, result in stream_with_retries(
+        func,
+        items,
+        max_concurrent_requests=max_concurrent_requests,
+        max_attempts=max_attempts,
+        initial_backoff_seconds=initial_backoff_seconds,
+        max_backoff_seconds=max_backoff_seconds,
+        desc=desc,
+        unit=unit,
+        semaphore=semaphore,
+    ):
+        results[index] = result
+
+    return results
+
+
+class StageMetrics(BaseModel):
+    """Throughput and backpressure metrics of a pipeline stage.
+
+    Attributes:
+        name: Name of the stage.
+        max_workers: Number of concurrent workers of the stage.
+        num_items: Number of items processed successfully.
+        num_failed_items: Number of items that raised an exception.
+        busy_seconds: Total time spent by the workers processing items.
+        elapsed_seconds: Wall time between the first and the last processed item.
+        max_queue_depth: Maximum number of items waiting in the stage's input queue.
+        mean_queue_depth: Average number of items waiting in the stage's input queue.
+    """
+
+    name: str
+    max_workers: int
+    num_items: int = 0
+    num_failed_items: int = 0
+    busy_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    max_queue_depth: int = 0
+    mean_queue_depth: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Number of items processed per second of wall time."""
+
+        if self.elapsed_seconds == 0:
+            return 0.0
+
+        return self.num_items / self.elapsed_seconds
+
+
+class Stage:
+    """A step of a staged pipeline, run by a fixed number of concurrent workers.
+
+    Attributes:
+        name: Name of the stage, used for logging and metrics.
+        func: Async function applied to every item. Its result is passed to the
+            next stage, unless it is None.
+        max_workers: Number of concurrent workers of the stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Awaitable[Any]],
+        max_workers: int = 1,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.max_workers = max_workers
+
+
+async def run_stages(
+    items: Iterable[Any], stages: Sequence[Stage], queue_size: int = 16
+) -> list[StageMetrics]:
+    """Run items through a sequence of stages connected by bounded queues.
+
+    Each stage pulls items from its input queue as soon as they are available, so
+    all the stages work at the same time. When a queue is full, the stage feeding
+    it waits, which bounds the number of in-flight items. Items whose function
+    raises are logged and dropped.
+
+    Args:
+        items: The items fed to the first stage.
+        stages: The stages to run, in order.
+        queue_size: Maximum number of items waiting in front of each stage.
+
+    Returns:
+        list[StageMetrics]: The metrics of each stage, in the same order.
+    """
+
+    queues: list[asyncio.Queue] = [
+        asyncio.Queue(maxsize=queue_size) for _ in range(len(stages))
+    ]
+    metrics = [
+        StageMetrics(name=stage.name, max_workers=stage.max_workers)
+        for stage in stages
+    ]
+    queue_depths: list[list[int]] = [[] for _ in stages]
+    first_started_at: list[float | None] = [None for _ in stages]
+    last_finished_at: list[float | None] = [None for _ in stages]
+
+    async def feed() -> None:
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0].max_workers):
+            await queues[0].put(_END_OF_STAGE)
+
+    async def work(stage_index: int) -> None:
+        stage = stages[stage_index]
+        stage_metrics = metrics[stage_index]
+        input_queue = queues[stage_index]
+        output_queue = (
+            queues[stage_index + 1] if stage_index + 1 < len(stages) else None
+        )
+        while True:
+            queue_depths[stage_index].append(input_queue.qsize())
+            item = await input_queue.get()
+            if item is _END_OF_STAGE:
+                return
+
+            started_at = time.perf_counter()
+            if first_started_at[stage_index] is None:
+                first_started_at[stage_index] = started_at
+            try:
+                result = await stage.func(item)
+            except Exception as e:
+                stage_metrics.num_failed_items += 1
+                logger.warning(
+                    f"Stage '{stage.name}' failed to process item: {str(e)}"
+                )
+                continue
+            finally:
+                last_finished_at[stage_index] = time.perf_counter()
+                stage_metrics.busy_seconds += last_finished_at[stage_index] - started_at
+
+            stage_metrics.num_items += 1
+            if output_queue is not None and result is not None:
+                await output_queue.put(result)
+
+    async def run_stage(stage_index: int) -> None:
+        await asyncio.gather(
+            *[work(stage_index) for _ in range(stages[stage_index].max_workers)]
+        )
+        if stage_index + 1 < len(stages):
+            for _ in range(stages[stage_index + 1].max_workers):
+                await queues[stage_index + 1].put(_END_OF_STAGE)
+
+    await asyncio.gather(
+        feed(), *[run_stage(stage_index) for stage_index in range(len(stages))]
+    )
+
+    for stage_index, stage_metrics in enumerate(metrics):
+        depths = queue_depths[stage_index]
+        stage_metrics.max_queue_depth = max(depths, default=0)
+        stage_metrics.mean_queue_depth = sum(depths) / len(depths) if depths else 0.0
+        if first_started_at[stage_index] is not None:
+            stage_metrics.elapsed_seconds = (
+                last_finished_at[stage_index] - first_started_at[stage_index]
+            )
+
+    return metrics
+
+
+class LoopSemaphore:
+    """A semaphore shared by all the callers running on the same event loop.
+
+    asyncio semaphores are bound to the event loop they are first used on, so a
+    separate semaphore is lazily created for every running loop.
+
+    Attributes:
+        value: Maximum number of concurrent holders on each event loop.
+    """
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = Lock()
+
+    def get(self) -> asyncio.Semaphore:
+        """Get the semaphore of the running event loop.
+
+        Returns:
+            asyncio.Semaphore: The semaphore shared on the running event loop.
+        """
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(self.value)
+
+            return self._semaphores[loop]
@@ -59,11 +59,24 @@ class Crawl4AICrawler:
         semaphore = asyncio.Semaphore(self.max_concurrent_requests)
         all_results = []
 
+        # Document IDs are derived from the URLs, so URLs linked from multiple pages
+        # or pointing to already known documents are crawled only once.
+        crawled_document_ids = {page.id for page in pages}
+        num_skipped_urls = 0
         async with AsyncWebCrawler(cache_mode=CacheMode.BYPASS) as crawler:
             for page in pages:
+                urls = []
+                for url in page.child_urls:
+                    document_id = utils.generate_url_id(url)
+                    if document_id in crawled_document_ids:
+                        num_skipped_urls += 1
+                        continue
+
+                    crawled_document_ids.add(document_id)
+                    urls.append(url)
+
                 tasks = [
-                    self.__crawl_url(crawler, page, url, semaphore)
-                    for url in page.child_urls
+                    self.__crawl_url(crawler, page, url, semaphore) for url in urls
                 ]
                 results = await asyncio.gather(*tasks)
                 all_results.extend(results)
@@ -84,7 +97,8 @@ class Crawl4AICrawler:
         logger.info(
             f"Crawling completed: "
             f"{success_count}/{total_count} succeeded ✓ | "
-            f"{failed_count}/{total_count} failed ✗"
+            f"{failed_count}/{total_count} failed ✗ | "
+            f"{num_skipped_urls} already crawled URLs skipped"
         )
 
         return successful_results
@@ -129,7 +143,7 @@ class Crawl4AICrawler:
             else:
                 title = ""
 
-            document_id = utils.generate_random_hex(length=32)
+            document_id = utils.generate_url_id(url)
 
             return Document(
                 id=document_id,
@@ -0,0 +1,113 @@
+import re
+
+from pydantic import BaseModel
+
+from second_brain_offline.domain import DocumentSummary
+
+
+class DeduplicationStats(BaseModel):
+    """How much near-duplicate pruning shrank a set of summaries.
+
+    Attributes:
+        num_summaries_before: Number of summaries before pruning.
+        num_summaries_after: Number of summaries kept after pruning.
+    """
+
+    num_summaries_before: int
+    num_summaries_after: int
+
+    @property
+    def num_removed(self) -> int:
+        """Number of summaries pruned as near-duplicates."""
+
+        return self.num_summaries_before - self.num_summaries_after
+
+    @property
+    def removed_ratio(self) -> float:
+        """Fraction of the summaries pruned as near-duplicates."""
+
+        if self.num_summaries_before == 0:
+            return 0.0
+
+        return self.num_removed / self.num_summaries_before
+
+
+def deduplicate_summaries(
+    summaries: list[DocumentSummary],
+    similarity_threshold: float = 0.85,
+    ngram_size: int = 5,
+) -> tuple[list[DocumentSummary], DeduplicationStats]:
+    """Drop the summaries that are near-identical to another summary of the same document.
+
+    Summaries are compared with the Jaccard similarity of their character n-grams,
+    only against the other summaries of the same document, as those are the ones
+    sharing an instruction. The first summary of a group of near-duplicates is
+    kept, so with summaries ordered by temperature, the least random one is kept.
+
+    Args:
+        summaries: The summaries to deduplicate.
+        similarity_threshold: Summaries whose similarity with an already kept summary
+            of the same document is greater or equal are dropped.
+        ngram_size: Number of characters of the compared n-grams.
+
+    Returns:
+        tuple[list[DocumentSummary], DeduplicationStats]: The kept summaries, in their
+            original order, and how much the summaries shrank.
+    """
+
+    kept_ngrams: dict[str, list[set[str]]] = {}
+    kept_summaries = []
+    for summary in summaries:
+        ngrams = get_ngrams(summary.summary, ngram_size=ngram_size)
+        document_ngrams = kept_ngrams.setdefault(summary.document_id, [])
+        if any(
+            jaccard_similarity(ngrams, other_ngrams) >= similarity_threshold
+            for other_ngrams in document_ngrams
+        ):
+            continue
+
+        document_ngrams.append(ngrams)
+        kept_summaries.append(summary)
+
+    stats = DeduplicationStats(
+        num_summaries_before=len(summaries), num_summaries_after=len(kept_summaries)
+    )
+
+    return kept_summaries, stats
+
+
+def get_ngrams(text: str, ngram_size: int = 5) -> set[str]:
+    """Get the character n-grams of a text, ignoring case and whitespace changes.
+
+    Args:
+        text: The text to split into n-grams.
+        ngram_size: Number of characters of every n-gram.
+
+    Returns:
+        set[str]: The distinct n-grams of the text. Texts shorter than an n-gram
+            are returned as a single n-gram.
+    """
+
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    if len(text) <= ngram_size:
+        return {text}
+
+    return {text[i : i + ngram_size] for i in range(len(text) - ngram_size + 1)}
+
+
+def jaccard_similarity(a: set[str], b: set[str]) -> float:
+    """Compute the Jaccard similarity of two sets.
+
+    Args:
+        a: The first set.
+        b: The second set.
+
+    Returns:
+        float: The size of the intersection divided by the size of the union, or 1.0
+            if both sets are empty.
+    """
+
+    if not a and not b:
+        return 1.0
+
+    return len(a & b) / len(a | b)
@@ -1,19 +1,27 @@
-import copy
-from typing import Callable
+import asyncio
+from typing import Callable, TypeVar
 
 from loguru import logger
 
 from second_brain_offline.application.agents import SummarizationAgent
-from second_brain_offline.domain import Document, InstructDataset
-from second_brain_offline.domain.dataset import InstructDatasetSample
+from second_brain_offline.domain import (
+    Document,
+    DocumentSummary,
+    ShardedDatasetWriter,
+)
+from second_brain_offline.domain.dataset import InstructDatasetSample, get_split
+
+from .deduplication import DeduplicationStats, deduplicate_summaries
+
+T = TypeVar("T")
 
 
 class SummarizationDatasetGenerator:
     """Generates an instruction dataset from documents by creating summaries.
 
     This class takes a list of documents and generates summaries using a specified
-    language model. The resulting dataset can be split into training, validation,
-    and test sets.
+    language model. The resulting samples are streamed to training, validation and
+    test shards.
 
     Args:
         summarization_model: Name/ID of the model to use for summarization.
@@ -26,6 +34,11 @@ class SummarizationDatasetGenerator:
         min_quality_score: Minimum content quality score for document filtering.
         max_summary_length_factor: Maximum factor to multiply summarization_max_characters for filtering.
         augmentation_loops: Number of loops for summarization.
+        map_reduce_threshold_tokens: Documents with more tokens are summarized with
+            map-reduce. If None, every document is summarized in a single call.
+        near_duplicate_threshold: Summaries whose character n-gram similarity with
+            another summary of the same document is at least this threshold are
+            dropped. If None, near-duplicates are kept.
     """
 
     def __init__(
@@ -40,6 +53,8 @@ class SummarizationDatasetGenerator:
         min_quality_score: float = 0.3,
         max_summary_length_factor: float = 2,
         augmentation_loops: int = 4,
+        map_reduce_threshold_tokens: int | None = 16000,
+        near_duplicate_threshold: float | None = 0.85,
     ) -> None:
         self.summarization_model = summarization_model
         self.summarization_max_characters = summarization_max_characters
@@ -51,30 +66,37 @@ class SummarizationDatasetGenerator:
         self.min_quality_score = min_quality_score
         self.max_summary_length_factor = max_summary_length_factor
         self.augmentation_loops = augmentation_loops
+        self.map_reduce_threshold_tokens = map_reduce_threshold_tokens
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.deduplication_stats: DeduplicationStats | None = None
 
         self.pregeneration_filters: list[Callable[[Document], bool]] = [
             lambda document: len(document.content) > self.min_document_length,
             lambda document: document.content_quality_score is None
             or document.content_quality_score >= self.min_quality_score,
         ]
-        self.postgeneration_filters: list[Callable[[Document], bool]] = [
-            lambda document: document.summary is not None
-            and len(document.summary)
+        self.postgeneration_filters: list[Callable[[DocumentSummary], bool]] = [
+            lambda summary: len(summary.summary)
             < int(self.summarization_max_characters * self.max_summary_length_factor),
         ]
 
-    def generate(self, documents: list[Document]) -> InstructDataset:
-        """Generates an instruction dataset from the documents.
+    def generate(
+        self, documents: list[Document], writer: ShardedDatasetWriter
+    ) -> dict[str, int]:
+        """Generates an instruction dataset from the documents, streaming it to disk.
 
         Filters, summarizes documents and converts them into instruction-answer pairs.
+        The samples of a document are written to its split as soon as all its
+        summaries are done, so only the summaries of the documents in flight are kept
+        in memory. The split of a document is decided by a stable hash of its ID.
         Warns if input document count is less than recommended minimum of 10.
 
         Args:
             documents: List of Document objects to be processed into the dataset.
+            writer: Writer of the dataset shards the samples are written to.
 
         Returns:
-            InstructDataset containing instruction-answer pairs where instructions are
-            document contents and answers are generated summaries.
+            dict[str, int]: Number of samples written to each split.
 
         Warns:
             If less than 10 documents are provided for processing.
@@ -85,32 +107,6 @@ class SummarizationDatasetGenerator:
                 "Less than 10 documents to summarize. For accurate behavior we recommend having at least 10 documents."
             )
 
-        filtered_summarized_documents = self.__summarize_documents(documents)
-        instruct_dataset_samples = [
-            self.__to_instruct_dataset_sample(summarized_document)
-            for summarized_document in filtered_summarized_documents
-            if summarized_document
-        ]
-        logger.info(f"Num instruct dataset samples: {len(instruct_dataset_samples)}")
-
-        return InstructDataset.from_samples(
-            samples=instruct_dataset_samples,
-            val_split_ratio=self.val_split_ratio,
-            test_split_ratio=self.test_split_ratio,
-            seed=42,
-        )
-
-    def __summarize_documents(self, documents: list[Document]) -> list[Document]:
-        """Summarizes the filtered documents using a summarization agent.
-
-        Args:
-            documents: List of documents to summarize
-
-        Returns:
-            list[Document]: List of documents with generated summaries that pass
-                both pre and post-generation filters
-        """
-
         logger.info(f"Num documents before pregeneration filtering: {len(documents)}")
         filtered_documents = self.filter_documents(
             self.pregeneration_filters, documents
@@ -118,33 +114,34 @@ class SummarizationDatasetGenerator:
         logger.info(
             f"Num documents after pregeneration filtering: {len(filtered_documents)}"
         )
-        summarized_documents: list[Document] = self.__augmented_summarization_loop(
-            filtered_documents, loops=self.augmentation_loops
-        )
-        logger.info(
-            f"Num documents before postgeneration filtering: {len(summarized_documents)}"
-        )
-        filtered_summarized_documents = self.filter_documents(
-            self.postgeneration_filters, summarized_documents
-        )
-        logger.info(
-            f"Num documents after postgeneration filtering: {len(filtered_summarized_documents)}"
-        )
 
-        return filtered_summarized_documents
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            num_samples = asyncio.run(self.__agenerate(filtered_documents, writer))
+        else:
+            num_samples = loop.run_until_complete(
+                self.__agenerate(filtered_documents, writer)
+            )
+        logger.info(f"Num instruct dataset samples: {num_samples}")
+
+        return num_samples
 
-    def __augmented_summarization_loop(
-        self, documents: list[Document], loops: int = 3
-    ) -> list[Document]:
-        """Performs multiple summarization passes with increasing temperature.
+    async def __agenerate(
+        self, documents: list[Document], writer: ShardedDatasetWriter
+    ) -> dict[str, int]:
+        """Summarizes every document multiple times with increasing temperature and
+        writes the samples of each document as soon as all its summaries are done.
+
+        The requests of all the loops are submitted as a single concurrent batch, and
+        only lightweight summary records are kept instead of document copies.
 
         Args:
             documents: List of documents to summarize.
-            loops: Number of summarization iterations with different temperatures.
+            writer: Writer of the dataset shards the samples are written to.
 
         Returns:
-            List of documents with generated summaries, including multiple versions
-            of each document summarized with different temperatures.
+            dict[str, int]: Number of samples written to each split.
         """
 
         summarization_agent = SummarizationAgent(
@@ -152,33 +149,94 @@ class SummarizationDatasetGenerator:
             model_id=self.summarization_model,
             max_concurrent_requests=self.max_workers,
             mock=self.mock,
+            map_reduce_threshold_tokens=self.map_reduce_threshold_tokens,
         )
-        augmented_documents = []
-        for i in range(loops):
-            temperature = i * 0.5 / loops  # 0.0 to 0.5
-            logger.info(
-                f"Loop {i + 1} of {loops} - Summarizing documents with temperature {temperature}"
+        loops = self.augmentation_loops
+        temperatures = [i * 0.5 / loops for i in range(loops)]  # 0.0 to 0.5
+        logger.info(
+            f"Summarizing {len(documents)} documents with temperatures {temperatures}"
+        )
+
+        requests = [
+            (document, temperature)
+            for temperature in temperatures
+            for document in documents
+        ]
+        # The summaries of the documents in flight, ordered by temperature.
+        pending_summaries: dict[int, list[DocumentSummary | None]] = {}
+        num_pending_requests: dict[int, int] = {}
+        num_samples: dict[str, int] = {}
+        num_summaries = {"generated": 0, "filtered": 0, "deduplicated": 0}
+        async for index, summary in summarization_agent.astream_summaries(requests):
+            document_index = index % len(documents)
+            document_summaries = pending_summaries.setdefault(
+                document_index, [None] * len(temperatures)
+            )
+            document_summaries[index // len(documents)] = summary
+            num_pending_requests[document_index] = (
+                num_pending_requests.get(document_index, len(temperatures)) - 1
+            )
+            if num_pending_requests[document_index] > 0:
+                continue
+
+            del pending_summaries[document_index], num_pending_requests[document_index]
+            document = documents[document_index]
+            summaries = [summary for summary in document_summaries if summary]
+            filtered_summaries = self.filter_documents(
+                self.postgeneration_filters, summaries
+            )
+            num_summaries["generated"] += len(summaries)
+            num_summaries["filtered"] += len(filtered_summaries)
+            if self.near_duplicate_threshold is not None:
+                filtered_summaries, _ = deduplicate_summaries(
+                    filtered_summaries,
+                    similarity_threshold=self.near_duplicate_threshold,
+                )
+            num_summaries["deduplicated"] += len(filtered_summaries)
+
+            split = get_split(
+                document.id,
+                val_split_ratio=self.val_split_ratio,
+                test_split_ratio=self.test_split_ratio,
+                seed=42,
+            )
+            writer.write_many(
+                split,
+                (
+                    self.__to_instruct_dataset_sample(document, summary)
+                    for summary in filtered_summaries
+                ),
             )
+            num_samples[split] = num_samples.get(split, 0) + len(filtered_summaries)
 
-            copied_documents = copy.deepcopy(documents)
-            summarized_documents = summarization_agent(
-                copied_documents, temperature=temperature
+        logger.info(
+            f"Num documents before postgeneration filtering: {num_summaries['generated']}"
+        )
+        logger.info(
+            f"Num documents after postgeneration filtering: {num_summaries['filtered']}"
+        )
+        if self.near_duplicate_threshold is not None:
+            self.deduplication_stats = DeduplicationStats(
+                num_summaries_before=num_summaries["filtered"],
+                num_summaries_after=num_summaries["deduplicated"],
+            )
+            logger.info(
+                f"Num documents after near-duplicate pruning: {num_summaries['deduplicated']} "
+                f"({self.deduplication_stats.num_removed} removed, "
+                f"{self.deduplication_stats.removed_ratio:.2%} shrink)"
             )
-            valid_summarized_documents = [
-                doc for doc in summarized_documents if doc.summary is not None
-            ]
-            augmented_documents.extend(valid_summarized_documents)
 
-        return augmented_documents
+        return num_samples
 
     def filter_documents(
-        self, filters: list[Callable[[Document], bool]], documents: list[Document]
-    ) -> list[Document]:
+        self, filters: list[Callable[[T], bool]], documents: list[T]
+    ) -> list[T]:
         """Filters documents using provided filter functions.
 
         Args:
-            filters: List of filter functions that take a Document and return bool.
-            documents: List of documents to filter.
+            filters: List of filter functions that take a Document (or a
+                DocumentSummary) and return bool.
+            documents: List of documents (or summaries) to filter.
 
         Returns:
             List of documents that pass all filter functions.
@@ -191,23 +249,23 @@ class SummarizationDatasetGenerator:
 
         return documents
 
-    def __to_instruct_dataset_sample(self, document: Document) -> InstructDatasetSample:
+    def __to_instruct_dataset_sample(
+        self, document: Document, summary: DocumentSummary
+    ) -> InstructDatasetSample:
         """Converts a summarized document to an instruction dataset sample.
 
         Args:
-            document: A Document object containing both content and summary.
+            document: The Document object that was summarized.
+            summary: The generated summary of the document.
 
         Returns:
             InstructDatasetSample with document content as instruction and
             summary as answer.
-
-        Raises:
-            AssertionError: If the document's summary is None.
         """
 
-        assert document.summary is not None, "Document summary is None"
-
         return InstructDatasetSample(
             instruction=document.content,
-            answer=document.summary,
+            answer=summary.summary,
+            document_id=document.id,
+            document_content_hash=document.content_hash,
         )
@@ -1,10 +1,11 @@
 from .embeddings import EmbeddingModelType, get_embedding_model
 from .retrievers import RetrieverType, get_retriever
-from .splitters import SummarizationType, get_splitter
+from .splitters import SummarizationType, get_splitter, get_summarization_agent
 
 __all__ = [
     "get_retriever",
     "get_splitter",
+    "get_summarization_agent",
     "EmbeddingModelType",
     "get_embedding_model",
     "RetrieverType",
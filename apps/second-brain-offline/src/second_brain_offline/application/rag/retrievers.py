@@ -1,13 +1,17 @@
 from typing import Literal, Union
 
+import pymongo
 from langchain_mongodb import MongoDBAtlasVectorSearch
+from langchain_mongodb.docstores import MongoDBDocStore
 from langchain_mongodb.retrievers import (
     MongoDBAtlasHybridSearchRetriever,
     MongoDBAtlasParentDocumentRetriever,
 )
 from loguru import logger
+from pymongo.collection import Collection
 
 from second_brain_offline.config import settings
+from second_brain_offline.infrastructure.mongo import get_mongo_client
 
 from .embeddings import EmbeddingModelType, EmbeddingsModel, get_embedding_model
 from .splitters import get_splitter
@@ -18,6 +22,10 @@ RetrieverModel = Union[
     MongoDBAtlasHybridSearchRetriever, MongoDBAtlasParentDocumentRetriever
 ]
 
+# Fields of the chunk text and embedding in the hybrid search collection.
+HYBRID_SEARCH_TEXT_KEY = "chunk"
+HYBRID_SEARCH_EMBEDDING_KEY = "embedding"
+
 
 def get_retriever(
     embedding_model_id: str,
@@ -46,12 +54,11 @@ def get_retriever(
 def get_hybrid_search_retriever(
     embedding_model: EmbeddingsModel, k: int
 ) -> MongoDBAtlasHybridSearchRetriever:
-    vectorstore = MongoDBAtlasVectorSearch.from_connection_string(
-        connection_string=settings.MONGODB_URI,
+    vectorstore = MongoDBAtlasVectorSearch(
+        collection=get_rag_collection(),
         embedding=embedding_model,
-        namespace=f"{settings.MONGODB_DATABASE_NAME}.rag",
-        text_key="chunk",
-        embedding_key="embedding",
+        text_key=HYBRID_SEARCH_TEXT_KEY,
+        embedding_key=HYBRID_SEARCH_EMBEDDING_KEY,
         relevance_score_fn="dotProduct",
     )
 
@@ -69,15 +76,25 @@ def get_hybrid_search_retriever(
 def get_parent_document_retriever(
     embedding_model: EmbeddingsModel, k: int = 3
 ) -> MongoDBAtlasParentDocumentRetriever:
-    retriever = MongoDBAtlasParentDocumentRetriever.from_connection_string(
-        connection_string=settings.MONGODB_URI,
-        embedding_model=embedding_model,
+    # Same setup as MongoDBAtlasParentDocumentRetriever.from_connection_string, on
+    # the shared client.
+    collection = get_rag_collection()
+    vectorstore = MongoDBAtlasVectorSearch(
+        collection=collection, embedding=embedding_model, text_key="page_content"
+    )
+    docstore = MongoDBDocStore(collection=collection)
+    docstore.collection.create_index([("doc_id", pymongo.ASCENDING)])
+    retriever = MongoDBAtlasParentDocumentRetriever(
+        vectorstore=vectorstore,
+        docstore=docstore,
         child_splitter=get_splitter(200),
         parent_splitter=get_splitter(800),
-        database_name=settings.MONGODB_DATABASE_NAME,
-        collection_name="rag",
-        text_key="page_content",
+        id_key="doc_id",
         search_kwargs={"k": k},
     )
 
     return retriever
+
+
+def get_rag_collection() -> Collection:
+    return get_mongo_client()[settings.MONGODB_DATABASE_NAME]["rag"]
@@ -1,10 +1,13 @@
+from functools import partial
 from typing import Callable, Literal, Union
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from loguru import logger
 
+from second_brain_offline import tokenizer
 from second_brain_offline.application.agents import (
     ContextualSummarizationAgent,
+    ContextualSummarizationMode,
     SimpleSummarizationAgent,
 )
 
@@ -14,13 +17,18 @@ SummarizationAgent = Union[ContextualSummarizationAgent, SimpleSummarizationAgen
 
 
 def get_splitter(
-    chunk_size: int, summarization_type: SummarizationType = "none", **kwargs
+    chunk_size: int,
+    summarization_type: SummarizationType = "none",
+    contextual_mode: ContextualSummarizationMode = "chunk",
+    **kwargs,
 ) -> RecursiveCharacterTextSplitter:
     """Returns a token-based text splitter with overlap.
 
     Args:
         chunk_size: Number of tokens for each text chunk.
         summarization_type: Type of summarization to use ("contextual" or "simple").
+        contextual_mode: Whether the contextual summarization agent makes one call
+            per chunk ("chunk") or one call per document ("document").
         **kwargs: Additional keyword arguments passed to the summarization agent.
 
     Returns:
@@ -34,61 +42,97 @@ def get_splitter(
         f"Getting splitter with chunk size: {chunk_size} and overlap: {chunk_overlap}"
     )
 
+    # Memoized token counts, as the splitter measures the same pieces many times.
+    length_function = partial(tokenizer.count_tokens, model_id="cl100k_base")
+
     if summarization_type == "none":
-        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            encoding_name="cl100k_base",
+        return RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
+            length_function=length_function,
         )
 
-    if summarization_type == "contextual":
-        handler = ContextualSummarizationAgent(**kwargs)
-    elif summarization_type == "simple":
-        handler = SimpleSummarizationAgent(**kwargs)
+    handler = get_summarization_agent(
+        summarization_type, contextual_mode=contextual_mode, **kwargs
+    )
 
-    return HandlerRecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        encoding_name="cl100k_base",
+    return HandlerRecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
+        length_function=length_function,
         handler=handler,
     )
 
 
+def get_summarization_agent(
+    summarization_type: SummarizationType,
+    contextual_mode: ContextualSummarizationMode = "chunk",
+    **kwargs,
+) -> SummarizationAgent | None:
+    """Returns the agent that adds context to the chunks of a document.
+
+    Args:
+        summarization_type: Type of summarization to use ("contextual" or "simple").
+        contextual_mode: Whether the contextual summarization agent makes one call
+            per chunk ("chunk") or one call per document ("document").
+        **kwargs: Additional keyword arguments passed to the summarization agent.
+
+    Returns:
+        SummarizationAgent | None: The summarization agent, or None if the
+            summarization type is "none".
+
+    Raises:
+        ValueError: If the summarization type is not supported.
+    """
+
+    if summarization_type == "none":
+        return None
+    elif summarization_type == "contextual":
+        return ContextualSummarizationAgent(mode=contextual_mode, **kwargs)
+    elif summarization_type == "simple":
+        return SimpleSummarizationAgent(**kwargs)
+    else:
+        raise ValueError(f"Invalid summarization type: {summarization_type}")
+
+
 class HandlerRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
     """A text splitter that can apply custom handling to chunks after splitting.
 
     This class extends RecursiveCharacterTextSplitter to allow post-processing of text chunks
     through a handler function. If no handler is provided, chunks are returned unchanged.
+    The title of the document, if given to `split_text`, is passed to the handler.
     """
 
     def __init__(
         self,
-        handler: Callable[[str, list[str]], list[str]] | None = None,
+        handler: Callable[[str, list[str], str | None], list[str]] | None = None,
         *args,
         **kwargs,
     ) -> None:
         """Initialize the splitter with an optional handler function.
 
         Args:
-            handler: Optional callable that takes the original text and list of chunks,
-                and returns a modified list of chunks. If None, chunks are returned unchanged.
+            handler: Optional callable that takes the original text, the list of chunks
+                and the optional document title, and returns a modified list of chunks.
+                If None, chunks are returned unchanged.
             *args: Additional positional arguments passed to RecursiveCharacterTextSplitter.
             **kwargs: Additional keyword arguments passed to RecursiveCharacterTextSplitter.
         """
         super().__init__(*args, **kwargs)
 
-        self.handler = handler if handler is not None else lambda _, x: x
+        self.handler = handler if handler is not None else lambda _, x, __: x
 
-    def split_text(self, text: str) -> list[str]:
+    def split_text(self, text: str, title: str | None = None) -> list[str]:
         """Split text into chunks and apply the handler function.
 
         Args:
             text: The input text to split.
+            title: Optional title of the document the text belongs to.
 
         Returns:
             list[str]: The processed text chunks after splitting and handling.
         """
         chunks = super().split_text(text)
-        parsed_chunks = self.handler(text, chunks)
+        parsed_chunks = self.handler(text, chunks, title)
 
         return parsed_chunks
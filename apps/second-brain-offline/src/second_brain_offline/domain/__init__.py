@@ -1,4 +1,37 @@
-from .dataset import InstructDataset, InstructDatasetSample
+from .corpus_manifest import CorpusManifest, CorpusWriteResult, write_corpus
+from .dataset import DocumentSummary, InstructDataset, InstructDatasetSample
+from .dataset_shards import (
+    DatasetFormat,
+    ShardedDatasetWriter,
+    load_dataset_shards,
+)
 from .document import Document, DocumentMetadata
+from .document_store import ContentLoader, DocumentHeader, DocumentStore
+from .document_shards import (
+    CorpusFormat,
+    read_document_shards,
+    write_document_shards,
+)
+from .statistics import CorpusStatistics, Histogram
 
-__all__ = ["Document", "DocumentMetadata", "InstructDataset", "InstructDatasetSample"]
+__all__ = [
+    "ContentLoader",
+    "CorpusFormat",
+    "CorpusManifest",
+    "CorpusStatistics",
+    "CorpusWriteResult",
+    "DatasetFormat",
+    "Document",
+    "DocumentHeader",
+    "DocumentMetadata",
+    "DocumentStore",
+    "DocumentSummary",
+    "Histogram",
+    "InstructDataset",
+    "InstructDatasetSample",
+    "ShardedDatasetWriter",
+    "load_dataset_shards",
+    "read_document_shards",
+    "write_corpus",
+    "write_document_shards",
+]
@@ -0,0 +1,202 @@
+import hashlib
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from second_brain_offline import utils
+
+from .document import Document
+from .document_shards import CorpusFormat, serialize_document_shards
+
+MANIFEST_FILE_NAME = "_manifest.json"
+CORPUS_FILE_SUFFIXES = {".json", ".txt", ".parquet"}
+
+
+class CorpusManifest(BaseModel):
+    """The files of a corpus directory and the SHA-256 hash of their content.
+
+    Attributes:
+        format: Format of the corpus files.
+        files: SHA-256 hex digest of every file, keyed by file name.
+    """
+
+    format: CorpusFormat = "json"
+    files: dict[str, str] = Field(default_factory=dict)
+
+    @classmethod
+    def load(cls, corpus_dir: Path) -> "CorpusManifest":
+        """Load the manifest of a corpus directory.
+
+        Args:
+            corpus_dir: Directory containing the corpus.
+
+        Returns:
+            CorpusManifest: The manifest, or an empty one if the directory has no
+                valid manifest.
+        """
+
+        manifest_path = corpus_dir / MANIFEST_FILE_NAME
+        try:
+            return cls.model_validate_json(manifest_path.read_bytes())
+        except FileNotFoundError:
+            return cls()
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid manifest at {manifest_path}: {str(e)}")
+
+            return cls()
+
+    def save(self, corpus_dir: Path) -> Path:
+        """Atomically write the manifest into a corpus directory.
+
+        Args:
+            corpus_dir: Directory containing the corpus.
+
+        Returns:
+            Path: The path of the manifest.
+        """
+
+        manifest_path = corpus_dir / MANIFEST_FILE_NAME
+        utils.write_bytes_atomically(
+            manifest_path,
+            json.dumps(self.model_dump(), indent=4, sort_keys=True).encode("utf-8"),
+        )
+
+        return manifest_path
+
+
+class CorpusWriteResult(BaseModel):
+    """What an incremental corpus write changed on disk.
+
+    Attributes:
+        manifest_path: Path of the manifest describing the written corpus.
+        written_files: Names of the new or changed files that were written.
+        deleted_files: Names of the files removed from the corpus.
+        num_unchanged_files: Number of files left untouched.
+    """
+
+    manifest_path: Path
+    written_files: list[str] = Field(default_factory=list)
+    deleted_files: list[str] = Field(default_factory=list)
+    num_unchanged_files: int = 0
+
+
+def write_corpus(
+    documents: Iterable[Document],
+    output_dir: Path,
+    format: CorpusFormat = "json",
+    shard_size: int = 10_000,
+    max_workers: int = 8,
+) -> CorpusWriteResult:
+    """Incrementally write documents into a corpus directory.
+
+    Every file is hashed and compared against the manifest of the previous write,
+    and only new or changed files are written, in parallel. Each file is written to
+    a hidden temporary file renamed over the previous version, so concurrent
+    readers never see a partially written file. Files of the previous write that
+    are no longer part of the corpus are deleted, and the manifest is updated
+    last.
+
+    In the "json" format, every document is written as a `<id>.json` file along
+    with a `<id>.txt` file holding its content. In the "parquet" format, documents
+    are written as `documents-<index>.parquet` shards.
+
+    Args:
+        documents: The documents of the corpus.
+        output_dir: Directory of the corpus.
+        format: Format of the corpus files.
+        shard_size: Maximum number of documents per Parquet shard.
+        max_workers: Number of threads hashing and writing files.
+
+    Returns:
+        CorpusWriteResult: The files written and deleted, and the manifest path.
+    """
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    previous_manifest = CorpusManifest.load(output_dir)
+    manifest = CorpusManifest(format=format)
+    result = CorpusWriteResult(manifest_path=output_dir / MANIFEST_FILE_NAME)
+
+    def write_file(file_name: str, data: bytes) -> tuple[str, str, bool]:
+        file_hash = hashlib.sha256(data).hexdigest()
+        file_path = output_dir / file_name
+        if previous_manifest.files.get(file_name) == file_hash and file_path.exists():
+            return file_name, file_hash, False
+
+        utils.write_bytes_atomically(file_path, data)
+
+        return file_name, file_hash, True
+
+    def collect(future: Future[tuple[str, str, bool]]) -> None:
+        file_name, file_hash, written = future.result()
+        manifest.files[file_name] = file_hash
+        if written:
+            result.written_files.append(file_name)
+        else:
+            result.num_unchanged_files += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque[Future[tuple[str, str, bool]]] = deque()
+        submitted_file_names = set()
+        for file_name, data in _serialize_corpus(documents, format, shard_size):
+            if file_name in submitted_file_names:
+                logger.warning(f"Skipping duplicate corpus file '{file_name}'")
+                continue
+            submitted_file_names.add(file_name)
+
+            # Bound the number of serialized files held in memory.
+            if len(pending) >= 2 * max_workers:
+                collect(pending.popleft())
+            pending.append(executor.submit(write_file, file_name, data))
+
+        while pending:
+            collect(pending.popleft())
+
+    stale_file_names = (
+        set(previous_manifest.files) | _get_corpus_file_names(output_dir)
+    ) - set(manifest.files)
+    for file_name in sorted(stale_file_names):
+        (output_dir / file_name).unlink(missing_ok=True)
+        result.deleted_files.append(file_name)
+
+    manifest.save(output_dir)
+
+    logger.info(
+        f"Wrote corpus to {output_dir}: {len(result.written_files)} files written, "
+        f"{result.num_unchanged_files} unchanged, {len(result.deleted_files)} deleted"
+    )
+
+    return result
+
+
+def _serialize_corpus(
+    documents: Iterable[Document], format: CorpusFormat, shard_size: int
+) -> Iterator[tuple[str, bytes]]:
+    if format == "parquet":
+        yield from serialize_document_shards(documents, shard_size=shard_size)
+
+        return
+
+    for document in documents:
+        yield f"{document.id}.json", document.to_json().encode("utf-8")
+        yield f"{document.id}.txt", document.content.encode("utf-8")
+
+
+def _get_corpus_file_names(corpus_dir: Path) -> set[str]:
+    # Also covers directories written before manifests existed, and temporary
+    # files left behind by interrupted writes.
+    return {
+        path.name
+        for path in corpus_dir.iterdir()
+        if path.is_file()
+        and path.name != MANIFEST_FILE_NAME
+        and (
+            path.suffix in CORPUS_FILE_SUFFIXES
+            or (path.name.startswith(".") and path.suffix == ".tmp")
+        )
+    }
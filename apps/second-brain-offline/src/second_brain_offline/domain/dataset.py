@@ -1,15 +1,31 @@
-import json
-import random
+import hashlib
+import tempfile
 from pathlib import Path
 
-from datasets import Dataset, DatasetDict
+from datasets import DatasetDict
 from loguru import logger
 from pydantic import BaseModel
 
+from .dataset_shards import DatasetFormat, ShardedDatasetWriter, load_dataset_shards
+
 
 class InstructDatasetSample(BaseModel):
     instruction: str
     answer: str
+    document_id: str | None = None
+    document_content_hash: str | None = None
+
+
+class DocumentSummary(BaseModel):
+    """A summary of a document, generated with a given temperature.
+
+    Only the ID of the document is kept, so many summaries of the same document
+    don't duplicate its content.
+    """
+
+    document_id: str
+    temperature: float
+    summary: str
 
 
 class InstructDataset(BaseModel):
@@ -30,33 +46,37 @@ class InstructDataset(BaseModel):
     ) -> "InstructDataset":
         """Creates an InstructDataset by splitting samples into train/val/test sets.
 
+        The split of each sample is decided by a stable hash of its source document
+        ID (or of its instruction, if it has no document ID). All the samples of a
+        document land in the same split, and adding new documents never moves the
+        existing samples to another split.
+
         Args:
             samples: List of samples to split
             val_split_ratio: Ratio of samples to use for validation (between 0 and 1)
             test_split_ratio: Ratio of samples to use for testing (between 0 and 1)
-            seed: Random seed for shuffling. If None, no fixed seed is used.
+            seed: Salt of the split hash. If None, no salt is used.
 
         Returns:
-            InstructDataset with shuffled and split samples
+            InstructDataset with split samples, in their original order
         """
 
-        shuffled_samples = samples.copy()
-
-        if seed is not None:
-            random.seed(seed)
-        random.shuffle(shuffled_samples)
-
-        train_samples = shuffled_samples[
-            : int(len(shuffled_samples) * (1 - val_split_ratio - test_split_ratio))
-        ]
-        val_samples = shuffled_samples[
-            int(len(shuffled_samples) * (1 - val_split_ratio - test_split_ratio)) : int(
-                len(shuffled_samples) * (1 - test_split_ratio)
+        split_samples: dict[str, list[InstructDatasetSample]] = {
+            "train": [],
+            "validation": [],
+            "test": [],
+        }
+        for sample in samples:
+            split = get_split(
+                sample.document_id or sample.instruction,
+                val_split_ratio=val_split_ratio,
+                test_split_ratio=test_split_ratio,
+                seed=seed,
             )
-        ]
-        test_samples = shuffled_samples[
-            int(len(shuffled_samples) * (1 - test_split_ratio)) :
-        ]
+            split_samples[split].append(sample)
+        train_samples = split_samples["train"]
+        val_samples = split_samples["validation"]
+        test_samples = split_samples["test"]
 
         logger.info(
             "Created dataset with the following splits: "
@@ -66,8 +86,10 @@ class InstructDataset(BaseModel):
         )
 
         assert len(train_samples) > 0, "Train split must have at least one sample"
-        assert len(val_samples) > 0, "Validation split must have at least one sample"
-        assert len(test_samples) > 0, "Test split must have at least one sample"
+        if len(val_samples) == 0 or len(test_samples) == 0:
+            logger.warning(
+                "The validation or test split is empty. Add more documents to populate it."
+            )
 
         return InstructDataset(
             train=train_samples,
@@ -78,39 +100,113 @@ class InstructDataset(BaseModel):
             seed=seed,
         )
 
-    def to_huggingface(self) -> DatasetDict:
-        train = Dataset.from_list([sample.model_dump() for sample in self.train])
-        validation = Dataset.from_list(
-            [sample.model_dump() for sample in self.validation]
-        )
-        test = Dataset.from_list([sample.model_dump() for sample in self.test])
+    def to_huggingface(self, shard_size: int = 10_000) -> DatasetDict:
+        """Converts the dataset splits to a Hugging Face dataset.
+
+        The samples are streamed into temporary Parquet shards that are loaded
+        through Arrow, instead of being collected into intermediate Python lists.
+
+        Args:
+            shard_size: Maximum number of samples per shard
 
-        return DatasetDict({"train": train, "validation": validation, "test": test})
+        Returns:
+            DatasetDict: The dataset with the train, validation and test splits, even
+                if some of them have no samples.
+        """
 
-    def write(self, output_dir: Path) -> Path:
-        """Writes the dataset splits to JSON files in the specified directory.
+        with tempfile.TemporaryDirectory() as shards_dir:
+            self.write(Path(shards_dir), format="parquet", shard_size=shard_size)
+            dataset = load_dataset_shards(
+                Path(shards_dir), format="parquet", splits=list(self.__get_splits())
+            )
+
+        return dataset
+
+    def write(
+        self,
+        output_dir: Path,
+        format: DatasetFormat = "jsonl",
+        shard_size: int = 10_000,
+        append: bool = False,
+    ) -> Path:
+        """Writes the dataset splits as JSONL or Parquet shards in the specified directory.
 
         Args:
             output_dir: Directory path where the dataset files will be saved
+            format: File format of the shards ("jsonl" or "parquet")
+            shard_size: Maximum number of samples per shard
+            append: If True, only the samples of documents missing from the existing
+                shards are written, appended after the existing samples
 
         Returns:
             Path to the output directory containing the saved files
         """
-        train = [sample.model_dump() for sample in self.train]
-        validation = [sample.model_dump() for sample in self.validation]
-        test = [sample.model_dump() for sample in self.test]
 
-        output_dir.mkdir(parents=True, exist_ok=True)
+        with ShardedDatasetWriter(
+            output_dir, format=format, shard_size=shard_size, append=append
+        ) as writer:
+            existing_document_ids = writer.get_document_ids() if append else set()
+            for split_name, samples in self.__get_splits().items():
+                writer.write_many(
+                    split_name,
+                    (
+                        sample
+                        for sample in samples
+                        if sample.document_id is None
+                        or sample.document_id not in existing_document_ids
+                    ),
+                )
 
-        for split_name, samples in {
-            "train": train,
-            "validation": validation,
-            "test": test,
-        }.items():
-            output_file = output_dir / f"{split_name}.json"
-            with open(output_file, "w") as f:
-                json.dump(samples, f, indent=2)
+        return output_dir
 
-        logger.info(f"Wrote dataset splits to {output_dir}")
+    def __get_splits(self) -> dict[str, list[InstructDatasetSample]]:
+        return {
+            "train": self.train,
+            "validation": self.validation,
+            "test": self.test,
+        }
 
-        return output_dir
+
+def get_split(
+    key: str,
+    val_split_ratio: float,
+    test_split_ratio: float,
+    seed: int | None = None,
+) -> str:
+    """Assign a key, such as a document ID, to the train, validation or test split.
+
+    Args:
+        key: The key to assign.
+        val_split_ratio: Ratio of keys assigned to validation (between 0 and 1)
+        test_split_ratio: Ratio of keys assigned to testing (between 0 and 1)
+        seed: Salt of the split hash. If None, no salt is used.
+
+    Returns:
+        str: "train", "validation" or "test". The same key and ratios always give
+            the same split.
+    """
+
+    split_position = get_split_position(key, seed=seed)
+    if split_position < test_split_ratio:
+        return "test"
+    elif split_position < test_split_ratio + val_split_ratio:
+        return "validation"
+
+    return "train"
+
+
+def get_split_position(key: str, seed: int | None = None) -> float:
+    """Map a key to a stable position in [0, 1), used to assign it to a split.
+
+    Args:
+        key: The key to map, such as a document ID.
+        seed: Optional salt, so different seeds give different assignments.
+
+    Returns:
+        float: The position of the key, uniformly distributed in [0, 1).
+    """
+
+    salted_key = key if seed is None else f"{seed}:{key}"
+    digest = hashlib.sha256(salted_key.encode("utf-8")).digest()
+
+    return int.from_bytes(digest[:8], "big") / 2**64
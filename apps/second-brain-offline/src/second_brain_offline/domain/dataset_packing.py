@@ -0,0 +1,213 @@
+import os
+from pathlib import Path
+from typing import Any
+
+from datasets import DatasetDict
+from loguru import logger
+
+IGNORE_INDEX = -100
+
+
+def export_packed_dataset(
+    dataset: DatasetDict,
+    output_dir: Path,
+    tokenizer_id: str,
+    max_seq_length: int = 2048,
+    chat_template: str | None = None,
+    system_prompt: str | None = None,
+    num_proc: int | None = None,
+) -> dict[str, int]:
+    """Tokenize instruction samples and pack them into fixed-length training sequences.
+
+    Every sample is rendered with the tokenizer's chat template as a user turn (the
+    instruction) followed by an assistant turn (the answer). Only the answer tokens
+    are kept as labels. Samples are then greedily packed, in order, into sequences
+    of exactly `max_seq_length` tokens, padded at the end. The `position_ids`
+    restart at every sample and `seq_lens` lists the sample lengths of each
+    sequence, so trainers can keep the attention within sample boundaries. The
+    result is saved as memory-mappable Arrow files, loadable with
+    `datasets.load_from_disk`.
+
+    Args:
+        dataset: Dataset with "instruction" and "answer" columns in each split.
+        output_dir: Directory where the packed dataset is saved.
+        tokenizer_id: Hugging Face ID or local path of the tokenizer.
+        max_seq_length: Number of tokens of every packed sequence. Longer samples
+            are truncated.
+        chat_template: Optional Jinja chat template overriding the tokenizer's one.
+        system_prompt: Optional system prompt added before every instruction.
+        num_proc: Number of processes used to tokenize. Defaults to the CPU count.
+
+    Returns:
+        dict[str, int]: Number of packed sequences of each non-empty split.
+    """
+
+    # Imported lazily, as transformers is heavy and only needed for the export.
+    try:
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise ImportError(
+            "Packing the dataset requires transformers. Install it with "
+            "`uv sync --extra packing`."
+        ) from e
+
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_id)
+    if chat_template is not None:
+        tokenizer.chat_template = chat_template
+    pad_token_id = (
+        tokenizer.pad_token_id
+        if tokenizer.pad_token_id is not None
+        else tokenizer.eos_token_id
+    )
+    num_proc = num_proc or os.cpu_count()
+
+    # Mapping an empty split drops its columns, so there is nothing to pack there.
+    empty_splits = [split for split in dataset if len(dataset[split]) == 0]
+    if empty_splits:
+        logger.warning(f"Skipping the empty splits {empty_splits} while packing")
+        dataset = DatasetDict(
+            {split: dataset[split] for split in dataset if split not in empty_splits}
+        )
+
+    tokenized_dataset = dataset.map(
+        tokenize_samples,
+        batched=True,
+        num_proc=num_proc,
+        remove_columns=dataset["train"].column_names,
+        fn_kwargs={
+            "tokenizer": tokenizer,
+            "max_seq_length": max_seq_length,
+            "system_prompt": system_prompt,
+        },
+        desc="Tokenizing samples",
+    )
+    packed_dataset = tokenized_dataset.map(
+        pack_sequences,
+        batched=True,
+        batch_size=1000,
+        remove_columns=tokenized_dataset["train"].column_names,
+        fn_kwargs={"max_seq_length": max_seq_length, "pad_token_id": pad_token_id},
+        desc="Packing sequences",
+    )
+    packed_dataset.save_to_disk(str(output_dir))
+
+    num_sequences = {split: len(packed_dataset[split]) for split in packed_dataset}
+    for split in packed_dataset:
+        num_tokens = sum(
+            sum(sum(seq_lens) for seq_lens in batch["seq_lens"])
+            for batch in packed_dataset[split].select_columns("seq_lens").iter(1000)
+        )
+        num_slots = max(1, num_sequences[split] * max_seq_length)
+        logger.info(
+            f"Packed {len(tokenized_dataset[split])} {split} samples into "
+            f"{num_sequences[split]} sequences of {max_seq_length} tokens "
+            f"({1 - num_tokens / num_slots:.2%} padding)"
+        )
+
+    return num_sequences
+
+
+def tokenize_samples(
+    batch: dict[str, list],
+    tokenizer: Any,
+    max_seq_length: int,
+    system_prompt: str | None = None,
+) -> dict[str, list]:
+    """Tokenize a batch of instruction samples with the tokenizer's chat template.
+
+    Args:
+        batch: Batch with "instruction" and "answer" columns.
+        tokenizer: Hugging Face tokenizer with a chat template.
+        max_seq_length: Maximum number of tokens of every sample.
+        system_prompt: Optional system prompt added before every instruction.
+
+    Returns:
+        dict[str, list]: The "input_ids" and "labels" of every sample, where the
+            prompt tokens are masked out of the labels.
+    """
+
+    system_messages = (
+        [{"role": "system", "content": system_prompt}] if system_prompt else []
+    )
+    prompts = [
+        [*system_messages, {"role": "user", "content": instruction}]
+        for instruction in batch["instruction"]
+    ]
+    conversations = [
+        [*prompt, {"role": "assistant", "content": answer}]
+        for prompt, answer in zip(prompts, batch["answer"])
+    ]
+
+    # Render the texts first, so the batch is tokenized in a single native call.
+    prompt_texts = tokenizer.apply_chat_template(
+        prompts, tokenize=False, add_generation_prompt=True
+    )
+    conversation_texts = tokenizer.apply_chat_template(conversations, tokenize=False)
+    prompt_ids = tokenizer(prompt_texts, add_special_tokens=False)["input_ids"]
+    conversation_ids = tokenizer(conversation_texts, add_special_tokens=False)[
+        "input_ids"
+    ]
+
+    input_ids = []
+    labels = []
+    for sample_prompt_ids, sample_ids in zip(prompt_ids, conversation_ids):
+        num_prompt_tokens = len(sample_prompt_ids)
+        sample_labels = [IGNORE_INDEX] * num_prompt_tokens + sample_ids[
+            num_prompt_tokens:
+        ]
+
+        input_ids.append(sample_ids[:max_seq_length])
+        labels.append(sample_labels[:max_seq_length])
+
+    return {"input_ids": input_ids, "labels": labels}
+
+
+def pack_sequences(
+    batch: dict[str, list], max_seq_length: int, pad_token_id: int
+) -> dict[str, list]:
+    """Greedily pack a batch of tokenized samples into fixed-length sequences.
+
+    Args:
+        batch: Batch with "input_ids" and "labels" columns.
+        max_seq_length: Number of tokens of every packed sequence.
+        pad_token_id: Token used to pad the end of the sequences.
+
+    Returns:
+        dict[str, list]: The "input_ids", "labels", "attention_mask", "position_ids"
+            and "seq_lens" of every packed sequence.
+    """
+
+    packed: dict[str, list] = {
+        "input_ids": [],
+        "labels": [],
+        "attention_mask": [],
+        "position_ids": [],
+        "seq_lens": [],
+    }
+    sequence: dict[str, list] = {key: [] for key in packed}
+
+    def flush() -> None:
+        num_padding_tokens = max_seq_length - len(sequence["input_ids"])
+        sequence["input_ids"].extend([pad_token_id] * num_padding_tokens)
+        sequence["labels"].extend([IGNORE_INDEX] * num_padding_tokens)
+        sequence["attention_mask"].extend([0] * num_padding_tokens)
+        sequence["position_ids"].extend(range(num_padding_tokens))
+
+        for key in packed:
+            packed[key].append(sequence[key])
+            sequence[key] = []
+
+    for input_ids, labels in zip(batch["input_ids"], batch["labels"]):
+        if len(sequence["input_ids"]) + len(input_ids) > max_seq_length:
+            flush()
+
+        sequence["input_ids"].extend(input_ids)
+        sequence["labels"].extend(labels)
+        sequence["attention_mask"].extend([1] * len(input_ids))
+        sequence["position_ids"].extend(range(len(input_ids)))
+        sequence["seq_lens"].append(len(input_ids))
+
+    if sequence["input_ids"]:
+        flush()
+
+    return packed
@@ -0,0 +1,371 @@
+import json
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Literal, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datasets import Dataset, DatasetDict, load_dataset
+from loguru import logger
+from pydantic import BaseModel
+
+DatasetFormat = Literal["jsonl", "parquet"]
+
+
+class ShardedDatasetWriter:
+    """Streams dataset samples to disk as fixed-size JSONL or Parquet shards.
+
+    Each split is written to its own sequence of shards named
+    `<split>-<index>.<format>`. JSONL samples are written to disk as soon as they
+    arrive, while Parquet samples are buffered until a full shard is written, so
+    memory never holds more than one shard per split.
+
+    In append mode, the existing shards are kept: new samples first fill the last
+    shard of each split, then go to new shards, so only the last shard of a split
+    and the new ones change, along with the shards whose samples are deleted
+    through `delete_documents`.
+
+    Attributes:
+        output_dir: Directory where the shards are written.
+        format: File format of the shards.
+        shard_size: Maximum number of samples per shard.
+        num_samples: Number of samples written for each split.
+        shards: Paths of the shards written for each split.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        format: DatasetFormat = "jsonl",
+        shard_size: int = 10_000,
+        append: bool = False,
+    ) -> None:
+        assert shard_size > 0, "Shard size must be positive"
+
+        self.output_dir = output_dir
+        self.format = format
+        self.shard_size = shard_size
+        self.num_samples: dict[str, int] = {}
+        self.shards: dict[str, list[Path]] = {}
+
+        self._buffers: dict[str, list[dict]] = {}
+        self._jsonl_files: dict[str, IO[str]] = {}
+        self._num_shard_samples: dict[str, int] = {}
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if append:
+            self.shards = get_shard_paths(self.output_dir, format=self.format)
+
+    def get_document_ids(self) -> set[str]:
+        """Get the source document IDs of the samples of the existing shards.
+
+        Returns:
+            set[str]: The document IDs of all the samples that have one.
+        """
+
+        return _read_document_ids(self.shards, format=self.format)
+
+    def get_document_content_hashes(self) -> dict[str, str | None]:
+        """Get the content hash of the source documents of the existing shards.
+
+        Returns:
+            dict[str, str | None]: The `document_content_hash` of the samples of
+                each document ID, or None for samples written without it.
+        """
+
+        content_hashes: dict[str, str | None] = {}
+        for split_shard_paths in self.shards.values():
+            for shard_path in split_shard_paths:
+                for sample in read_shard(shard_path, format=self.format):
+                    if sample.get("document_id") is not None:
+                        content_hashes[sample["document_id"]] = sample.get(
+                            "document_content_hash"
+                        )
+
+        return content_hashes
+
+    def delete_documents(self, document_ids: set[str]) -> int:
+        """Delete the samples of documents from the existing shards.
+
+        Only the shards holding samples of the documents are rewritten, and the
+        shards left without samples are removed. It must be called before writing
+        any sample.
+
+        Args:
+            document_ids: IDs of the source documents whose samples are deleted.
+
+        Returns:
+            int: Number of deleted samples.
+        """
+
+        assert not self._num_shard_samples, "Samples were already written"
+
+        if not document_ids:
+            return 0
+
+        num_deleted_samples = 0
+        for split, split_shard_paths in self.shards.items():
+            for shard_path in list(split_shard_paths):
+                samples = list(read_shard(shard_path, format=self.format))
+                kept_samples = [
+                    sample
+                    for sample in samples
+                    if sample.get("document_id") not in document_ids
+                ]
+                if len(kept_samples) == len(samples):
+                    continue
+
+                num_deleted_samples += len(samples) - len(kept_samples)
+                if kept_samples:
+                    _write_shard(shard_path, kept_samples, format=self.format)
+                else:
+                    shard_path.unlink()
+                    split_shard_paths.remove(shard_path)
+
+        self.shards = {
+            split: split_shard_paths
+            for split, split_shard_paths in self.shards.items()
+            if split_shard_paths
+        }
+        logger.info(
+            f"Deleted {num_deleted_samples} samples of {len(document_ids)} documents "
+            f"from {self.output_dir}"
+        )
+
+        return num_deleted_samples
+
+    def __enter__(self) -> "ShardedDatasetWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, split: str, sample: BaseModel | dict) -> None:
+        """Write a single sample to a split.
+
+        Args:
+            split: Name of the split, such as "train".
+            sample: The sample to write.
+        """
+
+        if isinstance(sample, BaseModel):
+            sample = sample.model_dump()
+
+        if self._num_shard_samples.get(split, 0) == 0:
+            if split not in self._num_shard_samples and self.shards.get(split):
+                self.__reopen_last_shard(split)
+            else:
+                self.__open_shard(split)
+
+        if self.format == "jsonl":
+            self._jsonl_files[split].write(json.dumps(sample, ensure_ascii=False))
+            self._jsonl_files[split].write("\n")
+        else:
+            self._buffers[split].append(sample)
+
+        self.num_samples[split] = self.num_samples.get(split, 0) + 1
+        self._num_shard_samples[split] += 1
+        if self._num_shard_samples[split] == self.shard_size:
+            self.__close_shard(split)
+
+    def write_many(self, split: str, samples: Iterable[BaseModel | dict]) -> None:
+        """Write multiple samples to a split.
+
+        Args:
+            split: Name of the split, such as "train".
+            samples: The samples to write. They are consumed lazily.
+        """
+
+        for sample in samples:
+            self.write(split, sample)
+
+    def close(self) -> dict[str, list[Path]]:
+        """Flush the partially filled shards.
+
+        Returns:
+            dict[str, list[Path]]: Paths of the shards written for each split.
+        """
+
+        for split, num_shard_samples in self._num_shard_samples.items():
+            if num_shard_samples > 0:
+                self.__close_shard(split)
+
+        logger.info(
+            f"Wrote {self.num_samples} samples as {self.format} shards "
+            f"to {self.output_dir}"
+        )
+
+        return self.shards
+
+    def to_huggingface(self, splits: Sequence[str] | None = None) -> DatasetDict:
+        """Load the written shards as a Hugging Face dataset.
+
+        Args:
+            splits: Names of the splits the dataset must have, even if no sample
+                was written to them.
+
+        Returns:
+            DatasetDict: The dataset, with one split per written or expected split.
+        """
+
+        return load_dataset_shards(self.output_dir, format=self.format, splits=splits)
+
+    def __open_shard(self, split: str) -> None:
+        split_shard_paths = self.shards.setdefault(split, [])
+        # Removed shards leave gaps, so the index follows the last shard's one.
+        shard_index = (
+            int(split_shard_paths[-1].stem.rsplit("-", 1)[1]) + 1
+            if split_shard_paths
+            else 0
+        )
+        shard_path = self.output_dir / f"{split}-{shard_index:05d}.{self.format}"
+        self.shards[split].append(shard_path)
+        self._num_shard_samples[split] = 0
+
+        if self.format == "jsonl":
+            self._jsonl_files[split] = open(shard_path, "w", encoding="utf-8")
+        else:
+            self._buffers[split] = []
+
+    def __reopen_last_shard(self, split: str) -> None:
+        shard_path = self.shards[split][-1]
+        samples = list(read_shard(shard_path, format=self.format))
+        if len(samples) >= self.shard_size:
+            self.__open_shard(split)
+
+            return
+
+        self._num_shard_samples[split] = len(samples)
+        if self.format == "jsonl":
+            self._jsonl_files[split] = open(shard_path, "a", encoding="utf-8")
+        else:
+            self._buffers[split] = samples
+
+    def __close_shard(self, split: str) -> None:
+        if self.format == "jsonl":
+            self._jsonl_files.pop(split).close()
+        else:
+            _write_shard(
+                self.shards[split][-1], self._buffers.pop(split), format=self.format
+            )
+
+        self._num_shard_samples[split] = 0
+
+
+def load_dataset_shards(
+    input_dir: Path,
+    format: DatasetFormat = "jsonl",
+    splits: Sequence[str] | None = None,
+) -> DatasetDict:
+    """Load JSONL or Parquet shards as a Hugging Face dataset.
+
+    The shards are converted to Arrow files that are memory-mapped rather than
+    loaded in memory, so large datasets can be loaded with a flat memory usage.
+
+    Shards are only written for the splits that have samples, so the expected
+    splits without any shard are added as empty splits with the same features as
+    the loaded ones.
+
+    Args:
+        input_dir: Directory containing the `<split>-<index>.<format>` shards.
+        format: File format of the shards.
+        splits: Names of the splits the dataset must have, in order. If None, only
+            the splits with shards are loaded.
+
+    Returns:
+        DatasetDict: The dataset, with one split per shard prefix and per expected
+            split.
+    """
+
+    data_files = {
+        split: [str(shard_path) for shard_path in shard_paths]
+        for split, shard_paths in get_shard_paths(input_dir, format=format).items()
+    }
+    assert data_files, f"No {format} shards found in {input_dir}"
+
+    dataset = load_dataset(
+        "json" if format == "jsonl" else "parquet", data_files=data_files
+    )
+    if splits is None:
+        return dataset
+
+    features = next(iter(dataset.values())).features
+    for split in splits:
+        if split not in dataset:
+            logger.warning(f"Split '{split}' has no samples. Adding it as empty.")
+            dataset[split] = Dataset.from_dict(
+                {column: [] for column in features}, features=features
+            )
+
+    return DatasetDict(
+        {
+            **{split: dataset[split] for split in splits},
+            **{split: dataset[split] for split in dataset if split not in splits},
+        }
+    )
+
+
+def get_shard_paths(
+    input_dir: Path, format: DatasetFormat = "jsonl"
+) -> dict[str, list[Path]]:
+    """Find the `<split>-<index>.<format>` shards of a directory.
+
+    Args:
+        input_dir: Directory containing the shards.
+        format: File format of the shards.
+
+    Returns:
+        dict[str, list[Path]]: The paths of the shards of each split, sorted by index.
+    """
+
+    shard_paths: dict[str, list[Path]] = {}
+    for shard_path in sorted(input_dir.glob(f"*-[0-9][0-9][0-9][0-9][0-9].{format}")):
+        split = shard_path.stem.rsplit("-", 1)[0]
+        shard_paths.setdefault(split, []).append(shard_path)
+
+    return shard_paths
+
+
+def read_shard(shard_path: Path, format: DatasetFormat = "jsonl") -> Iterator[dict]:
+    """Read the samples of a shard.
+
+    Args:
+        shard_path: Path of the shard.
+        format: File format of the shard.
+
+    Yields:
+        dict: The samples of the shard, in order.
+    """
+
+    if format == "jsonl":
+        with open(shard_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from pq.read_table(shard_path).to_pylist()
+
+
+def _write_shard(
+    shard_path: Path, samples: list[dict], format: DatasetFormat = "jsonl"
+) -> None:
+    if format == "jsonl":
+        with open(shard_path, "w", encoding="utf-8") as f:
+            for sample in samples:
+                f.write(json.dumps(sample, ensure_ascii=False))
+                f.write("\n")
+    else:
+        table = pa.Table.from_pylist(samples)
+        pq.write_table(table, shard_path, compression="zstd")
+
+
+def _read_document_ids(
+    shard_paths: dict[str, list[Path]], format: DatasetFormat
+) -> set[str]:
+    document_ids = set()
+    for split_shard_paths in shard_paths.values():
+        for shard_path in split_shard_paths:
+            for sample in read_shard(shard_path, format=format):
+                if sample.get("document_id") is not None:
+                    document_ids.add(sample["document_id"])
+
+    return document_ids
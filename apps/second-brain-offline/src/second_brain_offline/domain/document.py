@@ -1,9 +1,20 @@
 import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
 
-from pydantic import BaseModel, Field
+from loguru import logger
+from pydantic import (
+    BaseModel,
+    Field,
+    PrivateAttr,
+    ValidationError,
+    computed_field,
+)
 
-from second_brain_offline import utils
+from second_brain_offline import tokenizer, utils
 
 
 class DocumentMetadata(BaseModel):
@@ -20,7 +31,9 @@ class DocumentMetadata(BaseModel):
         """
 
         original_id = self.id.replace("-", "")
-        fake_id = utils.generate_random_hex(len(original_id))
+        # Derived from the original ID, so re-obfuscating the same document gives
+        # the same files and incremental writes only see the real changes.
+        fake_id = utils.generate_deterministic_hex(original_id, len(original_id))
 
         self.id = fake_id
         self.url = self.url.replace(original_id, fake_id)
@@ -37,6 +50,23 @@ class Document(BaseModel):
     summary: str | None = None
     child_urls: list[str] = Field(default_factory=list)
 
+    # Token counts per encoding, along with the content they were counted on, so a
+    # replaced content (e.g. through `model_copy(update=...)`) is counted again.
+    _num_tokens: dict[str, tuple[str, int]] = PrivateAttr(default_factory=dict)
+
+    @computed_field
+    @property
+    def content_hash(self) -> str:
+        """xxHash of the content, to detect documents whose content changed.
+
+        Unlike the ID, which identifies the source of the document, the hash
+        changes whenever the content changes, so stages can skip the documents
+        they already processed. It is serialized along with the other fields and
+        recomputed when reading a document back.
+        """
+
+        return utils.hash_to_hex(self.content)
+
     @classmethod
     def from_file(cls, file_path: Path) -> "Document":
         """Read a Document object from a JSON file.
@@ -56,6 +86,151 @@ class Document(BaseModel):
 
         return cls.model_validate_json(json_data)
 
+    @classmethod
+    def from_files(
+        cls,
+        file_paths: Iterable[Path],
+        max_workers: int = 8,
+        batch_size: int = 64,
+    ) -> Iterator["Document"]:
+        """Lazily read Document objects from JSON files using a pool of threads.
+
+        Files are handed to the worker threads in batches, to amortize the
+        scheduling overhead, and their reads overlap. Every file is parsed and
+        validated in a single pydantic-core call, which parses the JSON while
+        validating it, without building intermediate dictionaries. Only a bounded
+        number of batches is read ahead, so consumers can start processing the
+        first documents before the rest are read, with a flat memory usage.
+
+        Args:
+            file_paths: Paths to the JSON files, consumed lazily.
+            max_workers: Number of threads reading and validating files.
+            batch_size: Number of files read and validated together.
+
+        Yields:
+            Document: The documents, in the same order as `file_paths`.
+
+        Raises:
+            FileNotFoundError: If one of the files doesn't exist.
+            ValidationError: If one of the files doesn't match the model structure.
+        """
+
+        file_paths = iter(file_paths)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending: deque[Future[list["Document"]]] = deque()
+            while True:
+                # Keep every worker busy, with one batch of look-ahead each.
+                while len(pending) < 2 * max_workers:
+                    batch = list(islice(file_paths, batch_size))
+                    if not batch:
+                        break
+                    pending.append(executor.submit(cls.__read_batch, batch))
+
+                if not pending:
+                    break
+
+                yield from pending.popleft().result()
+
+    @classmethod
+    def __read_batch(cls, file_paths: list[Path]) -> list["Document"]:
+        documents = []
+        for file_path in file_paths:
+            try:
+                documents.append(cls.model_validate_json(file_path.read_bytes()))
+            except ValidationError:
+                logger.error(f"Invalid document file: '{file_path}'")
+                raise
+
+        return documents
+
+    @classmethod
+    def count_tokens_batch(
+        cls, documents: list["Document"], model_id: str = "gpt-4o-mini"
+    ) -> list[int]:
+        """Count the content tokens of multiple documents, tokenizing in parallel.
+
+        Only documents without a memoized count of their current content for the
+        model's encoding are tokenized. The counts are memoized on each document.
+
+        Args:
+            documents: List of documents to measure.
+            model_id: The model name used to determine the encoding.
+
+        Returns:
+            list[int]: Number of content tokens of each document, in the same order.
+        """
+
+        encoding_name = tokenizer.get_encoding(model_id).name
+        num_tokens = [
+            document.__get_memoized_num_tokens(encoding_name) for document in documents
+        ]
+        missing_indices = [
+            index
+            for index, document_num_tokens in enumerate(num_tokens)
+            if document_num_tokens is None
+        ]
+        if missing_indices:
+            missing_num_tokens = tokenizer.count_tokens_batch(
+                [documents[index].content for index in missing_indices], model_id
+            )
+            for index, document_num_tokens in zip(missing_indices, missing_num_tokens):
+                documents[index].__set_memoized_num_tokens(
+                    encoding_name, document_num_tokens
+                )
+                num_tokens[index] = document_num_tokens
+
+        return num_tokens
+
+    def count_tokens(self, model_id: str = "gpt-4o-mini") -> int:
+        """Count the content tokens of the document, memoizing the result.
+
+        Args:
+            model_id: The model name used to determine the encoding.
+
+        Returns:
+            int: Number of tokens of the document content.
+        """
+
+        encoding_name = tokenizer.get_encoding(model_id).name
+        num_tokens = self.__get_memoized_num_tokens(encoding_name)
+        if num_tokens is None:
+            num_tokens = len(tokenizer.encode(self.content, model_id))
+            self.__set_memoized_num_tokens(encoding_name, num_tokens)
+
+        return num_tokens
+
+    def __get_memoized_num_tokens(self, encoding_name: str) -> int | None:
+        memo = self._num_tokens.get(encoding_name)
+        if memo is None or memo[0] is not self.content:
+            return None
+
+        return memo[1]
+
+    def __set_memoized_num_tokens(self, encoding_name: str, num_tokens: int) -> None:
+        # Replaced rather than updated, as `model_copy` shares it with the copies.
+        self._num_tokens = {
+            **self._num_tokens,
+            encoding_name: (self.content, num_tokens),
+        }
+
+    def clip_content(self, max_tokens: int, model_id: str = "gpt-4o-mini") -> str:
+        """Return the prefix of the content that fits within a token budget.
+
+        Args:
+            max_tokens: Maximum number of tokens to keep.
+            model_id: The model name used to determine the encoding.
+
+        Returns:
+            str: The clipped content.
+        """
+
+        return utils.clip_tokens(
+            self.content,
+            max_tokens=max_tokens,
+            model_id=model_id,
+            num_tokens=self.count_tokens(model_id),
+        )
+
     def add_summary(self, summary: str) -> "Document":
         self.summary = summary
 
@@ -66,6 +241,15 @@ class Document(BaseModel):
 
         return self
 
+    def to_json(self) -> str:
+        """Serialize the document as indented JSON, as written to disk.
+
+        Returns:
+            str: The JSON representation of the document.
+        """
+
+        return json.dumps(self.model_dump(), indent=4, ensure_ascii=False)
+
     def write(
         self, output_dir: Path, obfuscate: bool = False, also_save_as_txt: bool = False
     ) -> None:
@@ -82,16 +266,9 @@ class Document(BaseModel):
         if obfuscate:
             self.obfuscate()
 
-        json_page = self.model_dump()
-
         output_file = output_dir / f"{self.id}.json"
         with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(
-                json_page,
-                f,
-                indent=4,
-                ensure_ascii=False,
-            )
+            f.write(self.to_json())
 
         if also_save_as_txt:
             txt_path = output_file.with_suffix(".txt")
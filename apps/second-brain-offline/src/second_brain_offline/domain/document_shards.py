@@ -0,0 +1,230 @@
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Literal
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from loguru import logger
+
+from .document import Document
+
+CorpusFormat = Literal["json", "parquet"]
+
+# Content comes last and the metadata is kept in its own columns, so projections
+# on the lightweight columns never read the content pages.
+DOCUMENT_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("metadata", pa.string(), nullable=False),
+        pa.field("parent_metadata", pa.string()),
+        pa.field("content_quality_score", pa.float64()),
+        pa.field("summary", pa.string()),
+        pa.field("child_urls", pa.list_(pa.string())),
+        pa.field("content_hash", pa.string()),
+        pa.field("content", pa.string(), nullable=False),
+    ]
+)
+METADATA_COLUMNS = ["metadata", "parent_metadata"]
+
+
+def write_document_shards(
+    documents: Iterable[Document],
+    output_dir: Path,
+    shard_size: int = 10_000,
+    row_group_size: int = 1_000,
+) -> list[Path]:
+    """Write documents as zstd-compressed Parquet shards.
+
+    The shards are named `documents-<index>.parquet`. Documents are consumed lazily
+    and only one shard is held in memory at a time. The metadata is stored as JSON
+    strings, as its properties differ between documents.
+
+    Args:
+        documents: The documents to write.
+        output_dir: Directory where the shards are written.
+        shard_size: Maximum number of documents per shard.
+        row_group_size: Number of documents per Parquet row group, which is the
+            granularity at which readers skip data filtered out by a predicate.
+
+    Returns:
+        list[Path]: The paths of the written shards.
+    """
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    shard_paths = []
+    num_documents = 0
+    for shard_name, shard_documents, table in _iter_shard_tables(
+        documents, shard_size=shard_size
+    ):
+        shard_path = output_dir / shard_name
+        pq.write_table(
+            table, shard_path, compression="zstd", row_group_size=row_group_size
+        )
+
+        shard_paths.append(shard_path)
+        num_documents += shard_documents
+
+    logger.info(
+        f"Wrote {num_documents} documents as {len(shard_paths)} Parquet shards "
+        f"to {output_dir}"
+    )
+
+    return shard_paths
+
+
+def serialize_document_shards(
+    documents: Iterable[Document],
+    shard_size: int = 10_000,
+    row_group_size: int = 1_000,
+) -> Iterator[tuple[str, bytes]]:
+    """Serialize documents as zstd-compressed Parquet shards, in memory.
+
+    The shards are identical to the ones written by `write_document_shards`, so
+    callers can decide themselves where and whether to write them.
+
+    Args:
+        documents: The documents to serialize.
+        shard_size: Maximum number of documents per shard.
+        row_group_size: Number of documents per Parquet row group.
+
+    Yields:
+        tuple[str, bytes]: The file name and the content of every shard.
+    """
+
+    for shard_name, _, table in _iter_shard_tables(documents, shard_size=shard_size):
+        buffer = pa.BufferOutputStream()
+        pq.write_table(
+            table, buffer, compression="zstd", row_group_size=row_group_size
+        )
+
+        yield shard_name, buffer.getvalue().to_pybytes()
+
+
+def read_document_shards(
+    input_dir: Path,
+    content_quality_score_threshold: float | None = None,
+    batch_size: int = 1_000,
+) -> Iterator[Document]:
+    """Lazily read the documents of Parquet shards.
+
+    The shards are memory-mapped and converted to documents one batch at a time.
+    With a quality score threshold, the filter is pushed down to the Parquet
+    reader, which uses the row group statistics of the score column to skip the
+    content of the filtered out documents.
+
+    Args:
+        input_dir: Directory containing the `documents-<index>.parquet` shards.
+        content_quality_score_threshold: If set, only documents without a quality
+            score, with a score of 0, or with a score above the threshold are read.
+        batch_size: Number of documents converted at once.
+
+    Yields:
+        Document: The documents of the shards, in order.
+    """
+
+    filters = (
+        _get_quality_filter(content_quality_score_threshold)
+        if content_quality_score_threshold is not None
+        else None
+    )
+    for shard_path in get_document_shard_paths(input_dir):
+        table = pq.read_table(shard_path, filters=filters, memory_map=True)
+        for batch in table.to_batches(max_chunksize=batch_size):
+            for row in batch.to_pylist():
+                yield _from_row(row)
+
+
+def read_document_columns(
+    input_dir: Path,
+    columns: list[str],
+    content_quality_score_threshold: float | None = None,
+) -> pa.Table:
+    """Read only some columns of Parquet shards, without building documents.
+
+    Only the pages of the requested columns are read, so reading the IDs and the
+    quality scores of a corpus never touches its content.
+
+    Args:
+        input_dir: Directory containing the `documents-<index>.parquet` shards.
+        columns: Names of the columns to read, such as
+            ["id", "content_quality_score"].
+        content_quality_score_threshold: If set, only documents without a quality
+            score, with a score of 0, or with a score above the threshold are read.
+
+    Returns:
+        pa.Table: The requested columns of all the shards, memory-mapped.
+    """
+
+    shard_paths = get_document_shard_paths(input_dir)
+    filters = (
+        _get_quality_filter(content_quality_score_threshold)
+        if content_quality_score_threshold is not None
+        else None
+    )
+    tables = [
+        pq.read_table(shard_path, columns=columns, filters=filters, memory_map=True)
+        for shard_path in shard_paths
+    ]
+    if not tables:
+        return DOCUMENT_SCHEMA.empty_table().select(columns)
+
+    return pa.concat_tables(tables)
+
+
+def get_document_shard_paths(input_dir: Path) -> list[Path]:
+    """Find the `documents-<index>.parquet` shards of a directory.
+
+    Args:
+        input_dir: Directory containing the shards.
+
+    Returns:
+        list[Path]: The paths of the shards, sorted by index.
+    """
+
+    return sorted(input_dir.glob("documents-[0-9][0-9][0-9][0-9][0-9].parquet"))
+
+
+def _iter_shard_tables(
+    documents: Iterable[Document], shard_size: int
+) -> Iterator[tuple[str, int, pa.Table]]:
+    assert shard_size > 0, "Shard size must be positive"
+
+    documents = iter(documents)
+    shard_index = 0
+    while shard_documents := list(islice(documents, shard_size)):
+        table = pa.Table.from_pylist(
+            [_to_row(document) for document in shard_documents],
+            schema=DOCUMENT_SCHEMA,
+        )
+
+        yield f"documents-{shard_index:05d}.parquet", len(shard_documents), table
+
+        shard_index += 1
+
+
+def _get_quality_filter(content_quality_score_threshold: float) -> pc.Expression:
+    # Same rule as the filter_by_quality step: unscored documents are kept.
+    score = pc.field("content_quality_score")
+
+    return score.is_null() | (score == 0) | (score > content_quality_score_threshold)
+
+
+def _to_row(document: Document) -> dict:
+    row = document.model_dump()
+    for column in METADATA_COLUMNS:
+        if row[column] is not None:
+            row[column] = json.dumps(row[column], ensure_ascii=False)
+
+    return row
+
+
+def _from_row(row: dict) -> Document:
+    row.pop("content_hash", None)
+    for column in METADATA_COLUMNS:
+        if row.get(column) is not None:
+            row[column] = json.loads(row[column])
+
+    return Document.model_validate(row)
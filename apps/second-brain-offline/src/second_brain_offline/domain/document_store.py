@@ -0,0 +1,250 @@
+import json
+import shutil
+import weakref
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import pyarrow.parquet as pq
+from pydantic import BaseModel, Field
+
+from .document import Document, DocumentMetadata
+from .document_shards import (
+    METADATA_COLUMNS,
+    get_document_shard_paths,
+    read_document_columns,
+    write_document_shards,
+)
+
+ContentLoader = Callable[[list[str]], list[str]]
+"""Loads the contents of documents given their IDs, in the same order."""
+
+
+class DocumentHeader(BaseModel):
+    """Everything about a document except its content.
+
+    Attributes:
+        content_hash: Hash of the content, if known, to detect changes without
+            loading the content.
+    """
+
+    id: str
+    metadata: DocumentMetadata
+    parent_metadata: DocumentMetadata | None = None
+    content_quality_score: float | None = None
+    summary: str | None = None
+    child_urls: list[str] = Field(default_factory=list)
+    content_hash: str | None = None
+
+    @classmethod
+    def from_document(cls, document: Document) -> "DocumentHeader":
+        """Create the header of a document.
+
+        Args:
+            document: The document to describe.
+
+        Returns:
+            DocumentHeader: The document without its content.
+        """
+
+        return cls.model_validate(document.model_dump(exclude={"content"}))
+
+    def to_document(self, content: str) -> Document:
+        """Create the full document from the header and its content.
+
+        Args:
+            content: The content of the document.
+
+        Returns:
+            Document: The full document.
+        """
+
+        return Document.model_validate(
+            {**self.model_dump(exclude={"content_hash"}), "content": content}
+        )
+
+
+class DocumentStore:
+    """A collection of documents whose content is only loaded when needed.
+
+    The headers of the documents (IDs, metadata, scores, ...) are kept in memory,
+    while the contents stay in their source, such as memory-mapped Parquet shards
+    or a MongoDB collection, and are loaded in batches by a content loader. Steps
+    that only look at the headers, like quality filtering, never load a content,
+    and steps that need the contents can process them batch by batch, so the
+    memory usage no longer grows with the size of the corpus.
+
+    Filtering a store creates a new store sharing the same content loader.
+
+    Attributes:
+        headers: The headers of the documents, in order.
+    """
+
+    def __init__(
+        self, headers: list[DocumentHeader], content_loader: ContentLoader
+    ) -> None:
+        self.headers = headers
+
+        self._content_loader = content_loader
+
+    @classmethod
+    def from_shards(
+        cls, input_dir: Path, delete_input_dir: bool = False
+    ) -> "DocumentStore":
+        """Create a store from Parquet shards, without reading their content.
+
+        Only the header columns are read. The contents are read on demand from the
+        memory-mapped shards, decompressing only the row groups holding the
+        requested documents.
+
+        Args:
+            input_dir: Directory containing the `documents-<index>.parquet` shards.
+            delete_input_dir: If True, the directory is deleted once the store, and
+                every store filtered from it, is garbage collected. Used for
+                temporary copies of the shards.
+
+        Returns:
+            DocumentStore: The store, serving the contents from the shards.
+        """
+
+        header_columns = list(DocumentHeader.model_fields)
+        headers = [
+            DocumentHeader.model_validate(_decode_metadata_columns(row))
+            for row in read_document_columns(input_dir, header_columns).to_pylist()
+        ]
+
+        return cls(
+            headers=headers,
+            content_loader=_ShardContentLoader(
+                input_dir, delete_input_dir=delete_input_dir
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    @property
+    def ids(self) -> list[str]:
+        """The IDs of the documents, in order."""
+
+        return [header.id for header in self.headers]
+
+    def filter(self, predicate: Callable[[DocumentHeader], bool]) -> "DocumentStore":
+        """Keep the documents whose header satisfies a predicate.
+
+        Args:
+            predicate: Function returning True for the documents to keep.
+
+        Returns:
+            DocumentStore: A new store with the kept documents, sharing the content
+                loader of this store.
+        """
+
+        return DocumentStore(
+            headers=[header for header in self.headers if predicate(header)],
+            content_loader=self._content_loader,
+        )
+
+    def get_documents(self, ids: list[str]) -> list[Document]:
+        """Load the full documents with the given IDs.
+
+        Args:
+            ids: IDs of the documents to load.
+
+        Returns:
+            list[Document]: The documents, in the same order as `ids`.
+        """
+
+        headers_by_id = {header.id: header for header in self.headers}
+        contents = self._content_loader(ids)
+
+        return [
+            headers_by_id[id].to_document(content) for id, content in zip(ids, contents)
+        ]
+
+    def iter_documents(self, batch_size: int = 256) -> Iterator[Document]:
+        """Lazily load the full documents, one batch of contents at a time.
+
+        Args:
+            batch_size: Number of contents loaded at once.
+
+        Yields:
+            Document: The documents of the store, in order.
+        """
+
+        headers = iter(self.headers)
+        while batch := list(islice(headers, batch_size)):
+            contents = self._content_loader([header.id for header in batch])
+            for header, content in zip(batch, contents):
+                yield header.to_document(content)
+
+    def to_documents(self) -> list[Document]:
+        """Load all the full documents in memory.
+
+        Returns:
+            list[Document]: The documents of the store, in order.
+        """
+
+        return list(self.iter_documents())
+
+    def write_shards(self, output_dir: Path, shard_size: int = 10_000) -> list[Path]:
+        """Write the documents of the store as Parquet shards, batch by batch.
+
+        Args:
+            output_dir: Directory where the shards are written.
+            shard_size: Maximum number of documents per shard.
+
+        Returns:
+            list[Path]: The paths of the written shards.
+        """
+
+        return write_document_shards(
+            self.iter_documents(), output_dir=output_dir, shard_size=shard_size
+        )
+
+
+class _ShardContentLoader:
+    """Reads contents from the row groups of memory-mapped Parquet shards."""
+
+    def __init__(self, input_dir: Path, delete_input_dir: bool = False) -> None:
+        if delete_input_dir:
+            # Filtered stores share the loader, so the shards live as long as it.
+            weakref.finalize(self, shutil.rmtree, input_dir, ignore_errors=True)
+
+        self._files: list[pq.ParquetFile] = []
+        self._locations: dict[str, tuple[int, int, int]] = {}
+        for shard_path in get_document_shard_paths(input_dir):
+            parquet_file = pq.ParquetFile(shard_path, memory_map=True)
+            file_index = len(self._files)
+            self._files.append(parquet_file)
+            for row_group in range(parquet_file.num_row_groups):
+                ids = parquet_file.read_row_group(row_group, columns=["id"])["id"]
+                for row, id in enumerate(ids.to_pylist()):
+                    self._locations[id] = (file_index, row_group, row)
+
+    def __call__(self, ids: Iterable[str]) -> list[str]:
+        ids = list(ids)
+        locations = [self._locations[id] for id in ids]
+
+        contents_by_row_group: dict[tuple[int, int], list[str]] = {}
+        for file_index, row_group, _ in locations:
+            if (file_index, row_group) not in contents_by_row_group:
+                table = self._files[file_index].read_row_group(
+                    row_group, columns=["content"]
+                )
+                contents_by_row_group[(file_index, row_group)] = table[
+                    "content"
+                ].to_pylist()
+
+        return [
+            contents_by_row_group[(file_index, row_group)][row]
+            for file_index, row_group, row in locations
+        ]
+
+
+def _decode_metadata_columns(row: dict) -> dict:
+    for column in METADATA_COLUMNS:
+        if row.get(column) is not None:
+            row[column] = json.loads(row[column])
+
+    return row
@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field
+
+
+class Histogram(BaseModel):
+    """Binned distribution of a numeric field.
+
+    Attributes:
+        bin_edges: The `len(counts) + 1` edges of the bins, in increasing order.
+        counts: Number of values falling in each bin.
+        percentiles: Percentiles of the values, keyed by name, such as "p50".
+        num_values: Number of values of the distribution.
+        min_value: Smallest value, or None if there are no values.
+        max_value: Largest value, or None if there are no values.
+    """
+
+    bin_edges: list[float] = Field(default_factory=list)
+    counts: list[int] = Field(default_factory=list)
+    percentiles: dict[str, float] = Field(default_factory=dict)
+    num_values: int = 0
+    min_value: float | None = None
+    max_value: float | None = None
+
+    def scale(self, factor: float) -> "Histogram":
+        """Create the histogram of the values multiplied by a positive factor.
+
+        Args:
+            factor: Positive factor applied to the values.
+
+        Returns:
+            Histogram: A new histogram with the same counts and scaled values.
+        """
+
+        assert factor > 0, "Scale factor must be positive"
+
+        def scale_value(value: float | None) -> float | None:
+            return value * factor if value is not None else None
+
+        return Histogram(
+            bin_edges=[edge * factor for edge in self.bin_edges],
+            counts=list(self.counts),
+            percentiles={
+                name: value * factor for name, value in self.percentiles.items()
+            },
+            num_values=self.num_values,
+            min_value=scale_value(self.min_value),
+            max_value=scale_value(self.max_value),
+        )
+
+
+class CorpusStatistics(BaseModel):
+    """Distributions of the documents of a corpus.
+
+    Attributes:
+        num_documents: Number of documents of the corpus.
+        content_length: Distribution of the content lengths, in characters.
+        num_tokens: Estimated distribution of the content lengths, in tokens.
+        quality_score: Distribution of the content quality scores of the scored
+            documents.
+        chars_per_token: Average number of characters per token, measured on a
+            sample of the documents and used to estimate the token lengths.
+    """
+
+    num_documents: int
+    content_length: Histogram
+    num_tokens: Histogram
+    quality_score: Histogram
+    chars_per_token: float
@@ -0,0 +1,108 @@
+import hashlib
+from pathlib import Path
+
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete, HfApi
+from huggingface_hub.hf_api import RepoFile
+from huggingface_hub.utils import EntryNotFoundError
+from loguru import logger
+
+from second_brain_offline.domain import DatasetFormat
+from second_brain_offline.domain.dataset_shards import get_shard_paths
+
+DATA_DIR_IN_REPO = "data"
+
+
+def push_dataset_shards(
+    dataset_dir: Path,
+    repo_id: str,
+    token: str | None = None,
+    format: DatasetFormat = "jsonl",
+) -> list[str]:
+    """Push the dataset shards to a Hugging Face dataset repository, if they changed.
+
+    Each local shard is compared with the file of the same path in the repository,
+    using the SHA-256 of LFS files or the git blob SHA-1 of regular files, so only
+    new or modified shards are uploaded. Files of the repository data directory
+    that don't match any local shard are deleted, so the repository always mirrors
+    the local shards.
+
+    Args:
+        dataset_dir: Directory containing the `<split>-<index>.<format>` shards.
+        repo_id: ID of the Hugging Face dataset repository.
+        token: Hugging Face access token.
+        format: File format of the shards.
+
+    Returns:
+        list[str]: Paths in the repository of the uploaded shards.
+    """
+
+    api = HfApi(token=token)
+    api.create_repo(repo_id, repo_type="dataset", exist_ok=True)
+
+    remote_files = _list_remote_files(api, repo_id)
+
+    operations: list[CommitOperationAdd | CommitOperationDelete] = []
+    local_paths_in_repo = set()
+    for shard_paths in get_shard_paths(dataset_dir, format=format).values():
+        for shard_path in shard_paths:
+            path_in_repo = f"{DATA_DIR_IN_REPO}/{shard_path.name}"
+            local_paths_in_repo.add(path_in_repo)
+
+            remote_file = remote_files.get(path_in_repo)
+            if remote_file is None or not _is_same_file(shard_path, remote_file):
+                operations.append(
+                    CommitOperationAdd(
+                        path_in_repo=path_in_repo, path_or_fileobj=shard_path
+                    )
+                )
+    uploaded_paths = [operation.path_in_repo for operation in operations]
+
+    operations.extend(
+        CommitOperationDelete(path_in_repo=path_in_repo)
+        for path_in_repo in remote_files
+        if path_in_repo not in local_paths_in_repo
+    )
+
+    if not operations:
+        logger.info(f"All the shards of {repo_id} are up to date.")
+
+        return []
+
+    logger.info(
+        f"Pushing {len(uploaded_paths)} changed shards to {repo_id} "
+        f"and deleting {len(operations) - len(uploaded_paths)} stale files."
+    )
+    api.create_commit(
+        repo_id,
+        operations=operations,
+        commit_message=f"Update {len(uploaded_paths)} dataset shards",
+        repo_type="dataset",
+    )
+
+    return uploaded_paths
+
+
+def _list_remote_files(api: HfApi, repo_id: str) -> dict[str, RepoFile]:
+    try:
+        return {
+            item.path: item
+            for item in api.list_repo_tree(
+                repo_id,
+                path_in_repo=DATA_DIR_IN_REPO,
+                repo_type="dataset",
+                recursive=True,
+            )
+            if isinstance(item, RepoFile)
+        }
+    except EntryNotFoundError:
+        return {}
+
+
+def _is_same_file(local_path: Path, remote_file: RepoFile) -> bool:
+    content = local_path.read_bytes()
+    if remote_file.lfs is not None:
+        return hashlib.sha256(content).hexdigest() == remote_file.lfs.sha256
+
+    git_blob = f"blob {len(content)}\0".encode("utf-8") + content
+
+    return hashlib.sha1(git_blob).hexdigest() == remote_file.blob_id
@@ -0,0 +1,3 @@
+from .server import MockLLMServerConfig, create_app
+
+__all__ = ["MockLLMServerConfig", "create_app"]
@@ -0,0 +1,257 @@
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+
+from aiohttp import web
+from loguru import logger
+from pydantic import BaseModel, Field
+
+EMBEDDING_MODEL_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+CHUNK_ID_PATTERN = re.compile(r'<chunk id="(\d+)">')
+
+
+class MockLLMServerConfig(BaseModel):
+    """Behavior of the mock OpenAI-compatible server.
+
+    Attributes:
+        latency_seconds: Fixed latency added to every request.
+        latency_jitter_seconds: Maximum random latency added on top of the fixed one.
+        tokens_per_second: Generation speed used to delay chat completions
+            proportionally to their number of output tokens.
+        completion_tokens: Number of tokens of every generated chat completion.
+        max_concurrent_requests: Maximum number of in-flight requests. Requests above
+            this limit are rejected with a 429, like a rate-limited API.
+        rate_limit_rate: Fraction of the requests randomly rejected with a 429.
+        error_rate: Fraction of the requests randomly failing with a 500.
+        embedding_dim: Dimension of the embeddings of unknown embedding models.
+        seed: Seed of the random latencies and failures.
+    """
+
+    latency_seconds: float = Field(default=0.2, ge=0)
+    latency_jitter_seconds: float = Field(default=0.0, ge=0)
+    tokens_per_second: float = Field(default=100.0, gt=0)
+    completion_tokens: int = Field(default=64, ge=1)
+    max_concurrent_requests: int | None = Field(default=None, ge=1)
+    rate_limit_rate: float = Field(default=0.0, ge=0, le=1)
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    embedding_dim: int = Field(default=1536, ge=1)
+    seed: int = 42
+
+
+def create_app(config: MockLLMServerConfig | None = None) -> web.Application:
+    """Create a local server mimicking the OpenAI chat completions and embeddings APIs.
+
+    The outputs only depend on the request inputs, so runs are reproducible, while
+    the latency, throughput and failures can be tuned to reproduce the behavior of
+    a loaded API. Point the OpenAI clients at it by setting `OPENAI_BASE_URL` to
+    the server URL followed by `/v1`.
+
+    Args:
+        config: Behavior of the server. Defaults to MockLLMServerConfig().
+
+    Returns:
+        web.Application: The aiohttp application serving the API.
+    """
+
+    config = config or MockLLMServerConfig()
+    rng = random.Random(config.seed)
+    num_in_flight_requests = 0
+
+    @web.middleware
+    async def simulate_load(request: web.Request, handler) -> web.StreamResponse:
+        nonlocal num_in_flight_requests
+
+        if (
+            config.max_concurrent_requests is not None
+            and num_in_flight_requests >= config.max_concurrent_requests
+        ) or rng.random() < config.rate_limit_rate:
+            return _error_response(
+                429, "Rate limit reached. Please retry later.", "rate_limit_exceeded"
+            )
+        if rng.random() < config.error_rate:
+            return _error_response(500, "The server had an error.", "server_error")
+
+        num_in_flight_requests += 1
+        try:
+            await asyncio.sleep(
+                config.latency_seconds
+                + rng.uniform(0, config.latency_jitter_seconds)
+            )
+
+            return await handler(request)
+        finally:
+            num_in_flight_requests -= 1
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get("stream"):
+            return _error_response(
+                400, "Streaming is not supported by the mock server.", "invalid_request"
+            )
+
+        prompt = "\n".join(
+            _get_message_text(message) for message in body.get("messages", [])
+        )
+        completion_tokens = min(
+            config.completion_tokens,
+            body.get("max_completion_tokens")
+            or body.get("max_tokens")
+            or config.completion_tokens,
+        )
+        content = _generate_completion(
+            prompt,
+            num_tokens=completion_tokens,
+            json_mode=(body.get("response_format") or {}).get("type")
+            in ("json_object", "json_schema"),
+        )
+        await asyncio.sleep(completion_tokens / config.tokens_per_second)
+
+        prompt_tokens = _estimate_num_tokens(prompt)
+
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{_hash(prompt)[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                        "logprobs": None,
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    async def embeddings(request: web.Request) -> web.Response:
+        body = await request.json()
+        model = body.get("model", "mock")
+        dim = body.get("dimensions") or EMBEDDING_MODEL_DIMS.get(
+            model, config.embedding_dim
+        )
+        inputs = body.get("input", [])
+        # A single text or token array is sent as is, a batch as a list of them.
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        data = []
+        num_tokens = 0
+        for index, text in enumerate(inputs):
+            text = text if isinstance(text, str) else json.dumps(text)
+            num_tokens += _estimate_num_tokens(text)
+
+            embedding = _generate_embedding(text, dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(
+                    array.array("f", embedding).tobytes()
+                ).decode("utf-8")
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        return web.json_response(
+            {
+                "object": "list",
+                "data": data,
+                "model": model,
+                "usage": {"prompt_tokens": num_tokens, "total_tokens": num_tokens},
+            }
+        )
+
+    async def models(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "object": "list",
+                "data": [
+                    {"id": model, "object": "model", "owned_by": "mock"}
+                    for model in ["gpt-4o-mini", *EMBEDDING_MODEL_DIMS]
+                ],
+            }
+        )
+
+    app = web.Application(middlewares=[simulate_load])
+    app.add_routes(
+        [
+            web.post("/v1/chat/completions", chat_completions),
+            web.post("/v1/embeddings", embeddings),
+            web.get("/v1/models", models),
+        ]
+    )
+
+    logger.info(f"Created mock LLM server with config: {config.model_dump()}")
+
+    return app
+
+
+def _error_response(status: int, message: str, code: str) -> web.Response:
+    return web.json_response(
+        {"error": {"message": message, "type": code, "param": None, "code": code}},
+        status=status,
+        headers={"retry-after": "1"} if status == 429 else None,
+    )
+
+
+def _get_message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        content = "\n".join(part.get("text", "") for part in content)
+
+    return content
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _estimate_num_tokens(text: str) -> int:
+    # OpenAI's rule of thumb of ~4 characters per token, to avoid loading tiktoken.
+    return max(1, len(text) // 4)
+
+
+def _generate_completion(prompt: str, num_tokens: int, json_mode: bool) -> str:
+    prompt_rng = random.Random(_hash(prompt))
+    if json_mode:
+        # Enough to be parsed by the agents expecting a JSON answer: a quality score,
+        # and a context for every `<chunk id="...">` sent to the contextual agent.
+        chunk_ids = [int(chunk_id) for chunk_id in CHUNK_ID_PATTERN.findall(prompt)]
+        return json.dumps(
+            {
+                "score": round(prompt_rng.random(), 2),
+                "contexts": [
+                    {
+                        "chunk_id": chunk_id,
+                        "context": _generate_text(prompt_rng, num_tokens),
+                    }
+                    for chunk_id in chunk_ids
+                ],
+            }
+        )
+
+    return _generate_text(prompt_rng, num_tokens)
+
+
+def _generate_text(rng: random.Random, num_tokens: int) -> str:
+    return " ".join(f"mock{rng.randrange(1000)}" for _ in range(num_tokens))
+
+
+def _generate_embedding(text: str, dim: int) -> list[float]:
+    text_rng = random.Random(_hash(text))
+    embedding = [text_rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+
+    return [value / norm for value in embedding]
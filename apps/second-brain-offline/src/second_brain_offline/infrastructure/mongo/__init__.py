@@ -1,4 +1,21 @@
+from .client import (
+    PoolMetrics,
+    close_mongo_clients,
+    get_mongo_client,
+    get_pool_metrics,
+)
+from .document_store import fetch_document_store
 from .indexes import MongoDBIndex
 from .service import MongoDBService
+from .statistics import compute_corpus_statistics
 
-__all__ = ["MongoDBService", "MongoDBIndex"]
+__all__ = [
+    "MongoDBService",
+    "MongoDBIndex",
+    "PoolMetrics",
+    "close_mongo_clients",
+    "compute_corpus_statistics",
+    "fetch_document_store",
+    "get_mongo_client",
+    "get_pool_metrics",
+]
@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+
+from loguru import logger
+from pydantic import BaseModel
+from pymongo import MongoClient, monitoring
+
+from second_brain_offline.config import settings
+
+APP_NAME = "second_brain_course"
+
+
+class PoolMetrics(BaseModel):
+    """Connection pool activity of a MongoDB client, across all its servers.
+
+    Attributes:
+        num_open_connections: Number of connections currently open.
+        num_checked_out: Number of connections currently in use.
+        max_checked_out: Highest number of connections in use at once.
+        num_checkouts: Number of connections handed out by the pool.
+        num_checkout_failures: Number of checkouts that failed, e.g. on timeouts.
+        num_pool_clears: Number of times the pool was cleared after an error.
+        total_checkout_seconds: Total time spent waiting for a connection.
+    """
+
+    num_open_connections: int = 0
+    num_checked_out: int = 0
+    max_checked_out: int = 0
+    num_checkouts: int = 0
+    num_checkout_failures: int = 0
+    num_pool_clears: int = 0
+    total_checkout_seconds: float = 0.0
+
+    @property
+    def mean_checkout_seconds(self) -> float:
+        """Mean time spent waiting for a connection."""
+
+        if self.num_checkouts == 0:
+            return 0.0
+
+        return self.total_checkout_seconds / self.num_checkouts
+
+
+class _PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self) -> None:
+        self.metrics = PoolMetrics()
+        self._lock = threading.Lock()
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self.metrics.num_pool_clears += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.metrics.num_open_connections += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.metrics.num_open_connections -= 1
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        pass
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        with self._lock:
+            self.metrics.num_checkout_failures += 1
+
+    def connection_checked_out(
+        self, event: monitoring.ConnectionCheckedOutEvent
+    ) -> None:
+        with self._lock:
+            self.metrics.num_checkouts += 1
+            self.metrics.num_checked_out += 1
+            self.metrics.max_checked_out = max(
+                self.metrics.max_checked_out, self.metrics.num_checked_out
+            )
+            # The checkout duration is only reported since PyMongo 4.7.
+            self.metrics.total_checkout_seconds += getattr(event, "duration", 0.0)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self.metrics.num_checked_out -= 1
+
+
+# The client of every URI, with its metrics and the process that created it.
+_clients: dict[str, tuple[MongoClient, _PoolMetricsListener, int]] = {}
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(mongodb_uri: str = settings.MONGODB_URI) -> MongoClient:
+    """Get the process-wide MongoDB client of a URI, creating it on first use.
+
+    MongoClient is thread-safe and pools its connections, so sharing a single
+    client per URI avoids opening a pool, and paying the connection handshakes,
+    for every service and retriever. The client is pinged once, when created.
+    Clients aren't fork-safe, so a forked process creates its own.
+
+    The pool sizes are set by the MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE and
+    MONGODB_MAX_IDLE_TIME_MS settings.
+
+    Args:
+        mongodb_uri: URI of the MongoDB instance.
+
+    Returns:
+        MongoClient: The shared client of the URI.
+
+    Raises:
+        Exception: If the connection to MongoDB fails.
+    """
+
+    with _clients_lock:
+        if mongodb_uri in _clients:
+            client, _, pid = _clients[mongodb_uri]
+            if pid == os.getpid():
+                return client
+
+        listener = _PoolMetricsListener()
+        client = MongoClient(
+            mongodb_uri,
+            appname=APP_NAME,
+            maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+            event_listeners=[listener],
+        )
+        try:
+            client.admin.command("ping")
+        except Exception as e:
+            logger.error(f"Failed to connect to MongoDB: {e}")
+            client.close()
+            raise
+
+        _clients[mongodb_uri] = (client, listener, os.getpid())
+        logger.info(
+            f"Created MongoDB client with a pool of up to "
+            f"{settings.MONGODB_MAX_POOL_SIZE} connections"
+        )
+
+        return client
+
+
+def get_pool_metrics() -> dict[str, PoolMetrics]:
+    """Get the connection pool metrics of the clients created by this process.
+
+    Returns:
+        dict[str, PoolMetrics]: A snapshot of the metrics, keyed by URI without
+            credentials.
+    """
+
+    with _clients_lock:
+        return {
+            re.sub(r"//[^/@]*@", "//", mongodb_uri): listener.metrics.model_copy()
+            for mongodb_uri, (_, listener, pid) in _clients.items()
+            if pid == os.getpid()
+        }
+
+
+def close_mongo_clients() -> None:
+    """Close the shared MongoDB clients, e.g. when the process shuts down."""
+
+    with _clients_lock:
+        for client, _, pid in _clients.values():
+            if pid == os.getpid():
+                client.close()
+        _clients.clear()
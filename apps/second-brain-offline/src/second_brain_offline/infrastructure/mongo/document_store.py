@@ -0,0 +1,61 @@
+from bson import ObjectId
+from loguru import logger
+
+from second_brain_offline.config import settings
+from second_brain_offline.domain import DocumentHeader, DocumentStore
+from second_brain_offline.infrastructure.mongo.client import get_mongo_client
+from second_brain_offline.infrastructure.mongo.service import MongoDBService
+
+
+def fetch_document_store(
+    collection_name: str,
+    limit: int,
+    query: dict | None = None,
+    database_name: str = settings.MONGODB_DATABASE_NAME,
+    mongodb_uri: str = settings.MONGODB_URI,
+) -> DocumentStore:
+    """Fetch the headers of the documents of a collection, without their content.
+
+    The documents are fetched with a projection excluding their content, which is
+    queried by ID, one batch at a time, only when the documents of the returned
+    store are iterated. The store holds its own reference to the collection, on the
+    shared client of `get_mongo_client`, so it can be iterated at any time.
+
+    Args:
+        collection_name: Name of the collection holding the documents.
+        limit: Maximum number of documents to fetch.
+        query: MongoDB query filter to apply.
+        database_name: Name of the database holding the collection.
+        mongodb_uri: URI of the MongoDB instance.
+
+    Returns:
+        DocumentStore: The fetched documents, loading their content from MongoDB.
+    """
+
+    with MongoDBService(
+        model=DocumentHeader,
+        collection_name=collection_name,
+        database_name=database_name,
+        mongodb_uri=mongodb_uri,
+    ) as service:
+        headers = list(
+            service.iter_documents(query, limit=limit, projection={"content": 0})
+        )
+
+    logger.info(
+        f"Fetched the headers of {len(headers)} documents from collection "
+        f"'{collection_name}'"
+    )
+
+    collection = get_mongo_client(mongodb_uri)[database_name][collection_name]
+
+    def load_contents(ids: list[str]) -> list[str]:
+        # Documents are keyed either on an ObjectId or on their own string ID, which
+        # the headers both hold as strings.
+        raw_ids = [*ids, *(ObjectId(id) for id in ids if ObjectId.is_valid(id))]
+        documents = collection.find({"_id": {"$in": raw_ids}}, {"content": 1})
+        contents = {str(doc["_id"]): doc["content"] for doc in documents}
+
+        return [contents[id] for id in ids]
+
+    return DocumentStore(headers=headers, content_loader=load_contents)
@@ -1,15 +1,39 @@
-from typing import Generic, Type, TypeVar
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Generic, Iterable, Iterator, Type, TypeVar
 
 from bson import ObjectId
 from loguru import logger
-from pydantic import BaseModel
-from pymongo import MongoClient, errors
+from pydantic import BaseModel, TypeAdapter
+from pymongo import ReplaceOne, WriteConcern, errors
 
 from second_brain_offline.config import settings
+from second_brain_offline.infrastructure.mongo.client import get_mongo_client
 
 T = TypeVar("T", bound=BaseModel)
 
 
+class UpsertResult(BaseModel):
+    """Counts reported by the server for a bulk upsert.
+
+    The counts stay at 0 with an unacknowledged write concern (w=0).
+
+    Attributes:
+        num_documents: Number of documents sent.
+        num_batches: Number of bulk writes sent.
+        num_inserted: Number of documents inserted.
+        num_replaced: Number of existing documents whose content changed.
+        num_unchanged: Number of existing documents whose content was identical.
+    """
+
+    num_documents: int = 0
+    num_batches: int = 0
+    num_inserted: int = 0
+    num_replaced: int = 0
+    num_unchanged: int = 0
+
+
 class MongoDBService(Generic[T]):
     """Service class for MongoDB operations, supporting ingestion, querying, and validation.
 
@@ -27,7 +51,7 @@ class MongoDBService(Generic[T]):
         collection_name: Name of the MongoDB collection.
         database_name: Name of the MongoDB database.
         mongodb_uri: MongoDB connection URI.
-        client: MongoDB client instance for database connections.
+        client: MongoDB client shared by the whole process, see `get_mongo_client`.
         database: Reference to the target MongoDB database.
         collection: Reference to the target MongoDB collection.
     """
@@ -58,9 +82,11 @@ class MongoDBService(Generic[T]):
         self.database_name = database_name
         self.mongodb_uri = mongodb_uri
 
+        # Validates a whole batch of documents in a single call.
+        self.__adapter = TypeAdapter(list[model])
+
         try:
-            self.client = MongoClient(mongodb_uri, appname="second_brain_course")
-            self.client.admin.command("ping")
+            self.client = get_mongo_client(mongodb_uri)
         except Exception as e:
             logger.error(f"Failed to initialize MongoDBService: {e}")
             raise
@@ -139,6 +165,131 @@ class MongoDBService(Generic[T]):
             logger.error(f"Error inserting documents: {e}")
             raise
 
+    def upsert_documents(
+        self,
+        documents: Iterable[T],
+        id_field: str = "id",
+        batch_size: int = 1000,
+        max_workers: int = 4,
+        write_concern: WriteConcern | None = None,
+    ) -> UpsertResult:
+        """Insert or replace documents, keyed on their ID, in parallel batches.
+
+        The documents are consumed lazily and sent as unordered bulk writes of
+        `ReplaceOne(upsert=True)` operations keyed on `_id`, which is set to the
+        document's ID. Batches are serialized and written by a pool of writers, and
+        at most `2 * max_workers` batches are held in memory. As existing documents
+        are replaced in place, the collection never has to be cleared first.
+
+        Args:
+            documents: Pydantic model instances to write.
+            id_field: Field of the models holding their ID.
+            batch_size: Number of documents per bulk write.
+            max_workers: Number of bulk writes sent concurrently.
+            write_concern: Write concern of the bulk writes, such as
+                `WriteConcern(w=1, j=False)` to speed up reindexing jobs. Defaults
+                to the write concern of the collection.
+
+        Returns:
+            UpsertResult: Counts of inserted, replaced and unchanged documents.
+
+        Raises:
+            errors.PyMongoError: If a bulk write fails.
+        """
+
+        collection = (
+            self.collection.with_options(write_concern=write_concern)
+            if write_concern is not None
+            else self.collection
+        )
+
+        def write_batch(batch: list[T]) -> UpsertResult:
+            operations = []
+            for document in batch:
+                dict_document = document.model_dump()
+                _id = dict_document["_id"] = dict_document[id_field]
+                operations.append(ReplaceOne({"_id": _id}, dict_document, upsert=True))
+            result = collection.bulk_write(operations, ordered=False)
+
+            batch_result = UpsertResult(num_documents=len(batch), num_batches=1)
+            if result.acknowledged:
+                batch_result.num_inserted = result.upserted_count
+                batch_result.num_replaced = result.modified_count
+                batch_result.num_unchanged = (
+                    result.matched_count - result.modified_count
+                )
+
+            return batch_result
+
+        result = UpsertResult()
+
+        def collect(future: Future[UpsertResult]) -> None:
+            batch_result = future.result()
+            for field in UpsertResult.model_fields:
+                setattr(
+                    result, field, getattr(result, field) + getattr(batch_result, field)
+                )
+
+        documents = iter(documents)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending: deque[Future[UpsertResult]] = deque()
+                while batch := list(islice(documents, batch_size)):
+                    # Bound the number of batches held in memory.
+                    if len(pending) >= 2 * max_workers:
+                        collect(pending.popleft())
+                    pending.append(executor.submit(write_batch, batch))
+
+                while pending:
+                    collect(pending.popleft())
+        except errors.PyMongoError as e:
+            logger.error(f"Error upserting documents: {e}")
+            raise
+
+        logger.debug(
+            f"Upserted {result.num_documents} documents in {result.num_batches} "
+            f"batches: {result.num_inserted} inserted, {result.num_replaced} "
+            f"replaced, {result.num_unchanged} unchanged."
+        )
+
+        return result
+
+    def delete_documents_except(self, ids: Iterable, batch_size: int = 1000) -> int:
+        """Delete the documents whose `_id` isn't one of the given IDs.
+
+        Only the `_id` of the documents is read, and the deletions are sent in
+        batches, so this scales to large collections.
+
+        Args:
+            ids: The `_id` of the documents to keep.
+            batch_size: Number of documents per deletion.
+
+        Returns:
+            int: Number of deleted documents.
+
+        Raises:
+            errors.PyMongoError: If the deletion fails.
+        """
+
+        ids = set(ids)
+        num_deleted = 0
+        try:
+            stale_ids = (
+                doc["_id"]
+                for doc in self.collection.find({}, {"_id": 1})
+                if doc["_id"] not in ids
+            )
+            while batch := list(islice(stale_ids, batch_size)):
+                result = self.collection.delete_many({"_id": {"$in": batch}})
+                num_deleted += result.deleted_count
+        except errors.PyMongoError as e:
+            logger.error(f"Error deleting stale documents: {e}")
+            raise
+
+        logger.debug(f"Deleted {num_deleted} stale documents.")
+
+        return num_deleted
+
     def fetch_documents(self, limit: int, query: dict) -> list[T]:
         """Retrieve documents from the MongoDB collection based on a query.
 
@@ -152,14 +303,171 @@ class MongoDBService(Generic[T]):
         Raises:
             Exception: If the query operation fails.
         """
+
+        documents = list(self.iter_documents(query, limit=limit))
+        logger.debug(f"Fetched {len(documents)} documents with query: {query}")
+
+        return documents
+
+    def iter_documents(
+        self,
+        query: dict | None = None,
+        limit: int = 0,
+        batch_size: int = 1000,
+        projection: dict | list[str] | None = None,
+        max_workers: int = 1,
+        partition_size: int = 10_000,
+    ) -> Iterator[T]:
+        """Lazily retrieve the documents matching a query.
+
+        The cursor fetches and validates the documents one batch at a time, so only
+        a batch is held in memory. With several workers, the matching documents are
+        split into `_id` ranges of about `partition_size` documents, fetched in
+        parallel and yielded in `_id` order, with at most `2 * max_workers` ranges
+        held in memory.
+
+        Args:
+            query: MongoDB query filter to apply. Defaults to all the documents.
+            limit: Maximum number of documents to retrieve, or 0 for no limit. With
+                several workers, these are the first `limit` documents in `_id`
+                order, instead of in natural order.
+            batch_size: Number of documents fetched and validated at once.
+            projection: Fields to retrieve, as a MongoDB projection or a list of
+                field names. The model must accept the missing fields.
+            max_workers: Number of `_id` ranges fetched concurrently. With 1, the
+                documents are read by a single cursor, in natural order.
+            partition_size: Approximate number of documents of each `_id` range.
+
+        Yields:
+            Pydantic model instances matching the query criteria.
+
+        Raises:
+            errors.PyMongoError: If the query operation fails.
+        """
+
+        query = query or {}
         try:
-            documents = list(self.collection.find(query).limit(limit))
-            logger.debug(f"Fetched {len(documents)} documents with query: {query}")
-            return self.__parse_documents(documents)
-        except Exception as e:
+            if max_workers <= 1:
+                yield from self.__iter_range(query, limit, batch_size, projection)
+
+                return
+
+            def fetch_range(id_range: dict) -> list[T]:
+                range_query = {"$and": [query, id_range]}
+
+                return list(
+                    self.__iter_range(
+                        range_query, 0, batch_size, projection, sort_by_id=True
+                    )
+                )
+
+            id_ranges = self.get_id_ranges(
+                query, partition_size=partition_size, limit=limit
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending: deque[Future[list[T]]] = deque()
+                for id_range in id_ranges:
+                    # Bound the number of ranges held in memory.
+                    if len(pending) >= 2 * max_workers:
+                        yield from pending.popleft().result()
+                    pending.append(executor.submit(fetch_range, id_range))
+
+                while pending:
+                    yield from pending.popleft().result()
+        except errors.PyMongoError as e:
             logger.error(f"Error fetching documents: {e}")
             raise
 
+    def get_id_ranges(
+        self, query: dict | None = None, partition_size: int = 10_000, limit: int = 0
+    ) -> list[dict]:
+        """Split the documents matching a query into contiguous `_id` ranges.
+
+        The boundaries are computed by a `$bucketAuto` over the `_id` index, so every
+        range can be fetched independently, by threads or by separate workers.
+
+        Args:
+            query: MongoDB query filter to apply. Defaults to all the documents.
+            partition_size: Approximate number of documents of each range.
+            limit: Only cover the first `limit` documents in `_id` order, or all of
+                them if 0.
+
+        Returns:
+            list[dict]: `_id` filters covering the documents, in `_id` order.
+
+        Raises:
+            errors.PyMongoError: If the aggregation fails.
+        """
+
+        assert partition_size > 0, "Partition size must be positive"
+
+        query = query or {}
+        num_documents = self.collection.count_documents(query)
+        if limit > 0:
+            num_documents = min(num_documents, limit)
+        if num_documents == 0:
+            return []
+
+        pipeline: list[dict] = [{"$match": query}, {"$sort": {"_id": 1}}]
+        if limit > 0:
+            pipeline.append({"$limit": limit})
+        pipeline += [
+            {"$project": {"_id": 1}},
+            {
+                "$bucketAuto": {
+                    "groupBy": "$_id",
+                    "buckets": -(-num_documents // partition_size),
+                }
+            },
+        ]
+
+        bounds = [bucket["_id"] for bucket in self.aggregate(pipeline)]
+
+        # The upper bound of a bucket is the lower bound of the next one, except for
+        # the last bucket whose upper bound is its largest _id.
+        return [
+            {"_id": {"$gte": bound["min"], "$lt": next_bound["min"]}}
+            for bound, next_bound in zip(bounds[:-1], bounds[1:])
+        ] + [{"_id": {"$gte": bounds[-1]["min"], "$lte": bounds[-1]["max"]}}]
+
+    def __iter_range(
+        self,
+        query: dict,
+        limit: int,
+        batch_size: int,
+        projection: dict | list[str] | None,
+        sort_by_id: bool = False,
+    ) -> Iterator[T]:
+        cursor = (
+            self.collection.find(query, projection).limit(limit).batch_size(batch_size)
+        )
+        if sort_by_id:
+            cursor = cursor.sort("_id", 1)
+        try:
+            while documents := list(islice(cursor, batch_size)):
+                yield from self.__parse_documents(documents)
+        finally:
+            cursor.close()
+
+    def aggregate(self, pipeline: list[dict]) -> list[dict]:
+        """Run an aggregation pipeline on the collection.
+
+        Args:
+            pipeline: The MongoDB aggregation stages to run.
+
+        Returns:
+            List of raw documents returned by the pipeline.
+
+        Raises:
+            errors.PyMongoError: If the aggregation fails.
+        """
+
+        try:
+            return list(self.collection.aggregate(pipeline))
+        except errors.PyMongoError as e:
+            logger.error(f"Error running aggregation pipeline: {e}")
+            raise
+
     def __parse_documents(self, documents: list[dict]) -> list[T]:
         """Convert MongoDB documents to Pydantic model instances.
 
@@ -172,7 +480,6 @@ class MongoDBService(Generic[T]):
         Returns:
             List of validated Pydantic model instances.
         """
-        parsed_documents = []
         for doc in documents:
             for key, value in doc.items():
                 if isinstance(value, ObjectId):
@@ -181,10 +488,7 @@ class MongoDBService(Generic[T]):
             _id = doc.pop("_id", None)
             doc["id"] = _id
 
-            parsed_doc = self.model.model_validate(doc)
-            parsed_documents.append(parsed_doc)
-
-        return parsed_documents
+        return self.__adapter.validate_python(documents)
 
     def get_collection_count(self) -> int:
         """Count the total number of documents in the collection.
@@ -203,11 +507,11 @@ class MongoDBService(Generic[T]):
             raise
 
     def close(self) -> None:
-        """Close the MongoDB connection.
+        """Release the service.
 
-        This method should be called when the service is no longer needed
-        to properly release resources, unless using the context manager.
+        The MongoDB client is shared by the whole process and stays open, so its
+        pooled connections are reused by the next services. Use
+        `close_mongo_clients` to close it.
         """
 
-        self.client.close()
-        logger.debug("Closed MongoDB connection.")
+        logger.debug("Released MongoDB service.")
@@ -0,0 +1,203 @@
+from loguru import logger
+
+from second_brain_offline import tokenizer
+from second_brain_offline.domain import CorpusStatistics, Histogram
+from second_brain_offline.infrastructure.mongo.service import MongoDBService
+
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+
+def compute_corpus_statistics(
+    service: MongoDBService,
+    num_content_length_bins: int = 50,
+    num_quality_score_bins: int = 20,
+    token_sample_size: int = 100,
+    model_id: str = "gpt-4o-mini",
+) -> CorpusStatistics:
+    """Compute the distributions of the documents of a collection inside MongoDB.
+
+    The content lengths and quality scores are binned and their percentiles are
+    computed by aggregation pipelines, so only the counts leave the database and
+    the cost of the call doesn't depend on the size of the corpus. Token lengths
+    can't be computed by MongoDB, so they are estimated from the content lengths
+    with the number of characters per token measured on a random sample of
+    documents.
+
+    Args:
+        service: The service of the collection holding the documents.
+        num_content_length_bins: Number of bins of the content length histograms.
+        num_quality_score_bins: Number of bins of the quality score histogram.
+        token_sample_size: Number of documents tokenized to measure the number of
+            characters per token.
+        model_id: The model name used to determine the encoding of the tokens.
+
+    Returns:
+        CorpusStatistics: The distributions of the collection's documents.
+    """
+
+    summaries = service.aggregate(
+        [
+            _project_fields(),
+            {
+                "$facet": {
+                    "content_length": [_summarize("content_length")],
+                    "quality_score": [
+                        _match_scored(),
+                        _summarize("content_quality_score"),
+                    ],
+                }
+            },
+        ]
+    )[0]
+    content_length = _to_histogram(summaries["content_length"])
+    quality_score = _to_histogram(summaries["quality_score"])
+
+    content_length.bin_edges = _get_bin_edges(content_length, num_content_length_bins)
+    quality_score.bin_edges = _get_bin_edges(quality_score, num_quality_score_bins)
+    bucket_facets = {}
+    if content_length.bin_edges:
+        bucket_facets["content_length"] = [
+            _bucket("content_length", content_length.bin_edges)
+        ]
+    if quality_score.bin_edges:
+        bucket_facets["quality_score"] = [
+            _match_scored(),
+            _bucket("content_quality_score", quality_score.bin_edges),
+        ]
+    if bucket_facets:
+        buckets = service.aggregate([_project_fields(), {"$facet": bucket_facets}])[0]
+        content_length.counts = _to_counts(
+            buckets.get("content_length", []), content_length.bin_edges
+        )
+        quality_score.counts = _to_counts(
+            buckets.get("quality_score", []), quality_score.bin_edges
+        )
+
+    chars_per_token = _measure_chars_per_token(
+        service, sample_size=token_sample_size, model_id=model_id
+    )
+    statistics = CorpusStatistics(
+        num_documents=content_length.num_values,
+        content_length=content_length,
+        num_tokens=content_length.scale(1 / chars_per_token),
+        quality_score=quality_score,
+        chars_per_token=chars_per_token,
+    )
+    logger.info(
+        f"Computed statistics of {statistics.num_documents} documents of "
+        f"collection '{service.collection_name}' "
+        f"({chars_per_token:.2f} characters per token)"
+    )
+
+    return statistics
+
+
+def _project_fields() -> dict:
+    return {
+        "$project": {
+            "_id": 0,
+            "content_length": {"$strLenCP": {"$ifNull": ["$content", ""]}},
+            "content_quality_score": 1,
+        }
+    }
+
+
+def _match_scored() -> dict:
+    return {"$match": {"content_quality_score": {"$type": "number"}}}
+
+
+def _summarize(field: str) -> dict:
+    return {
+        "$group": {
+            "_id": None,
+            "num_values": {"$sum": 1},
+            "min_value": {"$min": f"${field}"},
+            "max_value": {"$max": f"${field}"},
+            "percentiles": {
+                "$percentile": {
+                    "input": f"${field}",
+                    "p": PERCENTILES,
+                    "method": "approximate",
+                }
+            },
+        }
+    }
+
+
+def _bucket(field: str, bin_edges: list[float]) -> dict:
+    # Values equal to the last edge fall out of the boundaries, into the default bucket.
+    return {
+        "$bucket": {
+            "groupBy": f"${field}",
+            "boundaries": bin_edges,
+            "default": "max",
+            "output": {"count": {"$sum": 1}},
+        }
+    }
+
+
+def _to_histogram(summaries: list[dict]) -> Histogram:
+    if not summaries:
+        return Histogram()
+
+    summary = summaries[0]
+
+    return Histogram(
+        percentiles={
+            f"p{round(p * 100)}": value
+            for p, value in zip(PERCENTILES, summary["percentiles"])
+        },
+        num_values=summary["num_values"],
+        min_value=summary["min_value"],
+        max_value=summary["max_value"],
+    )
+
+
+def _get_bin_edges(histogram: Histogram, num_bins: int) -> list[float]:
+    if histogram.num_values == 0:
+        return []
+
+    if histogram.max_value == histogram.min_value:
+        return [histogram.min_value, histogram.min_value + 1]
+
+    bin_width = (histogram.max_value - histogram.min_value) / num_bins
+
+    return [histogram.min_value + i * bin_width for i in range(num_bins)] + [
+        histogram.max_value
+    ]
+
+
+def _to_counts(buckets: list[dict], bin_edges: list[float]) -> list[int]:
+    if not bin_edges:
+        return []
+
+    bin_indexes = {edge: index for index, edge in enumerate(bin_edges[:-1])}
+    counts = [0] * (len(bin_edges) - 1)
+    for bucket in buckets:
+        # The largest values belong to the last bin, whose upper edge is inclusive.
+        index = bin_indexes.get(bucket["_id"], len(counts) - 1)
+        counts[index] += bucket["count"]
+
+    return counts
+
+
+def _measure_chars_per_token(
+    service: MongoDBService, sample_size: int, model_id: str
+) -> float:
+    if sample_size <= 0:
+        return DEFAULT_CHARS_PER_TOKEN
+
+    documents = service.aggregate(
+        [
+            {"$match": {"content": {"$type": "string", "$ne": ""}}},
+            {"$sample": {"size": sample_size}},
+            {"$project": {"_id": 0, "content": 1}},
+        ]
+    )
+    texts = [document["content"] for document in documents]
+    num_tokens = sum(tokenizer.count_tokens_batch(texts, model_id=model_id))
+    if num_tokens == 0:
+        return DEFAULT_CHARS_PER_TOKEN
+
+    return sum(len(text) for text in texts) / num_tokens
@@ -0,0 +1,139 @@
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_ENCODING_NAME = "cl100k_base"
+DEFAULT_NUM_THREADS = 8
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_id: str) -> tiktoken.Encoding:
+    """Get the tiktoken encoding for a model, caching it per model ID.
+
+    Args:
+        model_id: Model name (e.g. "gpt-4o-mini") or encoding name (e.g. "cl100k_base").
+
+    Returns:
+        tiktoken.Encoding: The encoding used by the model. Unknown models fall back
+            to cl100k_base (used by gpt-4, gpt-3.5-turbo, text-embedding-ada-002).
+    """
+
+    try:
+        return tiktoken.encoding_for_model(model_id)
+    except KeyError:
+        pass
+
+    try:
+        return tiktoken.get_encoding(model_id)
+    except ValueError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING_NAME)
+
+
+def encode(text: str, model_id: str) -> list[int]:
+    """Encode a text into tokens, treating special tokens as plain text.
+
+    Args:
+        text: The input text to encode.
+        model_id: The model name used to determine the encoding.
+
+    Returns:
+        list[int]: The token IDs of the text.
+    """
+
+    return get_encoding(model_id).encode_ordinary(text)
+
+
+def encode_batch(
+    texts: list[str], model_id: str, num_threads: int = DEFAULT_NUM_THREADS
+) -> list[list[int]]:
+    """Encode multiple texts in parallel using tiktoken's native thread pool.
+
+    Args:
+        texts: The input texts to encode.
+        model_id: The model name used to determine the encoding.
+        num_threads: Number of threads used by tiktoken to encode the batch.
+
+    Returns:
+        list[list[int]]: The token IDs of each text, in the same order as the input.
+    """
+
+    return get_encoding(model_id).encode_ordinary_batch(texts, num_threads=num_threads)
+
+
+@lru_cache(maxsize=16384)
+def count_tokens(text: str, model_id: str) -> int:
+    """Count the number of tokens of a text, memoizing the result.
+
+    The splitters measure the same pieces of text many times while merging them
+    into chunks, so the counts are cached per (text, model) pair.
+
+    Args:
+        text: The input text to measure.
+        model_id: The model name used to determine the encoding.
+
+    Returns:
+        int: Number of tokens in the text.
+    """
+
+    return len(encode(text, model_id))
+
+
+def count_tokens_batch(
+    texts: list[str], model_id: str, num_threads: int = DEFAULT_NUM_THREADS
+) -> list[int]:
+    """Count the number of tokens of multiple texts in parallel.
+
+    Args:
+        texts: The input texts to measure.
+        model_id: The model name used to determine the encoding.
+        num_threads: Number of threads used by tiktoken to encode the batch.
+
+    Returns:
+        list[int]: Number of tokens of each text, in the same order as the input.
+    """
+
+    return [len(tokens) for tokens in encode_batch(texts, model_id, num_threads)]
+
+
+def truncate(
+    text: str,
+    max_tokens: int,
+    model_id: str,
+    num_tokens: int | None = None,
+) -> str:
+    """Keep only the prefix of a text that fits within a maximum number of tokens.
+
+    Instead of decoding the kept tokens back into a new string, the byte length of
+    the kept tokens is used to slice the original text, so the prefix is returned
+    exactly as it appeared in the input.
+
+    Args:
+        text: The input text to truncate.
+        max_tokens: Maximum number of tokens to keep.
+        model_id: The model name used to determine the encoding.
+        num_tokens: Optional precomputed token count of the text. If it fits within
+            `max_tokens`, the text is returned without being tokenized.
+
+    Returns:
+        str: The prefix of the text that fits within the token limit.
+    """
+
+    if num_tokens is not None and num_tokens <= max_tokens:
+        return text
+
+    # Every token covers at least one byte, so short texts can never overflow.
+    text_bytes = text.encode("utf-8")
+    if len(text_bytes) <= max_tokens:
+        return text
+
+    encoding = get_encoding(model_id)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+
+    prefix_num_bytes = sum(
+        len(token_bytes)
+        for token_bytes in encoding.decode_tokens_bytes(tokens[:max_tokens])
+    )
+
+    return text_bytes[:prefix_num_bytes].decode("utf-8", errors="ignore")
@@ -1,7 +1,15 @@
+import hashlib
+import os
 import random
-import string
+import tempfile
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import tiktoken
+import xxhash
+
+from second_brain_offline import tokenizer
+
+TRACKING_QUERY_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref"}
 
 
 def merge_dicts(dict1: dict, dict2: dict) -> dict:
@@ -32,30 +40,129 @@ def generate_random_hex(length: int) -> str:
         str: Random hex string of the specified length.
     """
 
-    hex_chars = string.hexdigits.lower()
-    return "".join(random.choice(hex_chars) for _ in range(length))
+    return f"{random.getrandbits(4 * length):0{length}x}"
+
+
+def hash_to_hex(text: str, length: int = 32) -> str:
+    """Hash a text into a hex string of specified length with xxHash.
+
+    xxh3 is a fast non-cryptographic hash, suited for identifiers and change
+    detection, not for hiding the hashed text.
+
+    Args:
+        text: The text to hash.
+        length: The desired length of the hex string, up to 32 characters.
+
+    Returns:
+        str: Hex digest of the text, truncated to the specified length.
+    """
+
+    assert length <= 32, "Length must be at most 32 characters"
+
+    return xxhash.xxh3_128_hexdigest(text.encode("utf-8"))[:length]
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so the different spellings of a page give the same URL.
+
+    The scheme and host are lowercased, default ports, fragments, trailing slashes
+    and tracking query parameters are removed, and the remaining query parameters
+    are sorted.
+
+    Args:
+        url: The URL to normalize.
+
+    Returns:
+        str: The canonical URL.
+    """
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        netloc = f"{netloc}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_")
+            and key.lower() not in TRACKING_QUERY_PARAMS
+        )
+    )
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
 
+def generate_url_id(url: str) -> str:
+    """Generate a stable 32 characters hex ID from the canonical form of a URL.
 
-def clip_tokens(text: str, max_tokens: int, model_id: str) -> str:
+    Args:
+        url: The URL identifying the document.
+
+    Returns:
+        str: The same ID for every spelling of the same URL.
+    """
+
+    return hash_to_hex(canonicalize_url(url), length=32)
+
+
+def generate_deterministic_hex(seed: str, length: int) -> str:
+    """Generate a hex string of specified length derived from a seed.
+
+    The same seed always gives the same string, while the seed can't be recovered
+    from it.
+
+    Args:
+        seed: The text the hex string is derived from.
+        length: The desired length of the hex string, up to 64 characters.
+
+    Returns:
+        str: Hex string of the specified length.
+    """
+
+    assert length <= 64, "Length must be at most 64 characters"
+
+    return hashlib.sha256(seed.encode("utf-8")).hexdigest()[:length]
+
+
+def write_bytes_atomically(path: Path, data: bytes) -> None:
+    """Write a file through a temporary file renamed over the target.
+
+    Readers see either the previous or the new version of the file, never a
+    partially written one. The temporary file is hidden and ends with ".tmp".
+
+    Args:
+        path: Path of the file to write.
+        data: Content of the file.
+    """
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def clip_tokens(
+    text: str, max_tokens: int, model_id: str, num_tokens: int | None = None
+) -> str:
     """Clip the text to a maximum number of tokens using the tiktoken tokenizer.
 
     Args:
         text: The input text to clip.
         max_tokens: Maximum number of tokens to keep (default: 8192).
         model_id: The model name to determine encoding (default: "gpt-4").
+        num_tokens: Optional precomputed token count of the text, used to skip
+            tokenization when the text already fits.
 
     Returns:
         str: The clipped text that fits within the token limit.
     """
 
-    try:
-        encoding = tiktoken.encoding_for_model(model_id)
-    except KeyError:
-        # Fallback to cl100k_base encoding (used by gpt-4, gpt-3.5-turbo, text-embedding-ada-002)
-        encoding = tiktoken.get_encoding("cl100k_base")
-
-    tokens = encoding.encode(text)
-    if len(tokens) <= max_tokens:
-        return text
-
-    return encoding.decode(tokens[:max_tokens])
+    return tokenizer.truncate(
+        text, max_tokens=max_tokens, model_id=model_id, num_tokens=num_tokens
+    )
@@ -1,11 +1,12 @@
 from typing_extensions import Annotated
 from zenml import get_step_context, step
 
+from materializers import DocumentListMaterializer
 from second_brain_offline.domain import Document, DocumentMetadata
 from second_brain_offline.infrastructure.notion import NotionDocumentClient
 
 
-@step
+@step(output_materializers=DocumentListMaterializer)
 def extract_notion_documents(
     documents_metadata: list[DocumentMetadata],
 ) -> Annotated[list[Document], "notion_documents"]:
@@ -1,5 +1,6 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Generator
+import asyncio
+from itertools import islice
+from typing import Any, Generator, Iterable
 
 from langchain_core.documents import Document as LangChainDocument
 from langchain_mongodb.retrievers import (
@@ -7,26 +8,43 @@ from langchain_mongodb.retrievers import (
 )
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from loguru import logger
-from tqdm import tqdm
+from zenml import log_metadata
 from zenml.steps import step
 
+from second_brain_offline.application.agents import (
+    ContextualSummarizationAgent,
+    ContextualSummarizationMode,
+    SimpleSummarizationAgent,
+)
+from second_brain_offline.application.concurrency import (
+    Stage,
+    StageMetrics,
+    run_stages,
+)
 from second_brain_offline.application.rag import (
     EmbeddingModelType,
     SummarizationType,
     get_retriever,
     get_splitter,
+    get_summarization_agent,
+)
+from second_brain_offline.application.rag.splitters import SummarizationAgent
+from second_brain_offline.application.rag.retrievers import (
+    HYBRID_SEARCH_EMBEDDING_KEY,
+    HYBRID_SEARCH_TEXT_KEY,
+    RetrieverType,
 )
-from second_brain_offline.application.rag.retrievers import RetrieverType
-from second_brain_offline.domain import Document
+from second_brain_offline.domain import Document, DocumentStore
 from second_brain_offline.infrastructure.mongo import (
     MongoDBIndex,
     MongoDBService,
+    get_pool_metrics,
 )
 
 
 @step
 def chunk_embed_load(
-    documents: list[Document],
+    documents: DocumentStore | list[Document],
     collection_name: str,
     processing_batch_size: int,
     processing_max_workers: int,
@@ -38,16 +56,26 @@ def chunk_embed_load(
     contextual_summarization_type: SummarizationType = "none",
     contextual_agent_model_id: str | None = None,
     contextual_agent_max_characters: int | None = None,
+    contextual_agent_mode: ContextualSummarizationMode = "chunk",
+    embedding_max_workers: int = 2,
+    load_max_workers: int = 2,
+    processing_queue_size: int = 16,
     mock: bool = False,
     device: str = "cpu",
 ) -> None:
     """Process documents by chunking, embedding, and loading into MongoDB.
 
+    The documents flow in batches through a pipeline of split, contextualize, embed
+    and load stages connected by bounded queues, so the LLM calls, the embedding
+    requests and the MongoDB writes of different batches overlap. The contents of a
+    DocumentStore are loaded batch by batch as the pipeline consumes them.
+
     Args:
-        documents: List of documents to process.
+        documents: Documents to process.
         collection_name: Name of MongoDB collection to store documents.
         processing_batch_size: Number of documents to process in each batch.
-        processing_max_workers: Maximum number of concurrent processing threads.
+        processing_max_workers: Maximum number of concurrent LLM requests of the contextual summarization agent,
+            shared by all the batches, and number of batches contextualized concurrently.
         retriever_type: Type of retriever to use for document processing.
         embedding_model_id: Identifier for the embedding model.
         embedding_model_type: Type of embedding model to use.
@@ -56,6 +84,10 @@ def chunk_embed_load(
         contextual_summarization_type: Type of summarization to apply. Defaults to "none".
         contextual_agent_model_id: ID of the model used for contextual summarization. Defaults to None.
         contextual_agent_max_characters: Maximum characters for contextual summarization. Defaults to None.
+        contextual_agent_mode: Whether the contextual agent makes one call per chunk or per document. Defaults to "chunk".
+        embedding_max_workers: Number of batches embedded concurrently. Defaults to 2.
+        load_max_workers: Number of batches written to MongoDB concurrently. Defaults to 2.
+        processing_queue_size: Maximum number of batches waiting in front of each stage. Defaults to 16.
         mock: Whether to use mock processing. Defaults to False.
         device: Device to run embeddings on ('cpu' or 'cuda'). Defaults to 'cpu'.
     """
@@ -66,9 +98,10 @@ def chunk_embed_load(
         retriever_type=retriever_type,
         device=device,
     )
-    splitter = get_splitter(
-        chunk_size=chunk_size,
+    splitter = get_splitter(chunk_size=chunk_size)
+    agent = get_summarization_agent(
         summarization_type=contextual_summarization_type,
+        contextual_mode=contextual_agent_mode,
         model_id=contextual_agent_model_id,
         max_characters=contextual_agent_max_characters,
         mock=mock,
@@ -80,20 +113,75 @@ def chunk_embed_load(
     ) as mongodb_client:
         mongodb_client.clear_collection()
 
-        docs = [
+        if isinstance(documents, DocumentStore):
+            documents = documents.iter_documents(batch_size=processing_batch_size)
+        docs = (
             LangChainDocument(
                 page_content=doc.content, metadata=doc.metadata.model_dump()
             )
             for doc in documents
             if doc
-        ]
-        process_docs(
-            retriever,
-            docs,
-            splitter=splitter,
-            batch_size=processing_batch_size,
-            max_workers=processing_max_workers,
         )
+        stages_metrics = asyncio.run(
+            process_docs(
+                retriever,
+                docs,
+                splitter=splitter,
+                agent=agent,
+                batch_size=processing_batch_size,
+                contextualize_max_workers=processing_max_workers,
+                embedding_max_workers=embedding_max_workers,
+                load_max_workers=load_max_workers,
+                queue_size=processing_queue_size,
+            )
+        )
+        for stage_metrics in stages_metrics:
+            logger.info(
+                f"Stage '{stage_metrics.name}': {stage_metrics.num_items} batches "
+                f"({stage_metrics.num_failed_items} failed) at "
+                f"{stage_metrics.throughput:.2f} batches/s, "
+                f"max queue depth {stage_metrics.max_queue_depth}"
+            )
+        log_metadata(
+            metadata={
+                "mongodb_pools": {
+                    uri: pool_metrics.model_dump()
+                    for uri, pool_metrics in get_pool_metrics().items()
+                },
+                "stages": {
+                    stage_metrics.name: {
+                        **stage_metrics.model_dump(),
+                        "throughput": stage_metrics.throughput,
+                    }
+                    for stage_metrics in stages_metrics
+                }
+            }
+        )
+
+        if isinstance(agent, ContextualSummarizationAgent):
+            logger.info(
+                f"Contextual summarization gate rate: {agent.gate_rate:.2%} "
+                f"({agent.num_gated_chunks}/{agent.num_chunks} chunks skipped the LLM)"
+            )
+            log_metadata(
+                metadata={
+                    "contextual_num_chunks": agent.num_chunks,
+                    "contextual_num_gated_chunks": agent.num_gated_chunks,
+                    "contextual_gate_rate": agent.gate_rate,
+                }
+            )
+        elif isinstance(agent, SimpleSummarizationAgent) and agent.cache is not None:
+            logger.info(
+                f"Summary cache hit rate: {agent.cache.hit_rate:.2%} "
+                f"({agent.cache.num_hits} hits, {agent.cache.num_misses} misses)"
+            )
+            log_metadata(
+                metadata={
+                    "summary_cache_num_hits": agent.cache.num_hits,
+                    "summary_cache_num_misses": agent.cache.num_misses,
+                    "summary_cache_hit_rate": agent.cache.hit_rate,
+                }
+            )
 
         index = MongoDBIndex(
             retriever=retriever,
@@ -105,82 +193,136 @@ def chunk_embed_load(
         )
 
 
-def process_docs(
+async def process_docs(
     retriever: Any,
-    docs: list[LangChainDocument],
+    docs: Iterable[LangChainDocument],
     splitter: RecursiveCharacterTextSplitter,
+    agent: SummarizationAgent | None = None,
     batch_size: int = 4,
-    max_workers: int = 2,
-) -> list[None]:
-    """Process LangChain documents into MongoDB using thread pool.
+    contextualize_max_workers: int = 2,
+    embedding_max_workers: int = 2,
+    load_max_workers: int = 2,
+    queue_size: int = 16,
+) -> list[StageMetrics]:
+    """Process LangChain documents into MongoDB through a staged pipeline.
+
+    Batches of documents are split into chunks, contextualized by the agent,
+    embedded and bulk-written to MongoDB, each stage running its own workers. The
+    parent document retriever splits, embeds and writes its documents itself, so
+    its batches go through a single stage.
 
     Args:
         retriever: MongoDB Atlas document retriever instance.
-        docs: List of LangChain documents to process.
+        docs: LangChain documents to process, consumed lazily.
         splitter: Text splitter instance for chunking documents.
+        agent: Optional agent that adds context to the chunks of each document.
         batch_size: Number of documents to process in each batch.
-        max_workers: Maximum number of concurrent threads.
+        contextualize_max_workers: Number of batches contextualized concurrently.
+        embedding_max_workers: Number of batches embedded concurrently.
+        load_max_workers: Number of batches written to MongoDB concurrently.
+        queue_size: Maximum number of batches waiting in front of each stage.
 
     Returns:
-        List of None values representing completed batch processing results.
+        list[StageMetrics]: The throughput and queue depth metrics of each stage.
     """
-    batches = list(get_batches(docs, batch_size))
-    results = []
-    total_docs = len(docs)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(process_batch, retriever, batch, splitter)
-            for batch in batches
-        ]
 
-        with tqdm(total=total_docs, desc="Processing documents") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-                results.append(result)
-                pbar.update(batch_size)
+    batches = get_batches(docs, batch_size)
+
+    if isinstance(retriever, MongoDBAtlasParentDocumentRetriever):
+
+        async def add_documents(batch: list[LangChainDocument]) -> None:
+            await asyncio.to_thread(retriever.add_documents, batch)
+            logger.info(f"Successfully processed {len(batch)} documents.")
 
-    return results
+        return await run_stages(
+            batches,
+            [Stage("load", add_documents, max_workers=load_max_workers)],
+            queue_size=queue_size,
+        )
+
+    vectorstore = retriever.vectorstore
+
+    async def split(
+        batch: list[LangChainDocument],
+    ) -> list[tuple[LangChainDocument, list[str]]]:
+        return await asyncio.to_thread(
+            lambda: [(doc, splitter.split_text(doc.page_content)) for doc in batch]
+        )
+
+    async def contextualize(
+        split_batch: list[tuple[LangChainDocument, list[str]]],
+    ) -> list[LangChainDocument] | None:
+        if agent is None:
+            chunks_per_doc = [chunks for _, chunks in split_batch]
+        else:
+            chunks_per_doc = await asyncio.gather(
+                *[
+                    agent.acall(
+                        doc.page_content, chunks, title=doc.metadata.get("title")
+                    )
+                    for doc, chunks in split_batch
+                ]
+            )
+
+        return [
+            LangChainDocument(page_content=chunk, metadata=doc.metadata)
+            for (doc, _), chunks in zip(split_batch, chunks_per_doc)
+            for chunk in chunks
+        ] or None
+
+    async def embed(
+        chunks: list[LangChainDocument],
+    ) -> tuple[list[LangChainDocument], list[list[float]]]:
+        embeddings = await vectorstore.embeddings.aembed_documents(
+            [chunk.page_content for chunk in chunks]
+        )
+
+        return chunks, embeddings
+
+    async def load(
+        embedded_chunks: tuple[list[LangChainDocument], list[list[float]]],
+    ) -> None:
+        chunks, embeddings = embedded_chunks
+        # Written directly, as add_texts would embed the chunks again.
+        to_insert = [
+            {
+                HYBRID_SEARCH_TEXT_KEY: chunk.page_content,
+                HYBRID_SEARCH_EMBEDDING_KEY: embedding,
+                **chunk.metadata,
+            }
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        await asyncio.to_thread(
+            vectorstore.collection.insert_many, to_insert, ordered=False
+        )
+        logger.info(f"Successfully loaded {len(chunks)} chunks.")
+
+    return await run_stages(
+        batches,
+        [
+            Stage("split", split),
+            Stage(
+                "contextualize", contextualize, max_workers=contextualize_max_workers
+            ),
+            Stage("embed", embed, max_workers=embedding_max_workers),
+            Stage("load", load, max_workers=load_max_workers),
+        ],
+        queue_size=queue_size,
+    )
 
 
 def get_batches(
-    docs: list[LangChainDocument], batch_size: int
+    docs: Iterable[LangChainDocument], batch_size: int
 ) -> Generator[list[LangChainDocument], None, None]:
     """Return batches of documents to ingest into MongoDB.
 
     Args:
-        docs: List of LangChain documents to batch.
+        docs: LangChain documents to batch, consumed lazily.
         batch_size: Number of documents in each batch.
 
     Yields:
         Generator[list[LangChainDocument]]: Batches of documents of size batch_size.
     """
-    for i in range(0, len(docs), batch_size):
-        yield docs[i : i + batch_size]
-
-
-def process_batch(
-    retriever: Any,
-    batch: list[LangChainDocument],
-    splitter: RecursiveCharacterTextSplitter,
-) -> None:
-    """Ingest batches of documents into MongoDB by splitting and embedding.
-
-    Args:
-        retriever: MongoDB Atlas document retriever instance.
-        batch: List of documents to ingest in this batch.
-        splitter: Text splitter instance for chunking documents.
-
-    Raises:
-        Exception: If there is an error processing the batch of documents.
-    """
-    try:
-        if isinstance(retriever, MongoDBAtlasParentDocumentRetriever):
-            retriever.add_documents(batch)
-        else:
-            split_docs = splitter.split_documents(batch)
-            retriever.vectorstore.add_documents(split_docs)
-
-        logger.info(f"Successfully processed {len(batch)} documents.")
-    except Exception as e:
-        logger.warning(f"Error processing batch of {len(batch)} documents: {str(e)}")
+    docs = iter(docs)
+    while batch := list(islice(docs, batch_size)):
+        yield batch
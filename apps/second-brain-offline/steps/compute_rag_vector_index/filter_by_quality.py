@@ -2,38 +2,36 @@ from typing_extensions import Annotated
 from zenml import get_step_context
 from zenml.steps import step
 
-from second_brain_offline.domain import Document
+from materializers import DocumentStoreMaterializer
+from second_brain_offline.domain import DocumentStore
 
 
-@step
+@step(output_materializers=DocumentStoreMaterializer)
 def filter_by_quality(
-    documents: list[Document],
+    documents: DocumentStore,
     content_quality_score_threshold: float,
-) -> Annotated[list[Document], "filtered_documents"]:
-    """Process documents by chunking, embedding, and loading into MongoDB.
+) -> Annotated[DocumentStore, "filtered_documents"]:
+    """Keep the documents whose quality score is above a threshold.
+
+    Documents without a quality score are kept. Only the headers of the documents
+    are looked at, so no content is loaded.
 
     Args:
-        documents: List of documents to process.
-        collection_name: Name of MongoDB collection to store documents.
-        processing_batch_size: Number of documents to process in each batch.
-        processing_max_workers: Maximum number of concurrent processing threads.
-        embedding_model_id: Identifier for the embedding model.
-        embedding_model_type: Type of embedding model to use.
-        embedding_model_dim: Dimension of the embedding vectors.
-        chunk_size: Size of text chunks for splitting documents.
-        device: Device to run embeddings on ('cpu' or 'cuda'). Defaults to 'cpu'.
+        documents: The documents to filter.
+        content_quality_score_threshold: Minimum quality score of the kept documents.
+
+    Returns:
+        DocumentStore: The kept documents.
     """
 
     assert 0 <= content_quality_score_threshold <= 1, (
         "Content quality score threshold must be between 0 and 1"
     )
 
-    valid_docs = [
-        doc
-        for doc in documents
-        if not doc.content_quality_score
-        or doc.content_quality_score > content_quality_score_threshold
-    ]
+    valid_docs = documents.filter(
+        lambda header: not header.content_quality_score
+        or header.content_quality_score > content_quality_score_threshold
+    )
 
     step_context = get_step_context()
     step_context.add_output_metadata(
@@ -2,6 +2,7 @@ from loguru import logger
 from typing_extensions import Annotated
 from zenml import get_step_context, step
 
+from materializers import DocumentListMaterializer
 from second_brain_offline.application.agents.quality import (
     HeuristicQualityAgent,
     QualityScoreAgent,
@@ -9,7 +10,7 @@ from second_brain_offline.application.agents.quality import (
 from second_brain_offline.domain import Document
 
 
-@step
+@step(output_materializers=DocumentListMaterializer)
 def add_quality_score(
     documents: list[Document],
     model_id: str = "gpt-4o-mini",
@@ -2,11 +2,12 @@ from loguru import logger
 from typing_extensions import Annotated
 from zenml import get_step_context, step
 
+from materializers import DocumentListMaterializer
 from second_brain_offline.application.crawlers import Crawl4AICrawler
 from second_brain_offline.domain import Document
 
 
-@step
+@step(output_materializers=DocumentListMaterializer)
 def crawl(
     documents: list[Document], max_workers: int = 10
 ) -> Annotated[list[Document], "crawled_documents"]:
@@ -5,54 +5,63 @@ from PIL import Image
 from typing_extensions import Annotated
 from zenml import ArtifactConfig, step
 
-from second_brain_offline.domain import Document
+from second_brain_offline.domain import CorpusStatistics, Histogram
 
 
 @step
 def create_histograms(
-    documents: list[Document],
+    statistics: CorpusStatistics,
 ) -> Annotated[Image.Image, ArtifactConfig(name="histogram_chart")]:
-    """Create histograms showing content length and quality score distributions.
+    """Create histograms showing content length, token length and quality score distributions.
+
+    The histograms are drawn from the binned counts computed by the database, so
+    no document has to be loaded.
 
     Args:
-        documents: List of Document objects containing content and quality scores
+        statistics: Binned distributions of the corpus documents
 
     Returns:
-        PIL.Image: Combined histogram chart showing both distributions
+        PIL.Image: Combined histogram chart showing the three distributions
     """
 
-    # Extract content lengths and quality scores
-    content_lengths = [len(doc.content) for doc in documents]
-    quality_scores = [
-        doc.content_quality_score
-        for doc in documents
-        if doc.content_quality_score is not None
-    ]
-
-    # Create a figure with two subplots with a light background style
+    # Create a figure with three subplots with a light background style
     plt.style.use("default")
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 15))
 
     # Plot content length histogram with darker blue for better contrast
-    ax1.hist(content_lengths, bins=50, color="#1E5AA8", alpha=0.8, edgecolor="black")
-    ax1.set_title("Distribution of Content Lengths", fontsize=14, pad=15)
-    ax1.set_xlabel("Content Length (characters)", fontsize=12)
-    ax1.set_ylabel("Frequency", fontsize=12)
-    ax1.tick_params(labelsize=10)
-    ax1.spines["top"].set_visible(False)
-    ax1.spines["right"].set_visible(False)
+    _plot_histogram(
+        ax1,
+        statistics.content_length,
+        title="Distribution of Content Lengths",
+        xlabel="Content Length (characters)",
+        color="#1E5AA8",
+    )
+
+    # Plot token length histogram with darker orange for better contrast
+    _plot_histogram(
+        ax2,
+        statistics.num_tokens,
+        title="Distribution of Content Lengths (estimated tokens, "
+        f"{statistics.chars_per_token:.2f} characters per token)",
+        xlabel="Content Length (tokens)",
+        color="#C25B12",
+    )
 
     # Plot quality score histogram with darker green for better contrast
-    ax2.hist(quality_scores, bins=20, color="#2E7D32", alpha=0.8, edgecolor="black")
-    ax2.set_title("Distribution of Quality Scores", fontsize=14, pad=15)
-    ax2.set_xlabel("Quality Score", fontsize=12)
-    ax2.set_ylabel("Frequency", fontsize=12)
-    ax2.tick_params(labelsize=10)
-    ax2.spines["top"].set_visible(False)
-    ax2.spines["right"].set_visible(False)
+    _plot_histogram(
+        ax3,
+        statistics.quality_score,
+        title="Distribution of Quality Scores",
+        xlabel="Quality Score",
+        color="#2E7D32",
+    )
 
     # Add a super title
-    fig.suptitle("Document Analysis", fontsize=16, y=1.02)
+    fig.suptitle(
+        f"Document Analysis ({statistics.num_documents} documents)",
+        fontsize=16,
+        y=1.02,
+    )
 
     # Adjust layout with more space
     plt.tight_layout(pad=2.0)
@@ -67,3 +76,41 @@ def create_histograms(
     plt.close(fig)
 
     return histogram_chart
+
+
+def _plot_histogram(
+    ax: plt.Axes, histogram: Histogram, title: str, xlabel: str, color: str
+) -> None:
+    bin_widths = [
+        right - left
+        for left, right in zip(histogram.bin_edges[:-1], histogram.bin_edges[1:])
+    ]
+    ax.bar(
+        histogram.bin_edges[:-1],
+        histogram.counts,
+        width=bin_widths,
+        align="edge",
+        color=color,
+        alpha=0.8,
+        edgecolor="black",
+    )
+
+    # Mark the median and the tail of the distribution
+    for name, linestyle in (("p50", "--"), ("p90", ":")):
+        if name in histogram.percentiles:
+            ax.axvline(
+                histogram.percentiles[name],
+                color="black",
+                linestyle=linestyle,
+                linewidth=1,
+                label=f"{name} = {histogram.percentiles[name]:.2f}",
+            )
+    if histogram.percentiles:
+        ax.legend(fontsize=10)
+
+    ax.set_title(title, fontsize=14, pad=15)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel("Frequency", fontsize=12)
+    ax.tick_params(labelsize=10)
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
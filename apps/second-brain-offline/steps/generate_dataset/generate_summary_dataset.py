@@ -1,14 +1,26 @@
+import shutil
+from pathlib import Path
+
+from loguru import logger
 from typing_extensions import Annotated
-from zenml import step
+from zenml import get_step_context, step
 
 from second_brain_offline.application.dataset import SummarizationDatasetGenerator
-from second_brain_offline.domain import Document, InstructDataset
+from second_brain_offline.domain import (
+    DatasetFormat,
+    Document,
+    ShardedDatasetWriter,
+)
 
 
 @step
 def generate_summary_dataset(
     documents: list[Document],
     summarization_model: str,
+    output_dir: Path,
+    format: DatasetFormat = "jsonl",
+    shard_size: int = 10_000,
+    append: bool = False,
     val_split_ratio: float = 0.1,
     test_split_ratio: float = 0.1,
     min_document_characters: int = 50,
@@ -17,7 +29,24 @@ def generate_summary_dataset(
     max_workers: int = 10,
     mock: bool = False,
     summarization_max_characters: int = 256,
-) -> Annotated[InstructDataset, "summary_dataset"]:
+    summarization_map_reduce_threshold_tokens: int | None = 16000,
+    near_duplicate_threshold: float | None = 0.85,
+) -> Annotated[str, "dataset_dir"]:
+    """Generate a summarization dataset from documents, written as shards.
+
+    The samples are streamed to the `<split>-<index>.<format>` shards of
+    `output_dir` as the documents are summarized, and the directory is returned
+    instead of the dataset, so the memory doesn't grow with the dataset.
+
+    When appending, the documents that already have samples in the existing shards
+    are skipped before being summarized, so they don't cost any LLM request. The
+    samples keep the content hash of their document, so the documents whose content
+    changed since are summarized again and their samples replaced.
+    """
+
+    if output_dir.exists() and not append:
+        shutil.rmtree(output_dir)
+
     dataset_generator = SummarizationDatasetGenerator(
         summarization_model=summarization_model,
         summarization_max_characters=summarization_max_characters,
@@ -28,7 +57,66 @@ def generate_summary_dataset(
         min_document_length=min_document_characters,
         min_quality_score=min_quality_score,
         augmentation_loops=augmentation_loops,
+        map_reduce_threshold_tokens=summarization_map_reduce_threshold_tokens,
+        near_duplicate_threshold=near_duplicate_threshold,
     )
-    dataset = dataset_generator.generate(documents=documents)
+    with ShardedDatasetWriter(
+        output_dir, format=format, shard_size=shard_size, append=append
+    ) as writer:
+        num_skipped_documents = 0
+        num_changed_documents = 0
+        if append:
+            existing_content_hashes = writer.get_document_content_hashes()
+            new_documents = [
+                document
+                for document in documents
+                if document.id not in existing_content_hashes
+                or existing_content_hashes[document.id] != document.content_hash
+            ]
+            changed_document_ids = {
+                document.id
+                for document in new_documents
+                if document.id in existing_content_hashes
+            }
+            num_skipped_documents = len(documents) - len(new_documents)
+            num_changed_documents = len(changed_document_ids)
+            documents = new_documents
+            logger.info(
+                f"Skipping {num_skipped_documents} unchanged documents already in the "
+                f"dataset at '{output_dir}' and regenerating the samples of "
+                f"{num_changed_documents} changed documents"
+            )
+            writer.delete_documents(changed_document_ids)
+
+        if documents:
+            num_samples = dataset_generator.generate(documents=documents, writer=writer)
+        else:
+            logger.info("No new documents to add to the dataset")
+            num_samples = {}
+
+    metadata = {
+        "train_samples": num_samples.get("train", 0),
+        "validation_samples": num_samples.get("validation", 0),
+        "test_samples": num_samples.get("test", 0),
+        "num_skipped_documents": num_skipped_documents,
+        "num_changed_documents": num_changed_documents,
+        "output_dir": str(output_dir),
+        "format": format,
+        "append": append,
+        "num_shards": sum(len(shards) for shards in writer.shards.values()),
+    }
+    deduplication_stats = dataset_generator.deduplication_stats
+    if deduplication_stats is not None:
+        metadata.update(
+            {
+                "near_duplicate_threshold": near_duplicate_threshold,
+                "num_summaries_before_deduplication": deduplication_stats.num_summaries_before,
+                "num_summaries_after_deduplication": deduplication_stats.num_summaries_after,
+                "num_near_duplicates_removed": deduplication_stats.num_removed,
+                "near_duplicates_removed_ratio": deduplication_stats.removed_ratio,
+            }
+        )
+    step_context = get_step_context()
+    step_context.add_output_metadata(output_name="dataset_dir", metadata=metadata)
 
-    return dataset
+    return str(output_dir)
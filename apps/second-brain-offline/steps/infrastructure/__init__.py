@@ -1,17 +1,21 @@
+from .fetch_corpus_statistics import fetch_corpus_statistics
+from .fetch_document_store_from_mongodb import fetch_document_store_from_mongodb
 from .fetch_from_mongodb import fetch_from_mongodb
 from .ingest_to_mongodb import ingest_to_mongodb
 from .push_to_huggingface import push_to_huggingface
 from .read_documents_from_disk import read_documents_from_disk
-from .save_dataset_to_disk import save_dataset_to_disk
 from .save_documents_to_disk import save_documents_to_disk
+from .save_packed_dataset_to_disk import save_packed_dataset_to_disk
 from .upload_to_s3 import upload_to_s3
 
 __all__ = [
     "upload_to_s3",
+    "fetch_corpus_statistics",
+    "fetch_document_store_from_mongodb",
     "fetch_from_mongodb",
     "ingest_to_mongodb",
     "push_to_huggingface",
     "save_documents_to_disk",
-    "save_dataset_to_disk",
+    "save_packed_dataset_to_disk",
     "read_documents_from_disk",
 ]
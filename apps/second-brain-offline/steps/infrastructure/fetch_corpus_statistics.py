@@ -0,0 +1,34 @@
+from typing_extensions import Annotated
+from zenml.steps import get_step_context, step
+
+from second_brain_offline.domain import CorpusStatistics, Document
+from second_brain_offline.infrastructure.mongo import (
+    MongoDBService,
+    compute_corpus_statistics,
+)
+
+
+@step
+def fetch_corpus_statistics(
+    collection_name: str,
+    token_sample_size: int = 100,
+) -> Annotated[CorpusStatistics, "corpus_statistics"]:
+    with MongoDBService(model=Document, collection_name=collection_name) as service:
+        statistics = compute_corpus_statistics(
+            service, token_sample_size=token_sample_size
+        )
+
+    step_context = get_step_context()
+    step_context.add_output_metadata(
+        output_name="corpus_statistics",
+        metadata={
+            "num_documents": statistics.num_documents,
+            "num_scored_documents": statistics.quality_score.num_values,
+            "chars_per_token": statistics.chars_per_token,
+            "content_length_percentiles": statistics.content_length.percentiles,
+            "num_tokens_percentiles": statistics.num_tokens.percentiles,
+            "quality_score_percentiles": statistics.quality_score.percentiles,
+        },
+    )
+
+    return statistics
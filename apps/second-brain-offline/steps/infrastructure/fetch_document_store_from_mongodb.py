@@ -0,0 +1,25 @@
+from typing_extensions import Annotated
+from zenml.steps import get_step_context, step
+
+from materializers import DocumentStoreMaterializer
+from second_brain_offline.domain import DocumentStore
+from second_brain_offline.infrastructure.mongo import fetch_document_store
+
+
+@step(output_materializers=DocumentStoreMaterializer)
+def fetch_document_store_from_mongodb(
+    collection_name: str,
+    limit: int,
+) -> Annotated[DocumentStore, "documents"]:
+    # The contents are loaded when the artifact is saved, after the step returns.
+    documents = fetch_document_store(collection_name, limit=limit)
+
+    step_context = get_step_context()
+    step_context.add_output_metadata(
+        output_name="documents",
+        metadata={
+            "count": len(documents),
+        },
+    )
+
+    return documents
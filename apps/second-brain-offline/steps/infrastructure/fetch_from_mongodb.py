@@ -1,17 +1,49 @@
 from typing_extensions import Annotated
 from zenml.steps import get_step_context, step
 
+from materializers import DocumentListMaterializer
 from second_brain_offline.domain import Document
 from second_brain_offline.infrastructure.mongo import MongoDBService
 
 
-@step
+@step(output_materializers=DocumentListMaterializer)
 def fetch_from_mongodb(
     collection_name: str,
     limit: int,
-) -> Annotated[list[dict], "documents"]:
+    batch_size: int = 1000,
+    max_workers: int = 1,
+    projection: list[str] | None = None,
+) -> Annotated[list[Document], "documents"]:
+    """Fetch documents from a MongoDB collection.
+
+    The documents are read and validated batch by batch, but the step returns them
+    all as a single list, so they are all held in memory. Callers that need a
+    bounded memory usage on large corpora should use
+    `fetch_document_store_from_mongodb`, which only keeps the document headers in
+    memory.
+
+    Args:
+        collection_name: Name of the MongoDB collection to read.
+        limit: Maximum number of documents to fetch.
+        batch_size: Number of documents fetched and validated at once.
+        max_workers: Number of `_id` ranges fetched concurrently. With more than 1,
+            the first `limit` documents in `_id` order are fetched.
+        projection: Names of the fields to fetch. The other fields must be optional
+            in `Document`. Defaults to all the fields.
+
+    Returns:
+        list[Document]: The fetched documents.
+    """
+
     with MongoDBService(model=Document, collection_name=collection_name) as service:
-        documents = service.fetch_documents(limit, query={})
+        documents = list(
+            service.iter_documents(
+                limit=limit,
+                batch_size=batch_size,
+                projection=projection,
+                max_workers=max_workers,
+            )
+        )
 
     step_context = get_step_context()
     step_context.add_output_metadata(
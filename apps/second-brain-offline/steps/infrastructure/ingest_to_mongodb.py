@@ -1,21 +1,42 @@
 from loguru import logger
 from pydantic import BaseModel
+from pymongo import WriteConcern
 from typing_extensions import Annotated
 from zenml.steps import get_step_context, step
 
-from second_brain_offline.infrastructure.mongo.service import MongoDBService
+from second_brain_offline.infrastructure.mongo import MongoDBService, get_pool_metrics
 
 
 @step
 def ingest_to_mongodb(
-    models: list[BaseModel], collection_name: str, clear_collection: bool = True
+    models: list[BaseModel],
+    collection_name: str,
+    clear_collection: bool = False,
+    delete_stale_documents: bool = False,
+    batch_size: int = 1000,
+    max_workers: int = 4,
+    write_concern_w: int | str | None = None,
+    write_concern_journal: bool | None = None,
 ) -> Annotated[int, "output"]:
     """ZenML step to ingest documents into MongoDB.
 
+    The documents are upserted by ID in parallel batches, so the collection keeps
+    serving the previous documents while it is being updated.
+
     Args:
         models: List of Pydantic BaseModel instances to ingest into MongoDB.
         collection_name: Name of the MongoDB collection to ingest into.
-        clear_collection: If True, clears the collection before ingestion. Defaults to True.
+        clear_collection: If True, clears the collection before ingestion. Defaults to False.
+        delete_stale_documents: If True, deletes the documents of the collection that
+            weren't ingested, once the ingestion is done. Only enable it when the
+            models are the full content of the collection, as any document missing
+            from them is deleted. Defaults to False.
+        batch_size: Number of documents per bulk write. Defaults to 1000.
+        max_workers: Number of bulk writes sent concurrently. Defaults to 4.
+        write_concern_w: Write acknowledgment level, such as 1 or "majority".
+            Defaults to the collection's write concern.
+        write_concern_journal: Whether writes wait for the journal. Defaults to the
+            collection's write concern.
 
     Returns:
         int: Number of documents in the collection after ingestion.
@@ -31,17 +52,34 @@ def ingest_to_mongodb(
     logger.info(
         f"Ingesting {len(models)} documents of type '{model_type.__name__}' into MongoDB collection '{collection_name}'"
     )
+    if write_concern_w is not None or write_concern_journal is not None:
+        write_concern = WriteConcern(w=write_concern_w, j=write_concern_journal)
+    else:
+        write_concern = None
     with MongoDBService(model=model_type, collection_name=collection_name) as service:
         if clear_collection:
             logger.warning(
                 f"'clear_collection' is set to True. Clearing MongoDB collection '{collection_name}' before ingestion."
             )
             service.clear_collection()
-        service.ingest_documents(models)
+        result = service.upsert_documents(
+            models,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            write_concern=write_concern,
+        )
+        num_deleted = 0
+        if delete_stale_documents and not clear_collection:
+            num_deleted = service.delete_documents_except(
+                [model.id for model in models], batch_size=batch_size
+            )
 
         count = service.get_collection_count()
         logger.info(
-            f"Successfully ingested {count} documents into MongoDB collection '{collection_name}'"
+            f"Successfully ingested {result.num_documents} documents into MongoDB collection '{collection_name}' "
+            f"({result.num_inserted} inserted, {result.num_replaced} replaced, "
+            f"{result.num_unchanged} unchanged, {num_deleted} stale deleted). "
+            f"The collection holds {count} documents."
         )
 
     step_context = get_step_context()
@@ -49,6 +87,14 @@ def ingest_to_mongodb(
         output_name="output",
         metadata={
             "count": count,
+            "num_inserted": result.num_inserted,
+            "num_replaced": result.num_replaced,
+            "num_unchanged": result.num_unchanged,
+            "num_deleted": num_deleted,
+            "mongodb_pools": {
+                uri: pool_metrics.model_dump()
+                for uri, pool_metrics in get_pool_metrics().items()
+            },
         },
     )
 
@@ -1,15 +1,20 @@
+from pathlib import Path
+
 from loguru import logger
 from typing_extensions import Annotated
 from zenml import get_step_context, step
 
 from second_brain_offline.config import settings
-from second_brain_offline.domain import InstructDataset
+from second_brain_offline.domain import DatasetFormat
+from second_brain_offline.domain.dataset_shards import get_shard_paths
+from second_brain_offline.infrastructure.huggingface.hub import push_dataset_shards
 
 
 @step
 def push_to_huggingface(
-    dataset: Annotated[InstructDataset, "instruct_dataset"],
+    dataset_dir: Annotated[str, "dataset_dir"],
     dataset_id: Annotated[str, "dataset_id"],
+    format: DatasetFormat = "jsonl",
 ) -> Annotated[str, "output"]:
     assert settings.HUGGINGFACE_ACCESS_TOKEN is not None, (
         "Huggingface access token must be provided for pushing to Huggingface"
@@ -17,17 +22,25 @@ def push_to_huggingface(
 
     logger.info(f"Pushing dataset {dataset_id} to Hugging Face.")
 
-    huggingface_dataset = dataset.to_huggingface()
-    huggingface_dataset.push_to_hub(dataset_id, token=settings.HUGGINGFACE_ACCESS_TOKEN)
+    uploaded_shards = push_dataset_shards(
+        Path(dataset_dir),
+        repo_id=dataset_id,
+        token=settings.HUGGINGFACE_ACCESS_TOKEN,
+        format=format,
+    )
+    shard_paths = get_shard_paths(Path(dataset_dir), format=format)
 
     step_context = get_step_context()
     step_context.add_output_metadata(
         output_name="output",
         metadata={
             "dataset_id": dataset_id,
-            "train_samples": len(huggingface_dataset["train"]),
-            "validation_samples": len(huggingface_dataset["validation"]),
-            "test_samples": len(huggingface_dataset["test"]),
+            "num_shards": {
+                split: len(split_shard_paths)
+                for split, split_shard_paths in shard_paths.items()
+            },
+            "num_uploaded_shards": len(uploaded_shards),
+            "uploaded_shards": uploaded_shards,
         },
     )
 
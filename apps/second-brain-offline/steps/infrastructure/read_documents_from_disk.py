@@ -1,29 +1,46 @@
 from pathlib import Path
+from typing import Iterator
 
 from loguru import logger
 from typing_extensions import Annotated
 from zenml.steps import get_step_context, step
 
-from second_brain_offline.domain.document import Document
+from materializers import DocumentListMaterializer
+from second_brain_offline.domain import CorpusFormat, Document, read_document_shards
 
 
-@step
+@step(output_materializers=DocumentListMaterializer)
 def read_documents_from_disk(
-    data_directory: Path, nesting_level: int = 0
+    data_directory: Path,
+    nesting_level: int = 0,
+    max_workers: int = 8,
+    format: CorpusFormat = "json",
+    content_quality_score_threshold: float | None = None,
 ) -> Annotated[list[Document], "documents"]:
-    pages: list[Document] = []
-
-    logger.info(f"Reading documents from '{data_directory}'")
+    logger.info(f"Reading {format} documents from '{data_directory}'")
 
     if not data_directory.exists():
         raise FileNotFoundError(f"Directory not found: '{data_directory}'")
 
-    json_files = __get_json_files(
-        data_directory=data_directory, nesting_level=nesting_level
-    )
-    for json_file in json_files:
-        page = Document.from_file(json_file)
-        pages.append(page)
+    if format == "parquet":
+        pages = list(
+            read_document_shards(
+                data_directory,
+                content_quality_score_threshold=content_quality_score_threshold,
+            )
+        )
+    else:
+        json_files = __get_json_files(
+            data_directory=data_directory, nesting_level=nesting_level
+        )
+        pages = list(Document.from_files(json_files, max_workers=max_workers))
+        if content_quality_score_threshold is not None:
+            pages = [
+                page
+                for page in pages
+                if not page.content_quality_score
+                or page.content_quality_score > content_quality_score_threshold
+            ]
 
     logger.info(f"Successfully read {len(pages)} documents from disk.")
 
@@ -38,16 +55,15 @@ def read_documents_from_disk(
     return pages
 
 
-def __get_json_files(data_directory: Path, nesting_level: int = 0) -> list[Path]:
+def __get_json_files(data_directory: Path, nesting_level: int = 0) -> Iterator[Path]:
     if nesting_level == 0:
-        return list(data_directory.glob("*.json"))
+        for json_file in data_directory.glob("*.json"):
+            # Skip the corpus manifest.
+            if not json_file.name.startswith("_"):
+                yield json_file
     else:
-        json_files = []
         for database_dir in data_directory.iterdir():
             if database_dir.is_dir():
-                nested_json_files = __get_json_files(
+                yield from __get_json_files(
                     data_directory=database_dir, nesting_level=nesting_level - 1
                 )
-                json_files.extend(nested_json_files)
-
-        return json_files
@@ -1,23 +1,26 @@
-import shutil
 from pathlib import Path
 
 from typing_extensions import Annotated
 from zenml import get_step_context, step
 
-from second_brain_offline.domain import Document
+from second_brain_offline.domain import CorpusFormat, Document, write_corpus
 
 
 @step
 def save_documents_to_disk(
     documents: Annotated[list[Document], "documents"],
     output_dir: Path,
+    format: CorpusFormat = "json",
+    shard_size: int = 10_000,
+    max_workers: int = 8,
 ) -> Annotated[str, "output"]:
-    if output_dir.exists():
-        shutil.rmtree(output_dir)
-    output_dir.mkdir(parents=True)
-
-    for document in documents:
-        document.write(output_dir=output_dir, obfuscate=True, also_save_as_txt=True)
+    result = write_corpus(
+        (document.obfuscate() for document in documents),
+        output_dir=output_dir,
+        format=format,
+        shard_size=shard_size,
+        max_workers=max_workers,
+    )
 
     step_context = get_step_context()
     step_context.add_output_metadata(
@@ -25,6 +28,11 @@ def save_documents_to_disk(
         metadata={
             "count": len(documents),
             "output_dir": str(output_dir),
+            "format": format,
+            "manifest_path": str(result.manifest_path),
+            "num_written_files": len(result.written_files),
+            "num_unchanged_files": result.num_unchanged_files,
+            "num_deleted_files": len(result.deleted_files),
         },
     )
 
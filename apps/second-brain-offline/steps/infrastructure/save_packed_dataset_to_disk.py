@@ -0,0 +1,56 @@
+import shutil
+from pathlib import Path
+
+from loguru import logger
+from typing_extensions import Annotated
+from zenml import get_step_context, step
+
+from second_brain_offline.domain import DatasetFormat, load_dataset_shards
+from second_brain_offline.domain.dataset_packing import export_packed_dataset
+
+
+@step
+def save_packed_dataset_to_disk(
+    dataset_dir: Annotated[str, "dataset_dir"],
+    output_dir: Path,
+    tokenizer_id: str,
+    format: DatasetFormat = "jsonl",
+    max_seq_length: int = 2048,
+    chat_template: str | None = None,
+    system_prompt: str | None = None,
+) -> Annotated[str, "output"]:
+    # Packed from the shards on disk, which hold the samples appended by the
+    # previous runs as well as the new ones.
+    dataset = load_dataset_shards(
+        Path(dataset_dir), format=format, splits=["train", "validation", "test"]
+    )
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+
+    logger.info(
+        f"Saving dataset packed into sequences of {max_seq_length} '{tokenizer_id}' "
+        f"tokens to '{output_dir}'"
+    )
+    num_sequences = export_packed_dataset(
+        dataset.select_columns(["instruction", "answer"]),
+        output_dir=output_dir,
+        tokenizer_id=tokenizer_id,
+        max_seq_length=max_seq_length,
+        chat_template=chat_template,
+        system_prompt=system_prompt,
+    )
+
+    step_context = get_step_context()
+    step_context.add_output_metadata(
+        output_name="output",
+        metadata={
+            "tokenizer_id": tokenizer_id,
+            "max_seq_length": max_seq_length,
+            "num_sequences": num_sequences,
+            "dataset_dir": dataset_dir,
+            "output_dir": str(output_dir),
+        },
+    )
+
+    return str(output_dir)
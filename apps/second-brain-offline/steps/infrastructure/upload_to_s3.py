@@ -4,16 +4,30 @@ from typing_extensions import Annotated
 from zenml import get_step_context, step
 
 from second_brain_offline.config import settings
-from second_brain_offline.infrastructure.aws.s3 import S3Client
+from second_brain_offline.infrastructure.aws.s3 import S3Client, UploadMode
 
 
 @step
 def upload_to_s3(
     folder_path: Path,
     s3_prefix: str = "",
+    mode: UploadMode = "zip",
+    max_workers: int = 8,
 ) -> Annotated[str, "output"]:
     s3_client = S3Client(bucket_name=settings.AWS_S3_BUCKET_NAME)
-    s3_client.upload_folder(local_path=folder_path, s3_prefix=s3_prefix)
+    if mode == "sync":
+        result = s3_client.sync_folder(
+            local_path=folder_path, s3_prefix=s3_prefix, max_workers=max_workers
+        )
+        sync_metadata = {
+            "num_uploaded_files": len(result.uploaded_keys),
+            "num_skipped_files": len(result.skipped_keys),
+        }
+    else:
+        s3_client.upload_folder(
+            local_path=folder_path, s3_prefix=s3_prefix, max_concurrency=max_workers
+        )
+        sync_metadata = {}
 
     step_context = get_step_context()
     step_context.add_output_metadata(
@@ -21,6 +35,8 @@ def upload_to_s3(
         metadata={
             "folder_path": str(folder_path),
             "s3_prefix": s3_prefix,
+            "mode": mode,
+            **sync_metadata,
         },
     )
 
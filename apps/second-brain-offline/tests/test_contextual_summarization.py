@@ -0,0 +1,68 @@
+from second_brain_offline.application.agents.contextual_summarization import (
+    ContextualSummarizationAgent,
+)
+
+MOCK_SUMMARY = "This is a mock summary"
+
+
+def test_gate_ignores_code_comments_and_bare_hashes() -> None:
+    """
+    Test that `#` lines inside fenced code blocks and bare `#` lines aren't taken
+    as Markdown headings by the gate, while real headings still are. The heading
+    path of a chunk is made of the headings before it.
+    """
+
+    chunks = [
+        "# Setup\n\nInstall the package.",
+        "#\nNot a heading",
+        "```bash\n# Install the dependencies\nmake install\n```",
+        "## Usage ##\n\nRun the pipeline.",
+        "Some text without any heading.",
+    ]
+    content = "\n\n".join(chunks)
+
+    agent = ContextualSummarizationAgent(mock=True, gate=True)
+    contextual_chunks = agent(content, chunks, title="Guide")
+
+    contexts = [
+        contextual_chunk.removesuffix(chunk).strip()
+        for contextual_chunk, chunk in zip(contextual_chunks, chunks)
+    ]
+    assert contexts == [
+        "Guide",
+        MOCK_SUMMARY,
+        MOCK_SUMMARY,
+        "Guide > Setup",
+        MOCK_SUMMARY,
+    ]
+
+
+def test_gate_matches_the_title_as_whole_words() -> None:
+    """
+    Test that a short title never gates a chunk, even if the chunk contains it
+    inside other words, while a long enough title only gates the chunks mentioning
+    it as whole words.
+    """
+
+    chunks = [
+        "We maintain good Golangish habits.",
+        "More about AI agents.",
+        "The pipeline uses Golang.",
+        "Why golang matters.",
+    ]
+    content = "\n\n".join(chunks)
+
+    agent = ContextualSummarizationAgent(mock=True, gate=True)
+    short_title_contexts = [
+        contextual_chunk.removesuffix(chunk).strip()
+        for contextual_chunk, chunk in zip(agent(content, chunks, title="AI"), chunks)
+    ]
+    long_title_contexts = [
+        contextual_chunk.removesuffix(chunk).strip()
+        for contextual_chunk, chunk in zip(
+            agent(content, chunks, title="Golang"), chunks
+        )
+    ]
+
+    assert short_title_contexts == [MOCK_SUMMARY] * 4
+    assert long_title_contexts == [MOCK_SUMMARY, MOCK_SUMMARY, "Golang", "Golang"]
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from second_brain_offline.application.dataset import SummarizationDatasetGenerator
+from second_brain_offline.domain import (
+    Document,
+    DocumentMetadata,
+    ShardedDatasetWriter,
+    load_dataset_shards,
+)
+from second_brain_offline.domain.dataset import get_split
+
+
+def _create_documents(num_documents: int) -> list[Document]:
+    return [
+        Document(
+            id=f"document-{index}",
+            metadata=DocumentMetadata(
+                id=f"document-{index}",
+                url=f"https://example.com/{index}",
+                title=f"Document {index}",
+                properties={},
+            ),
+            content=f"Document {index} " + "content " * 20,
+        )
+        for index in range(num_documents)
+    ]
+
+
+def test_generate_streams_samples_to_shards(tmp_path: Path) -> None:
+    """
+    Test that the samples are written to the shards of the split of their document,
+    and that the near-duplicate summaries of a document are written only once.
+    """
+
+    documents = _create_documents(12)
+    generator = SummarizationDatasetGenerator(
+        summarization_model="gpt-4o-mini",
+        summarization_max_characters=256,
+        val_split_ratio=0.3,
+        test_split_ratio=0.3,
+        mock=True,
+        augmentation_loops=3,
+    )
+
+    with ShardedDatasetWriter(tmp_path, shard_size=2) as writer:
+        num_samples = generator.generate(documents, writer=writer)
+
+    assert sum(num_samples.values()) == len(documents)
+    assert generator.deduplication_stats.num_summaries_before == 3 * len(documents)
+    assert generator.deduplication_stats.num_summaries_after == len(documents)
+
+    dataset = load_dataset_shards(tmp_path, format="jsonl")
+    assert {split: len(dataset[split]) for split in dataset} == num_samples
+    for split in dataset:
+        for document_id in dataset[split]["document_id"]:
+            assert (
+                get_split(
+                    document_id, val_split_ratio=0.3, test_split_ratio=0.3, seed=42
+                )
+                == split
+            )
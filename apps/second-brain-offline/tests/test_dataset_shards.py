@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pytest
+
+from second_brain_offline.domain import (
+    InstructDataset,
+    InstructDatasetSample,
+    ShardedDatasetWriter,
+    load_dataset_shards,
+)
+
+
+def _create_dataset(num_train_samples: int) -> InstructDataset:
+    return InstructDataset(
+        train=[
+            InstructDatasetSample(
+                instruction=f"Document {index}",
+                answer=f"Summary {index}",
+                document_id=f"document-{index}",
+            )
+            for index in range(num_train_samples)
+        ],
+        validation=[],
+        test=[],
+        val_split_ratio=0.1,
+        test_split_ratio=0.1,
+    )
+
+
+@pytest.mark.parametrize("format", ["jsonl", "parquet"])
+def test_load_dataset_shards_keeps_empty_splits(tmp_path: Path, format: str) -> None:
+    """
+    Test that splits without samples, which have no shard on disk, are loaded as
+    empty splits with the features of the other splits.
+    """
+
+    dataset = _create_dataset(num_train_samples=3)
+    dataset.write(tmp_path, format=format, shard_size=2)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"train-00000.{format}",
+        f"train-00001.{format}",
+    ]
+
+    hf_dataset = load_dataset_shards(
+        tmp_path, format=format, splits=["train", "validation", "test"]
+    )
+
+    assert list(hf_dataset) == ["train", "validation", "test"]
+    assert hf_dataset.num_rows == {"train": 3, "validation": 0, "test": 0}
+    assert hf_dataset["validation"].features == hf_dataset["train"].features
+    assert hf_dataset["train"]["document_id"] == [
+        "document-0",
+        "document-1",
+        "document-2",
+    ]
+
+
+def test_to_huggingface_has_every_split() -> None:
+    """
+    Test that converting a dataset with empty splits still returns the train,
+    validation and test splits.
+    """
+
+    hf_dataset = _create_dataset(num_train_samples=2).to_huggingface()
+
+    assert list(hf_dataset) == ["train", "validation", "test"]
+    assert len(hf_dataset["test"]) == 0
+
+
+@pytest.mark.parametrize("format", ["jsonl", "parquet"])
+def test_delete_documents_rewrites_only_their_shards(
+    tmp_path: Path, format: str
+) -> None:
+    """
+    Test that deleting the samples of documents only rewrites the shards holding
+    them, removes the emptied shards, and that new shards don't reuse the index of
+    a removed one.
+    """
+
+    with ShardedDatasetWriter(tmp_path, format=format, shard_size=2) as writer:
+        for index in range(6):
+            writer.write(
+                "train",
+                InstructDatasetSample(
+                    instruction=f"Document {index}",
+                    answer=f"Summary {index}",
+                    document_id=f"document-{index}",
+                    document_content_hash=f"hash-{index}",
+                ),
+            )
+    untouched_shard = (tmp_path / f"train-00002.{format}").read_bytes()
+
+    with ShardedDatasetWriter(
+        tmp_path, format=format, shard_size=2, append=True
+    ) as writer:
+        assert writer.get_document_content_hashes() == {
+            f"document-{index}": f"hash-{index}" for index in range(6)
+        }
+        num_deleted_samples = writer.delete_documents(
+            {"document-0", "document-1", "document-2"}
+        )
+        writer.write(
+            "train",
+            InstructDatasetSample(
+                instruction="Document 6", answer="Summary 6", document_id="document-6"
+            ),
+        )
+
+    assert num_deleted_samples == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"train-00001.{format}",
+        f"train-00002.{format}",
+        f"train-00003.{format}",
+    ]
+    assert (tmp_path / f"train-00002.{format}").read_bytes() == untouched_shard
+    assert load_dataset_shards(tmp_path, format=format)["train"]["document_id"] == [
+        "document-3",
+        "document-4",
+        "document-5",
+        "document-6",
+    ]
@@ -0,0 +1,49 @@
+import pytest
+
+from second_brain_offline import tokenizer
+from second_brain_offline.domain import Document, DocumentMetadata
+
+
+class _WordEncoding:
+    """Counts whitespace-separated words as tokens, so no encoding is downloaded."""
+
+    name = "words"
+
+    def encode_ordinary(self, text: str) -> list[str]:
+        return text.split()
+
+    def encode_ordinary_batch(self, texts: list[str], num_threads: int) -> list:
+        return [self.encode_ordinary(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def word_encoding(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tokenizer, "get_encoding", lambda model_id: _WordEncoding())
+
+
+def _create_document(content: str) -> Document:
+    return Document(
+        metadata=DocumentMetadata(
+            id="doc", url="https://doc", title="Doc", properties={}
+        ),
+        content=content,
+    )
+
+
+def test_count_tokens_follows_replaced_content() -> None:
+    """
+    Test that the memoized token count isn't reused once the content is replaced,
+    whether on a copy or on the document itself, and that the copy doesn't change
+    the count of the original document.
+    """
+
+    document = _create_document("one two three")
+    assert document.count_tokens() == 3
+
+    copied_document = document.model_copy(update={"content": "one two"})
+    assert copied_document.count_tokens() == 2
+    assert Document.count_tokens_batch([document, copied_document]) == [3, 2]
+
+    document.content = "one two three four five"
+    assert document.count_tokens() == 5
+    assert Document.count_tokens_batch([document]) == [5]
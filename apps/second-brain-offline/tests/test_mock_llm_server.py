@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import TestServer
+from openai import AsyncOpenAI, RateLimitError
+
+from second_brain_offline.infrastructure.mock_llm import (
+    MockLLMServerConfig,
+    create_app,
+)
+
+
+async def _query_mock_llm_server(config: MockLLMServerConfig) -> None:
+    async with TestServer(create_app(config)) as server:
+        client = AsyncOpenAI(
+            base_url=str(server.make_url("/v1")), api_key="mock", max_retries=0
+        )
+
+        messages = [{"role": "user", "content": "Summarize this document."}]
+        first = await client.chat.completions.create(
+            model="gpt-4o-mini", messages=messages
+        )
+        second = await client.chat.completions.create(
+            model="gpt-4o-mini", messages=messages
+        )
+        assert first.choices[0].message.content
+        assert first.choices[0].message.content == second.choices[0].message.content
+
+        # Only the requests asking for a JSON object get a JSON answer, with a
+        # context for every chunk tag of the prompt.
+        json_prompt = (
+            "Answer in JSON.\n"
+            '<chunk id="0">First chunk</chunk>\n<chunk id="3">Second chunk</chunk>'
+        )
+        text_response = await client.chat.completions.create(
+            model="gpt-4o-mini", messages=[{"role": "user", "content": json_prompt}]
+        )
+        json_response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": json_prompt}],
+            response_format={"type": "json_object"},
+        )
+        assert not text_response.choices[0].message.content.startswith("{")
+        answer = json.loads(json_response.choices[0].message.content)
+        assert 0 <= answer["score"] <= 1
+        assert [context["chunk_id"] for context in answer["contexts"]] == [0, 3]
+        assert all(context["context"] for context in answer["contexts"])
+
+        # The OpenAI client requests base64 embeddings by default.
+        response = await client.embeddings.create(
+            model="text-embedding-3-small", input=["first text", "second text"]
+        )
+        assert len(response.data) == 2
+        assert len(response.data[0].embedding) == 1536
+        assert response.data[0].embedding != response.data[1].embedding
+
+        try:
+            await asyncio.gather(
+                *[
+                    client.chat.completions.create(
+                        model="gpt-4o-mini", messages=messages
+                    )
+                    for _ in range(4)
+                ]
+            )
+        except RateLimitError:
+            pass
+        else:
+            raise AssertionError("Expected concurrent requests to be rate limited")
+
+
+def test_mock_llm_server() -> None:
+    """
+    Test that the mock LLM server is compatible with the OpenAI client, returns
+    deterministic outputs, answers the JSON requests of the agents and rate limits
+    requests above its concurrency limit.
+    """
+
+    config = MockLLMServerConfig(
+        latency_seconds=0.05, tokens_per_second=10_000, max_concurrent_requests=2
+    )
+
+    asyncio.run(_query_mock_llm_server(config))
@@ -0,0 +1,250 @@
+import uuid
+from typing import Iterator
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pydantic import BaseModel
+from pymongo import MongoClient, errors
+
+from second_brain_offline.config import settings
+from second_brain_offline.infrastructure.mongo import (
+    document_store as mongo_document_store,
+)
+from second_brain_offline.infrastructure.mongo import fetch_document_store
+from second_brain_offline.infrastructure.mongo import service as mongo_service
+from second_brain_offline.infrastructure.mongo.service import MongoDBService
+
+
+class _Item(BaseModel):
+    id: str
+    value: int
+    text: str | None = None
+
+
+@pytest.fixture
+def mongodb_client() -> Iterator[MongoClient]:
+    """The local MongoDB instance if it's running, or an in-memory mock."""
+
+    client = MongoClient(settings.MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except errors.PyMongoError:
+        client.close()
+        client = mongomock.MongoClient()
+
+    yield client
+
+    client.close()
+
+
+@pytest.fixture
+def service(
+    mongodb_client: MongoClient, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[MongoDBService]:
+    monkeypatch.setattr(
+        mongo_service, "get_mongo_client", lambda mongodb_uri: mongodb_client
+    )
+    service = MongoDBService(model=_Item, collection_name=f"test_{uuid.uuid4().hex}")
+
+    yield service
+
+    service.collection.drop()
+
+
+@pytest.fixture
+def server_service(service: MongoDBService) -> MongoDBService:
+    if isinstance(service.client, mongomock.MongoClient):
+        pytest.skip(
+            "$bucketAuto needs a MongoDB server. Start it with "
+            "`make local-docker-infrastructure-up`."
+        )
+
+    return service
+
+
+def _create_items(num_items: int) -> list[_Item]:
+    return [
+        _Item(id=f"item-{index:03d}", value=index, text=f"Item {index}")
+        for index in range(num_items)
+    ]
+
+
+def test_upsert_documents_counts(service: MongoDBService) -> None:
+    """
+    Test that upserts insert new documents, replace changed ones and report
+    identical ones as unchanged, keyed on the document ID.
+    """
+
+    items = _create_items(5)
+
+    result = service.upsert_documents(items, batch_size=2, max_workers=2)
+
+    assert result.num_documents == 5
+    assert result.num_batches == 3
+    assert result.num_inserted == 5
+    assert service.get_collection_count() == 5
+
+    updated_items = [
+        items[0].model_copy(update={"value": 100}),
+        items[1].model_copy(update={"text": "Changed"}),
+        *items[2:],
+        _Item(id="item-999", value=999),
+    ]
+
+    result = service.upsert_documents(updated_items, batch_size=2, max_workers=2)
+
+    assert result.num_documents == 6
+    assert result.num_inserted == 1
+    assert result.num_replaced == 2
+    assert result.num_unchanged == 3
+    assert service.get_collection_count() == 6
+    assert service.collection.find_one({"_id": "item-000"})["value"] == 100
+
+
+def test_delete_documents_except(service: MongoDBService) -> None:
+    """
+    Test that only the documents missing from the kept IDs are deleted.
+    """
+
+    service.upsert_documents(_create_items(7))
+
+    num_deleted = service.delete_documents_except(
+        ["item-001", "item-004", "missing"], batch_size=2
+    )
+
+    assert num_deleted == 5
+    assert sorted(doc["_id"] for doc in service.collection.find()) == [
+        "item-001",
+        "item-004",
+    ]
+
+
+def test_iter_documents_single_cursor(service: MongoDBService) -> None:
+    """
+    Test that a single cursor reads every document in batches, and that the limit,
+    the query and the projection are applied.
+    """
+
+    items = _create_items(7)
+    service.upsert_documents(items)
+
+    assert list(service.iter_documents(batch_size=3)) == items
+    assert len(list(service.iter_documents(limit=4, batch_size=3))) == 4
+    assert [
+        item.value for item in service.iter_documents({"value": {"$gte": 5}})
+    ] == [5, 6]
+
+    projected_items = list(service.iter_documents(projection=["value"]))
+    assert [item.id for item in projected_items] == [item.id for item in items]
+    assert all(item.text is None for item in projected_items)
+
+
+@pytest.mark.parametrize("num_items,partition_size", [(1, 4), (25, 4), (25, 100)])
+def test_get_id_ranges_cover_documents(
+    server_service: MongoDBService, num_items: int, partition_size: int
+) -> None:
+    """
+    Test that the _id ranges cover every document exactly once, in _id order.
+    """
+
+    items = _create_items(num_items)
+    server_service.upsert_documents(items)
+
+    id_ranges = server_service.get_id_ranges(partition_size=partition_size)
+
+    assert 1 <= len(id_ranges) <= -(-num_items // partition_size)
+    range_ids = [
+        [doc["_id"] for doc in server_service.collection.find(id_range).sort("_id")]
+        for id_range in id_ranges
+    ]
+    assert [id for ids in range_ids for id in ids] == [item.id for item in items]
+    assert all(ids for ids in range_ids)
+
+
+def test_get_id_ranges_with_query_and_limit(server_service: MongoDBService) -> None:
+    """
+    Test that the ranges only cover the first `limit` documents matching the query,
+    in _id order, even if other documents fall between their bounds.
+    """
+
+    server_service.upsert_documents(_create_items(30))
+    query = {"value": {"$in": list(range(0, 30, 2))}}
+
+    id_ranges = server_service.get_id_ranges(query, partition_size=3, limit=10)
+
+    covered_ids = [
+        doc["_id"]
+        for id_range in id_ranges
+        for doc in server_service.collection.find({"$and": [query, id_range]}).sort(
+            "_id"
+        )
+    ]
+    assert covered_ids == [f"item-{index:03d}" for index in range(0, 20, 2)]
+    assert server_service.get_id_ranges({"value": -1}) == []
+
+
+@pytest.mark.parametrize("limit", [0, 7])
+def test_iter_documents_parallel(server_service: MongoDBService, limit: int) -> None:
+    """
+    Test that fetching _id ranges in parallel yields the same documents as a single
+    cursor sorted by _id, with the limit applied in _id order.
+    """
+
+    items = _create_items(25)
+    # Insert in reverse, so the natural order differs from the _id order.
+    server_service.upsert_documents(reversed(items), batch_size=5)
+
+    parallel_items = list(
+        server_service.iter_documents(
+            limit=limit, batch_size=2, max_workers=3, partition_size=4
+        )
+    )
+
+    assert parallel_items == (items[:limit] if limit else items)
+
+
+def test_fetch_document_store_loads_contents_after_the_service(
+    service: MongoDBService,
+    mongodb_client: MongoClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the document store fetches the headers without the content, and loads
+    the content of documents keyed on a string ID or an ObjectId once the service
+    fetching the headers is closed.
+    """
+
+    monkeypatch.setattr(
+        mongo_document_store, "get_mongo_client", lambda mongodb_uri: mongodb_client
+    )
+    object_id = ObjectId()
+    service.collection.insert_many(
+        [
+            {
+                "_id": document_id,
+                "metadata": {
+                    "id": str(document_id),
+                    "url": f"https://example.com/{document_id}",
+                    "title": f"Document {document_id}",
+                    "properties": {},
+                },
+                "content": f"Content of {document_id}",
+            }
+            for document_id in ["document-0", object_id]
+        ]
+    )
+
+    document_store = fetch_document_store(
+        service.collection.name, limit=10, database_name=service.database.name
+    )
+
+    assert sorted(header.id for header in document_store.headers) == sorted(
+        ["document-0", str(object_id)]
+    )
+    assert {
+        document.id: document.content for document in document_store.iter_documents()
+    } == {
+        "document-0": "Content of document-0",
+        str(object_id): f"Content of {object_id}",
+    }
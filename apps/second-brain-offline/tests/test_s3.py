@@ -1,6 +1,181 @@
+import io
+import os
+import zipfile
 from pathlib import Path
+from typing import Iterator
 
-from second_brain_offline.infrastructure.aws.s3 import S3Client
+import boto3
+import pytest
+from moto import mock_aws
+
+from second_brain_offline.infrastructure.aws.s3 import (
+    MIN_PART_SIZE,
+    S3Client,
+    compute_etag,
+)
+
+BUCKET_NAME = "second-brain-test"
+REGION = "eu-central-1"
+
+
+@pytest.fixture
+def s3_client(monkeypatch: pytest.MonkeyPatch) -> Iterator[S3Client]:
+    """
+    Fixture that provides an S3 client backed by an in-memory S3 stand-in.
+
+    Returns:
+        S3Client: Client of an empty bucket
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+
+    with mock_aws():
+        yield S3Client(bucket_name=BUCKET_NAME, region=REGION)
+
+
+@pytest.fixture
+def local_folder(tmp_path: Path) -> Path:
+    """
+    Fixture that provides a folder with a large file and nested small files.
+
+    Returns:
+        Path: Path of the folder
+    """
+    folder = tmp_path / "corpus"
+    (folder / "nested").mkdir(parents=True)
+    (folder / "large.bin").write_bytes(os.urandom(MIN_PART_SIZE * 2 + 1024))
+    for i in range(5):
+        (folder / "nested" / f"document_{i}.json").write_text(f'{{"id": {i}}}')
+
+    return folder
+
+
+def read_folder(folder: Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(folder).as_posix(): path.read_bytes()
+        for path in folder.rglob("*")
+        if path.is_file()
+    }
+
+
+def test_upload_folder_streams_multipart_zip(
+    s3_client: S3Client, local_folder: Path, tmp_path: Path
+) -> None:
+    """
+    Test that a folder zipped into a multipart upload is downloaded back identical.
+    """
+    s3_key = s3_client.upload_folder(
+        local_folder, s3_prefix="uploads", part_size=MIN_PART_SIZE, max_concurrency=2
+    )
+
+    assert s3_key == "uploads/corpus.zip"
+    # The incompressible large file spans several parts.
+    etag = boto3.client("s3", region_name=REGION).head_object(
+        Bucket=BUCKET_NAME, Key=s3_key
+    )["ETag"]
+    assert etag.strip('"').endswith("-3")
+
+    s3_client.download_folder(s3_key, tmp_path / "downloaded")
+    assert read_folder(tmp_path / "downloaded") == read_folder(local_folder)
+
+
+def test_upload_empty_folder(s3_client: S3Client, tmp_path: Path) -> None:
+    """
+    Test that an empty folder is uploaded as an empty zip file.
+    """
+    (tmp_path / "empty").mkdir()
+
+    s3_key = s3_client.upload_folder(tmp_path / "empty")
+
+    s3_client.download_folder(s3_key, tmp_path / "downloaded")
+    assert read_folder(tmp_path / "downloaded") == {}
+
+
+def test_download_folder_resumes_and_verifies(
+    s3_client: S3Client, local_folder: Path, tmp_path: Path
+) -> None:
+    """
+    Test that a download only fetches the missing, corrupted and incomplete files.
+    """
+    s3_key = s3_client.upload_folder(local_folder)
+    download_dir = tmp_path / "downloaded"
+    result = s3_client.download_folder(s3_key, download_dir, max_workers=3)
+    assert len(result.extracted_files) == 6
+
+    # Simulate an interrupted download and a corrupted file of the same size.
+    (download_dir / "nested" / "document_0.json").unlink()
+    (download_dir / "nested" / ".document_0.json.tmp").write_text("partial")
+    (download_dir / "nested" / "document_1.json").write_text('{"id": 9}')
+
+    result = s3_client.download_folder(s3_key, download_dir)
+    assert sorted(result.extracted_files) == [
+        "nested/document_0.json",
+        "nested/document_1.json",
+    ]
+    assert len(result.skipped_files) == 4
+    assert read_folder(download_dir) == read_folder(local_folder)
+
+
+def test_download_folder_rejects_paths_outside_target(
+    s3_client: S3Client, tmp_path: Path
+) -> None:
+    """
+    Test that zip members can't be extracted outside of the target directory.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        zipf.writestr("../escaped.txt", "data")
+    s3_client.upload_folder(tmp_path)  # Creates the bucket
+    s3_client.s3_client.put_object(
+        Bucket=BUCKET_NAME, Key="malicious.zip", Body=buffer.getvalue()
+    )
+
+    with pytest.raises(ValueError):
+        s3_client.download_folder("malicious.zip", tmp_path / "downloaded")
+    assert not (tmp_path / "escaped.txt").exists()
+
+
+def test_sync_folder_skips_unchanged_files(
+    s3_client: S3Client, local_folder: Path
+) -> None:
+    """
+    Test that syncing uploads new and changed files only, and deletes stale objects.
+    """
+    result = s3_client.sync_folder(
+        local_folder, s3_prefix="synced", part_size=MIN_PART_SIZE
+    )
+    assert len(result.uploaded_keys) == 6
+    assert result.skipped_keys == []
+
+    # The ETags of single and multipart uploads match the local files.
+    result = s3_client.sync_folder(
+        local_folder, s3_prefix="synced", part_size=MIN_PART_SIZE
+    )
+    assert result.uploaded_keys == []
+    assert len(result.skipped_keys) == 6
+
+    (local_folder / "nested" / "document_0.json").write_text('{"id": "changed"}')
+    (local_folder / "nested" / "document_1.json").unlink()
+    result = s3_client.sync_folder(
+        local_folder, s3_prefix="synced", part_size=MIN_PART_SIZE, delete=True
+    )
+    assert result.uploaded_keys == ["synced/corpus/nested/document_0.json"]
+    assert len(result.skipped_keys) == 4
+    assert result.deleted_keys == ["synced/corpus/nested/document_1.json"]
+
+    objects = boto3.client("s3", region_name=REGION).list_objects_v2(
+        Bucket=BUCKET_NAME, Prefix="synced/"
+    )["Contents"]
+    assert len(objects) == 5
+
+
+def test_compute_etag_of_multipart_file(local_folder: Path) -> None:
+    """
+    Test that files at least as large as the part size get a multipart ETag.
+    """
+    assert compute_etag(local_folder / "large.bin", MIN_PART_SIZE).endswith("-3")
+    assert "-" not in compute_etag(local_folder / "nested" / "document_0.json")
 
 
 def test_download_from_public_bucket() -> None:
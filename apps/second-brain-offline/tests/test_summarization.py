@@ -0,0 +1,145 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from second_brain_offline import tokenizer
+from second_brain_offline.application.agents import summarization
+from second_brain_offline.application.agents.summarization import SummarizationAgent
+from second_brain_offline.domain import Document, DocumentMetadata
+
+FAILING_MARKER = "unreachable"
+
+
+class _WordEncoding:
+    """Counts whitespace-separated words as tokens, so no encoding is downloaded."""
+
+    name = "words"
+
+    def encode_ordinary(self, text: str) -> list[str]:
+        return text.split()
+
+
+class _FakeCompletion:
+    def __init__(self) -> None:
+        self.num_in_flight = 0
+        self.max_in_flight = 0
+        self.attempts: Counter[str] = Counter()
+
+    async def __call__(self, messages: list[dict], **kwargs) -> SimpleNamespace:
+        prompt = messages[0]["content"]
+        self.attempts[prompt] += 1
+        self.num_in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.num_in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.num_in_flight -= 1
+
+        if FAILING_MARKER in prompt:
+            raise ConnectionError("The model is unreachable")
+
+        message = SimpleNamespace(content="A short summary.")
+
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _create_document(id: str, paragraphs: list[str]) -> Document:
+    return Document(
+        id=id,
+        metadata=DocumentMetadata(
+            id=id, url=f"https://example.com/{id}", title=id, properties={}
+        ),
+        content="\n\n".join(paragraphs),
+    )
+
+
+def test_map_reduce_retries_only_the_failing_part(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that the parts of long documents share the agent's concurrency limit and
+    that a failing part is retried on its own, without summarizing the whole
+    document again.
+    """
+
+    monkeypatch.setattr(tokenizer, "get_encoding", lambda model_id: _WordEncoding())
+    completion = _FakeCompletion()
+    monkeypatch.setattr(summarization, "acompletion", completion)
+
+    agent = SummarizationAgent(
+        max_characters=100,
+        model_id="test-words",
+        max_concurrent_requests=2,
+        max_attempts=2,
+        map_reduce_threshold_tokens=10,
+        map_chunk_tokens=30,
+    )
+    # Every paragraph of 20 words becomes a part of its own.
+    paragraphs = [f"paragraph {index} " + "word " * 18 for index in range(6)]
+    documents = [
+        _create_document("ok", paragraphs),
+        _create_document(
+            "failing", paragraphs[:3] + [f"{FAILING_MARKER} " + "word " * 19]
+        ),
+    ]
+
+    summarized_documents = agent(documents)
+
+    assert summarized_documents[0].summary == "A short summary."
+    assert summarized_documents[1].summary is None
+    assert completion.max_in_flight <= 2
+
+    failing_attempts = [
+        num_attempts
+        for prompt, num_attempts in completion.attempts.items()
+        if FAILING_MARKER in prompt
+    ]
+    assert failing_attempts == [2]
+    # The parts that succeeded are summarized once per document.
+    assert max(completion.attempts.values()) == 2
+    assert sorted(completion.attempts.values()).count(1) == len(completion.attempts) - 1
+
+
+def test_astream_summaries_shares_the_concurrency_limit(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Test that streamed summaries are yielded for every request, and that short and
+    map-reduce documents stay within the agent's concurrency limit together.
+    """
+
+    monkeypatch.setattr(tokenizer, "get_encoding", lambda model_id: _WordEncoding())
+    completion = _FakeCompletion()
+    monkeypatch.setattr(summarization, "acompletion", completion)
+
+    agent = SummarizationAgent(
+        max_characters=100,
+        model_id="test-words",
+        max_concurrent_requests=2,
+        max_attempts=2,
+        map_reduce_threshold_tokens=10,
+        map_chunk_tokens=30,
+    )
+    paragraphs = [f"paragraph {index} " + "word " * 18 for index in range(4)]
+    documents = [
+        _create_document("long", paragraphs),
+        *[_create_document(f"short-{index}", ["a few words"]) for index in range(4)],
+    ]
+    requests = [
+        (document, temperature)
+        for temperature in (0.0, 0.5)
+        for document in documents
+    ]
+
+    async def collect() -> list:
+        return [result async for result in agent.astream_summaries(requests)]
+
+    results = asyncio.run(collect())
+
+    assert sorted(index for index, _ in results) == list(range(len(requests)))
+    for index, summary in results:
+        assert summary.document_id == requests[index][0].id
+        assert summary.temperature == requests[index][1]
+    assert completion.max_in_flight <= 2
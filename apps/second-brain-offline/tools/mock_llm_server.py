@@ -0,0 +1,84 @@
+import click
+from aiohttp import web
+
+from second_brain_offline.infrastructure.mock_llm import (
+    MockLLMServerConfig,
+    create_app,
+)
+
+
+@click.command()
+@click.option("--host", default="localhost", help="Host to bind the server to.")
+@click.option("--port", default=8010, type=int, help="Port to bind the server to.")
+@click.option(
+    "--latency-seconds", default=0.2, type=float, help="Fixed latency of every request."
+)
+@click.option(
+    "--latency-jitter-seconds",
+    default=0.0,
+    type=float,
+    help="Maximum random latency added on top of the fixed one.",
+)
+@click.option(
+    "--tokens-per-second",
+    default=100.0,
+    type=float,
+    help="Generation speed of the chat completions.",
+)
+@click.option(
+    "--completion-tokens",
+    default=64,
+    type=int,
+    help="Number of tokens of every chat completion.",
+)
+@click.option(
+    "--max-concurrent-requests",
+    default=None,
+    type=int,
+    help="Maximum number of in-flight requests before answering with 429s.",
+)
+@click.option(
+    "--rate-limit-rate",
+    default=0.0,
+    type=float,
+    help="Fraction of the requests randomly rejected with a 429.",
+)
+@click.option(
+    "--error-rate",
+    default=0.0,
+    type=float,
+    help="Fraction of the requests randomly failing with a 500.",
+)
+@click.option("--seed", default=42, type=int, help="Seed of the simulated load.")
+def main(
+    host: str,
+    port: int,
+    latency_seconds: float,
+    latency_jitter_seconds: float,
+    tokens_per_second: float,
+    completion_tokens: int,
+    max_concurrent_requests: int | None,
+    rate_limit_rate: float,
+    error_rate: float,
+    seed: int,
+) -> None:
+    """Serve a local OpenAI-compatible API with deterministic outputs.
+
+    Set OPENAI_BASE_URL=http://<host>:<port>/v1 to point the pipelines at it.
+    """
+
+    config = MockLLMServerConfig(
+        latency_seconds=latency_seconds,
+        latency_jitter_seconds=latency_jitter_seconds,
+        tokens_per_second=tokens_per_second,
+        completion_tokens=completion_tokens,
+        max_concurrent_requests=max_concurrent_requests,
+        rate_limit_rate=rate_limit_rate,
+        error_rate=error_rate,
+        seed=seed,
+    )
+    web.run_app(create_app(config), host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
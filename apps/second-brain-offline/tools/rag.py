@@ -74,7 +74,7 @@ def create_rag_chain(config_path: Path) -> Any:
 Question: {question}
 """
     prompt = ChatPromptTemplate.from_template(template)
-    llm = ChatOpenAI(temperature=0, model="gpt-4o")
+    llm = ChatOpenAI(temperature=0, model="gpt-4o", base_url=settings.OPENAI_BASE_URL)
     parse_output = StrOutputParser()
 
     return retrieve | prompt | llm | parse_output
@@ -13,20 +13,30 @@ def cli() -> None:
 @click.argument("local_path")
 @click.argument("bucket_name")
 @click.option("--s3-prefix", default="", help="Optional S3 prefix (folder path)")
-def upload(local_path: str, bucket_name: str, s3_prefix: str) -> None:
+@click.option(
+    "--mode",
+    type=click.Choice(["zip", "sync"]),
+    default="zip",
+    help="Upload the folder as a single zip file, or sync its files one by one",
+)
+def upload(local_path: str, bucket_name: str, s3_prefix: str, mode: str) -> None:
     """Upload a local folder to S3 bucket.
 
     Args:
         local_path: Path to the local folder to upload
         bucket_name: Name of the S3 bucket
         s3_prefix: Optional S3 prefix (folder path)
+        mode: Whether to upload a zip file or to sync the files one by one
 
     Raises:
         click.Abort: If upload fails or path is invalid
     """
     try:
         s3_client = S3Client(bucket_name)
-        s3_client.upload_folder(local_path, s3_prefix)
+        if mode == "sync":
+            s3_client.sync_folder(local_path, s3_prefix)
+        else:
+            s3_client.upload_folder(local_path, s3_prefix)
         click.echo(
             f"Successfully uploaded '{local_path}' to 's3://{bucket_name}/{s3_prefix}'"
         )
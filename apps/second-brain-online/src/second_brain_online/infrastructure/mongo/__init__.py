@@ -0,0 +1,13 @@
+from .client import (
+    PoolMetrics,
+    close_mongo_clients,
+    get_mongo_client,
+    get_pool_metrics,
+)
+
+__all__ = [
+    "PoolMetrics",
+    "close_mongo_clients",
+    "get_mongo_client",
+    "get_pool_metrics",
+]